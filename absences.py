@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+KINDS = ("ferie", "p_matt", "p_pom")
+SPARSE_FORMAT = "sparse-v1"
+
+# ==============================================================================
+# FORMATO COMPATTO DELLE ASSENZE
+# ==============================================================================
+# Un mese di leaves è salvato come
+#   {"format": "sparse-v1", "ferie": {"Mario R.": [1, 2, 3]}, "p_matt": {...}, "p_pom": {...}}
+# cioè, per tipo di assenza, i soli operatori assenti con i giorni del mese.
+# Il vecchio formato denso {"ferie": {"01 Gio": {"Mario R.": true, ...}}} viene
+# ancora letto in modo trasparente.
+
+def col_day(col):
+    """Giorno del mese da un'etichetta di colonna ("07 Mar" -> 7)"""
+    return int(str(col)[:2])
+
+def is_sparse(month_leaves):
+    return bool(month_leaves) and month_leaves.get("format") == SPARSE_FORMAT
+
+def to_sparse(month_leaves):
+    """Converte un mese (denso o già compatto) nel formato compatto"""
+    month_leaves = month_leaves or {}
+    if is_sparse(month_leaves): return month_leaves
+    res = {"format": SPARSE_FORMAT}
+    for kind in KINDS:
+        per_op = {}
+        for col, flags in (month_leaves.get(kind) or {}).items():
+            day = col_day(col)
+            for op, absent in flags.items():
+                if absent: per_op.setdefault(op, []).append(day)
+        res[kind] = {op: sorted(set(ds)) for op, ds in per_op.items()}
+    return res
+
+def _days_by_op(df, mask):
+    """{operatore: giorni ordinati} delle celle True di `mask` (stessa forma di df)"""
+    day_nums = np.fromiter((col_day(c) for c in df.columns), dtype=np.int64, count=len(df.columns))
+    rows, cs = np.nonzero(mask)
+    per_op = {}
+    if len(rows):
+        bounds = np.flatnonzero(np.diff(rows)) + 1
+        for seg_rows, seg_cols in zip(np.split(rows, bounds), np.split(cs, bounds)):
+            op = df.index[seg_rows[0]]
+            per_op.setdefault(op, set()).update(day_nums[seg_cols].tolist())
+    return {op: sorted(ds) for op, ds in per_op.items()}
+
+def decode_frame(month_leaves, kind, ops, cols):
+    """Frame booleano operatori x colonne per un tipo di assenza (False dove non salvato)"""
+    sparse = to_sparse(month_leaves)
+    arr = np.zeros((len(ops), len(cols)), dtype=bool)
+    col_pos = {col_day(c): j for j, c in enumerate(cols)}
+    op_rows = {}
+    for i, op in enumerate(ops):
+        op_rows.setdefault(op, []).append(i)
+    for op, ds in sparse.get(kind, {}).items():
+        rows = op_rows.get(op)
+        if not rows: continue
+        idx = [col_pos[d] for d in ds if d in col_pos]
+        if idx: arr[np.ix_(rows, idx)] = True
+    return pd.DataFrame(arr, index=ops, columns=cols)
+
+# ==============================================================================
+# GRIGLIA CATEGORICA: UNA ASSENZA PER OPERATORE E GIORNO
+# ==============================================================================
+# L'editor mostra una sola griglia con al più un'assenza per cella. Se i dati
+# ne hanno più d'una nello stesso giorno vale la precedenza del motore: ferie,
+# poi permesso di mattina, poi di pomeriggio.
+
+ABSENCE_LABELS = ("", "FERIE", "P.MATT", "P.POM")  # codice -> etichetta; il codice k > 0 è KINDS[k - 1]
+
+def absence_codes(month_leaves, ops, n_days):
+    """Matrice int8 operatori x giorni (colonna d-1 = giorno d) con i codici di ABSENCE_LABELS"""
+    sparse = to_sparse(month_leaves)
+    codes = np.zeros((len(ops), n_days), dtype=np.int8)
+    op_rows = {}
+    for i, op in enumerate(ops):
+        op_rows.setdefault(op, []).append(i)
+    # Dal tipo meno prioritario: le ferie sovrascrivono i permessi
+    for code in range(len(KINDS), 0, -1):
+        rows, days = [], []
+        for op, ds in sparse.get(KINDS[code - 1], {}).items():
+            for i in op_rows.get(op, ()):
+                rows.extend([i] * len(ds))
+                days.extend(ds)
+        if not rows: continue
+        rows, days = np.asarray(rows), np.asarray(days) - 1
+        ok = (days >= 0) & (days < n_days)
+        codes[rows[ok], days[ok]] = code
+    return codes
+
+def grid_frame(month_leaves, ops, cols):
+    """Griglia operatori x colonne con l'etichetta dell'assenza di ogni cella ("" = presente)"""
+    day_idx = [col_day(c) - 1 for c in cols]
+    codes = absence_codes(month_leaves, ops, max(day_idx, default=-1) + 1)[:, day_idx]
+    return pd.DataFrame(np.asarray(ABSENCE_LABELS, dtype=object)[codes], index=list(ops), columns=cols)
+
+def encode_grid(df):
+    """Codifica una griglia categorica nel formato compatto (celle vuote o sconosciute = presente)"""
+    codes = pd.Categorical(df.to_numpy().ravel(), categories=ABSENCE_LABELS).codes.reshape(df.shape)
+    res = {"format": SPARSE_FORMAT}
+    for code, kind in enumerate(KINDS, start=1):
+        res[kind] = _days_by_op(df, codes == code)
+    return res
+
+def merge_grid(month_leaves, df):
+    """Mese compatto con le assenze degli operatori della griglia sostituite da quelle della griglia"""
+    base, grid = to_sparse(month_leaves), encode_grid(df)
+    ops = set(df.index)
+    res = {"format": SPARSE_FORMAT}
+    for kind in KINDS:
+        res[kind] = {op: ds for op, ds in base.get(kind, {}).items() if op not in ops}
+        res[kind].update(grid[kind])
+    return res
+
+def set_range(month_leaves, ops, kind, first, last):
+    """Assegna l'assenza `kind` (None = nessuna) a `ops` dal giorno `first` a `last` compresi"""
+    base = to_sparse(month_leaves)
+    span = set(range(first, last + 1))
+    res = {"format": SPARSE_FORMAT}
+    for k in KINDS:
+        per_op = {op: set(ds) for op, ds in base.get(k, {}).items()}
+        for op in ops:
+            per_op[op] = per_op.get(op, set()) - span
+            if k == kind: per_op[op] |= span
+        res[k] = {op: sorted(ds) for op, ds in per_op.items() if ds}
+    return res
+
+def absent_days(month_leaves):
+    """{kind: {operatore: set(giorni)}} per le verifiche puntuali del motore"""
+    sparse = to_sparse(month_leaves)
+    return {kind: {op: set(ds) for op, ds in sparse.get(kind, {}).items()} for kind in KINDS}
+
+def changed_days(old_leaves, new_leaves):
+    """Giorni del mese in cui almeno un operatore ha cambiato assenza"""
+    old, new = absent_days(old_leaves), absent_days(new_leaves)
+    days = set()
+    for kind in KINDS:
+        for op in old[kind].keys() | new[kind].keys():
+            days |= old[kind].get(op, set()) ^ new[kind].get(op, set())
+    return days
+
+def to_cells(month_leaves):
+    """Forma a celle {kind: {operatore: {giorno: True}}} usata dal merge a tre vie"""
+    sparse = to_sparse(month_leaves)
+    return {kind: {op: {d: True for d in ds} for op, ds in sparse.get(kind, {}).items()} for kind in KINDS}
+
+def from_cells(cells):
+    """Inverso di to_cells: torna al formato compatto"""
+    res = {"format": SPARSE_FORMAT}
+    for kind in KINDS:
+        res[kind] = {op: sorted(days) for op, days in (cells.get(kind) or {}).items() if days}
+    return res
+
+MERGE_CODEC = (to_cells, from_cells)
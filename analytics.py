@@ -0,0 +1,150 @@
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+from engine import Fairness, leaves_key, month_range, parse_cell
+
+# ==============================================================================
+# STATISTICHE DI UN MESE SALVATO
+# ==============================================================================
+# Ogni mese salvato viene scomposto una volta sola (per versione) in tre tabelle
+# lunghe; le analisi su più mesi sono concat + groupby/pivot pandas.
+
+TASK_COLS = ["mese", "operatore", "servizio", "task", "volte"]
+PAUSE_COLS = ["mese", "operatore", "pausa", "volte"]
+LOAD_COLS = ["mese", "operatore", "giorni disponibili", "ferie", "permessi", "task"]
+
+# Un permesso (mezza giornata) conta mezzo giorno disponibile
+PERMESSO_DAY = 0.5
+
+MonthStats = namedtuple("MonthStats", "tasks pauses load")
+
+def month_stats(key, shifts):
+    """MonthStats di un mese di shifts.json ({colonna: {operatore: cella}})"""
+    parsed = {}
+    tasks, pauses, load = {}, {}, {}
+    for col, day in shifts.items():
+        for op, value in day.items():
+            if not value: continue
+            if value not in parsed: parsed[value] = parse_cell(value)
+            cell = parsed[value]
+            if cell.holiday: continue
+            row = load.setdefault(op, [0.0, 0, 0, 0])
+            if cell.absence == "FERIE":
+                row[1] += 1; continue
+            if cell.absence:
+                row[0] += PERMESSO_DAY; row[2] += 1
+            else:
+                row[0] += 1
+            row[3] += len(cell.tasks)
+            for t in cell.tasks:
+                tasks[(op, t)] = tasks.get((op, t), 0) + 1
+            if cell.pause:
+                pauses[(op, cell.pause)] = pauses.get((op, cell.pause), 0) + 1
+    return MonthStats(
+        pd.DataFrame([(key, op, t.split(": ", 1)[0], t, n) for (op, t), n in tasks.items()], columns=TASK_COLS),
+        pd.DataFrame([(key, op, p, n) for (op, p), n in pauses.items()], columns=PAUSE_COLS),
+        pd.DataFrame([(key, op, *row) for op, row in load.items()], columns=LOAD_COLS),
+    )
+
+# ==============================================================================
+# INDICE STORICO
+# ==============================================================================
+
+class HistoryIndex:
+    """Statistiche precalcolate dei mesi salvati, aggiornate un mese alla volta.
+
+    update() riscompone un mese solo se la sua versione (SHA) è cambiata; le
+    tabelle di tutti i mesi vengono riunite alla prima richiesta dopo un
+    aggiornamento. Thread-safe: un'istanza può servire tutte le sessioni.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._months = {}  # chiave mese -> (versione, MonthStats)
+        self._frames = None
+
+    def update(self, key, shifts, version):
+        """Registra il mese salvato `key`; ritorna True se è stato ricalcolato"""
+        with self._lock:
+            current = self._months.get(key)
+            if current is not None and version is not None and current[0] == version: return False
+        stats = month_stats(key, shifts or {})
+        with self._lock:
+            self._months[key] = (version, stats)
+            self._frames = None
+        return True
+
+    def remove(self, key):
+        with self._lock:
+            if self._months.pop(key, None) is not None: self._frames = None
+
+    def months(self):
+        with self._lock:
+            return sorted(self._months, key=lambda k: tuple(int(x) for x in k.split("_")))
+
+    def frames(self, keys=None):
+        """MonthStats con le tabelle dei mesi `keys` (tutti se None) riunite"""
+        with self._lock:
+            if self._frames is None:
+                parts = [stats for _, stats in self._months.values()]
+                self._frames = MonthStats(*(
+                    pd.concat([p[i] for p in parts], ignore_index=True) if parts else pd.DataFrame(columns=cols)
+                    for i, cols in enumerate((TASK_COLS, PAUSE_COLS, LOAD_COLS))
+                ))
+            frames = self._frames
+        if keys is None: return frames
+        keys = list(keys)
+        return MonthStats(*(df[df["mese"].isin(keys)] for df in frames))
+
+# ==============================================================================
+# AGGREGAZIONI
+# ==============================================================================
+
+def task_matrix(frames, by="servizio"):
+    """Operatore x servizio (o task): giorni di copertura"""
+    return frames.tasks.pivot_table(index="operatore", columns=by, values="volte", aggfunc="sum", fill_value=0)
+
+def pause_matrix(frames):
+    """Operatore x fascia pausa: giorni"""
+    return frames.pauses.pivot_table(index="operatore", columns="pausa", values="volte", aggfunc="sum", fill_value=0)
+
+def load_table(frames):
+    """Carico corretto per le assenze: task per giorno disponibile e scarto dalla media"""
+    df = frames.load.groupby("operatore")[["giorni disponibili", "ferie", "permessi", "task"]].sum()
+    df["task / giorno"] = (df["task"] / df["giorni disponibili"].where(df["giorni disponibili"] > 0)).round(2)
+    mean = df["task / giorno"].mean()
+    df["scarto %"] = ((df["task / giorno"] / mean - 1) * 100).round(1) if mean else 0.0
+    return df.sort_values("task / giorno", ascending=False)
+
+# ==============================================================================
+# PESI DI EQUITÀ DI LUNGO PERIODO PER IL MOTORE
+# ==============================================================================
+
+def window_keys(year, month, n_months):
+    """Chiavi degli `n_months` mesi che precedono year/month"""
+    start_m0 = year * 12 + month - 1 - n_months
+    return [leaves_key(y, m) for y, m in month_range(start_m0 // 12, start_m0 % 12 + 1, n_months)]
+
+def history_fairness(index, year, month, n_months=12):
+    """Fairness con i conteggi operatore/task dei mesi salvati precedenti.
+
+    I conteggi sono riportati alla disponibilità media (giorni non in ferie):
+    chi è stato assente a lungo non viene caricato per "recuperare". Sono
+    medie mensili, confrontabili con i conteggi del mese in corso: il motore
+    le usa come punto di partenza di `cnt` (vedi schedule_month).
+    """
+    frames = index.frames(window_keys(year, month, n_months))
+    fairness = Fairness()
+    if frames.tasks.empty: return fairness
+    avail = frames.load.groupby("operatore")["giorni disponibili"].sum()
+    avail = avail[avail > 0]
+    scale = avail.mean() / avail
+    counts = frames.tasks.groupby(["operatore", "task"])["volte"].sum().reset_index()
+    counts = counts[counts["operatore"].isin(scale.index)]
+    n_months = frames.load["mese"].nunique()
+    counts["volte"] = (counts["volte"] * counts["operatore"].map(scale) / n_months).round().astype(int)
+    for op, task, n in counts.itertuples(index=False):
+        fairness.cnt.setdefault(op, {})[task] = n
+    return fairness
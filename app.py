@@ -1,14 +1,51 @@
 import streamlit as st
-import pandas as pd
-import calendar
 import random
-import json
 import copy
-from datetime import date
-import holidays
-from github import Github, GithubException
+import datetime
+import functools
+import hashlib
+import importlib
+import json
+import threading
+import time
+
+from timing import StageTimer
 
 st.set_page_config(page_title="Turni Trust Pro - Cloud", layout="wide")
+rerun_timer = StageTimer()
+
+# ==============================================================================
+# AVVIO: MODULI PESANTI IN BACKGROUND
+# ==============================================================================
+# I moduli dell'app portano con sé pandas, numpy, holidays e requests, e il
+# primo st.dataframe fa importare pyarrow a Streamlit: a freddo quasi un
+# secondo. Vengono importati solo dopo login, titolo e schede (vedi "MODULI
+# DELL'APP"); mentre la pagina di login aspetta la password li importa un
+# thread, così dopo l'accesso sono già pronti. LAZY_MODULES servono solo ad
+# alcune sezioni o al click e si importano dove usati: il thread li importa
+# dopo gli altri, senza far attendere l'avvio.
+
+APP_MODULES = ("pandas", "pyarrow", "absences", "engine", "savequeue", "shared", "skills", "storage", "styling",
+               "validate")
+LAZY_MODULES = ("analytics", "batch", "exports", "localdb", "search")
+
+@st.cache_resource(show_spinner=False)
+def prefetch_modules():
+    """Thread unico per processo che importa APP_MODULES e poi LAZY_MODULES.
+
+    Ritorna un evento impostato quando i primi sono pronti.
+    """
+    ready = threading.Event()
+
+    def run():
+        try:
+            for m in APP_MODULES: importlib.import_module(m)
+        finally:
+            ready.set()
+        for m in LAZY_MODULES: importlib.import_module(m)
+
+    threading.Thread(target=run, name="import-prefetch", daemon=True).start()
+    return ready
 
 # ==============================================================================
 # 0. SISTEMA DI LOGIN (PROTEZIONE)
@@ -40,175 +77,371 @@ def check_password():
     return False
 
 if not check_password():
+    prefetch_modules()  # Intanto che si digita la password
     st.stop() # Blocca l'esecuzione se non loggato
 
 st.title("☁️ Turni Trust - Cloud Connected")
 
+# Struttura della pagina subito, prima di moduli e dati: stato dei salvataggi e
+# avvisi vanno nel contenitore sopra le schede
+status_area = st.container()
+tab_gen, tab_stats, tab_settings = st.tabs(["🗓️ GENERAZIONE TURNI", "📊 ANALISI", "⚙️ IMPOSTAZIONI"])
+
+# ==============================================================================
+# MODULI DELL'APP
+# ==============================================================================
+
+with rerun_timer.stage("import"), tab_gen, st.spinner("Avvio in corso..."):
+    # Import concorrenti degli stessi moduli da due thread possono bloccarsi a vicenda: prima si attende il thread.
+    # LAZY_MODULES dipendono solo da questi, quindi importarli mentre li importa il thread è sicuro
+    prefetch_modules().wait()
+    import pandas as pd
+
+    from absences import (ABSENCE_LABELS, KINDS, MERGE_CODEC, changed_days, from_cells, grid_frame, merge_grid,
+                          set_range, to_cells)
+    from engine import (MODE_GREEDY, MODE_OPTIMAL, MODES, affected_days, leaves_key, month_calendar, month_range,
+                        pause_coverage, schedule_month)
+    from savequeue import Pending, SaveQueue
+    from shared import Entry, SessionMonths, SharedData
+    from skills import skills_fingerprint
+    from storage import API_URL, GitHubStorage, LocalStorage, MonthlyStore, StorageError, load_months
+    from styling import get_cell_styler, styled
+    from validate import validate, validate_month, violation_counts
+
 # ==============================================================================
 # 1. GESTIONE CONNESSIONE GITHUB
 # ==============================================================================
 
-def get_file_from_github(filename):
-    """Scarica un file specifico dal repository"""
-    try:
-        if "GITHUB_TOKEN" not in st.secrets or "REPO_NAME" not in st.secrets:
-            return None, None
-        token = st.secrets["GITHUB_TOKEN"]
-        repo_name = st.secrets["REPO_NAME"]
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        try:
-            contents = repo.get_contents(filename)
-            return json.loads(contents.decoded_content.decode()), contents.sha
-        except:
-            return {}, None
-    except Exception as e:
-        st.error(f"Errore lettura {filename}: {e}")
-        return None, None
-
-def save_file_to_github(filename, content, sha):
-    """Salva un file su GitHub gestendo i conflitti (Errore 409)"""
-    try:
-        token = st.secrets["GITHUB_TOKEN"]
-        repo_name = st.secrets["REPO_NAME"]
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        
-        if sha is None:
-            try:
-                contents = repo.get_contents(filename)
-                sha = contents.sha
-            except:
-                repo.create_file(filename, f"Create {filename}", json.dumps(content, indent=4))
-                return True, None
-
-        update_result = repo.update_file(
-            path=filename,
-            message=f"Update {filename}",
-            content=json.dumps(content, indent=4),
-            sha=sha
+# Database locale usato senza GitHub (sviluppo, offline)
+DEFAULT_DB = "turni.db"
+
+@st.cache_resource
+def get_storage():
+    """Archivio unico per processo (connessioni e cache condivise tra sessioni).
+
+    Con GITHUB_TOKEN / REPO_NAME si usa GitHub; aggiungendo LOCAL_DB i dati
+    stanno in SQLite e si sincronizzano con GitHub in background. Senza
+    GitHub l'app lavora offline su SQLite, inizializzato dai JSON della cartella.
+    """
+    from localdb import SQLiteStorage
+    github = None
+    if "GITHUB_TOKEN" in st.secrets and "REPO_NAME" in st.secrets:
+        github = GitHubStorage(
+            st.secrets["GITHUB_TOKEN"],
+            st.secrets["REPO_NAME"],
+            branch=st.secrets.get("GITHUB_BRANCH"),
+            api_url=st.secrets.get("GITHUB_API_URL", API_URL),
         )
-        return True, update_result['content'].sha
+        if "LOCAL_DB" not in st.secrets: return github
+    db = SQLiteStorage(st.secrets.get("LOCAL_DB", DEFAULT_DB), remote=github)
+    if db.is_empty(): db.import_from(github or LocalStorage("."))
+    db.start_sync()
+    return db
 
-    except GithubException as e:
-        if e.status == 409:
-            try:
-                contents = repo.get_contents(filename)
-                new_sha = contents.sha
-                update_result = repo.update_file(
-                    path=filename,
-                    message=f"Update {filename} (Retry)",
-                    content=json.dumps(content, indent=4),
-                    sha=new_sha
-                )
-                return True, update_result['content'].sha
-            except Exception as e2:
-                st.error(f"Errore durante il retry automatico: {e2}")
-                return False, None
+@st.cache_resource
+def get_shared_data():
+    """Copia unica per processo dei file del repository, condivisa da tutte le sessioni (vedi shared.py)"""
+    shared = SharedData(get_storage())
+    shared.start()
+    return shared
+
+def get_files_from_github(filenames):
+    """File dalla cache condivisa (scaricati in parallelo solo la prima volta).
+    Ritorna {filename: Entry(dati, sha)}; i dati non vanno modificati."""
+    try:
+        loaded = get_shared_data().get_many(filenames)
+    except StorageError as e:
+        st.error(f"Errore lettura {', '.join(filenames)}: {e}")
+        return {f: Entry(None, None) for f in filenames}
+    return {f: Entry(data if data is not None else {}, sha) for f, (data, sha) in loaded.items()}
+
+def get_save_queue():
+    """Coda di salvataggio della sessione: le scritture su GitHub avvengono in background"""
+    if "save_queue" not in st.session_state:
+        st.session_state.save_queue = SaveQueue(get_storage())
+    return st.session_state.save_queue
+
+def queue_save(path, content, sha, base, tag, codec=None, index=None):
+    """Mette in coda il salvataggio di un file (vedi savequeue.py per le regole di durabilità)"""
+    get_save_queue().submit(path, copy.deepcopy(content), sha, base=base or {}, codec=codec, tag=tag, index=index)
+
+def apply_saved_results():
+    """Riporta SHA, versioni unite e conflitti dei salvataggi conclusi in sessione e nella cache condivisa"""
+    if "save_queue" not in st.session_state: return
+    for path, (tag, result) in st.session_state.save_queue.drain().items():
+        for c in result.conflicts:
+            st.session_state.save_conflicts.append({"file": path, **c})
+        if tag == "index":
+            get_shared_data().put(path, result.content, result.sha)
+        elif tag == "config":
+            get_shared_data().put(path, result.content, result.sha)
+            st.session_state.config_base = Entry(result.content, result.sha)
+            if result.content != st.session_state.config:
+                # Merge con modifiche remote: la sessione riparte dalla versione unita
+                st.session_state.config.clear()
+                st.session_state.config.update(copy.deepcopy(result.content))
         else:
-            st.error(f"Errore salvataggio {filename}: {e}")
-            return False, None
+            kind, key = tag
+            st.session_state[kind].saved(key, result.content, result.sha)
+            if kind == "shifts": get_history_index().update(key, result.content, result.sha)
+
+def save_month_to_github(kind, key, data):
+    """Salva il file mensile (leaves/ o shifts/) unendo le modifiche concorrenti"""
+    store = MonthlyStore(get_storage(), kind)
+    view = st.session_state[kind]
+    codec = MERGE_CODEC if kind == "leaves" else None
+    queue_save(store.path(key), data, view.sha(key), view.base(key), tag=(kind, key),
+                      codec=codec, index=(kind, key))
+
+def save_months_to_github(kind, months):
+    """Salva più mesi {key: dati} in un solo commit, insieme all'indice"""
+    store = MonthlyStore(get_storage(), kind)
+    view = st.session_state[kind]
+    codec = MERGE_CODEC if kind == "leaves" else None
+    get_save_queue().submit_many({
+        store.path(key): Pending(copy.deepcopy(data), view.sha(key), view.base(key) or {}, codec, (kind, key), (kind, key))
+        for key, data in months.items()
+    })
+
+def delete_month_from_github(kind, key):
+    """Elimina il file mensile (leaves/ o shifts/) per tutte le sessioni"""
+    storage = get_storage()
+    view = st.session_state[kind]
+    # Prima le scritture in coda, così lo SHA da eliminare è quello definitivo
+    if not get_save_queue().flush(timeout=30):
+        st.error(f"Salvataggi in sospeso non completati: impossibile eliminare {kind} {key}.")
+        return False
+    apply_saved_results()
+    try:
+        store = MonthlyStore(storage, kind)
+        store.delete(key, view.sha(key) or storage.read_text(store.path(key))[1])
+        view.deleted(key)
+        if kind == "shifts": get_history_index().remove(key)
+        get_save_queue().forget(store.path(key))
+        return True
+    except StorageError as e:
+        st.error(f"Errore eliminazione {kind} {key}: {e}")
+        return False
+
+def load_months_from_github(keys):
+    """Porta assenze e turni dei mesi nella cache condivisa con una sola lettura in parallelo,
+    solo per i mesi che nessuna sessione ha già caricato"""
+    keys = [key for key in dict.fromkeys(keys) if key not in st.session_state.loaded_months]
+    if not keys: return
+    views = {kind: st.session_state[kind] for kind in ("leaves", "shifts")}
+    try:
+        loaded = get_shared_data().get_many([view.path(key) for view in views.values() for key in keys])
+        for kind, view in views.items():
+            absent = [key for key in keys if loaded[view.path(key)].data is None and key not in view.local]
+            # Repository non ancora migrato ai file mensili: si legge il vecchio file unico
+            if absent and get_shared_data().get(f"{kind}/index.json").data is None:
+                for key, (legacy, _) in load_months(get_storage(), absent, kinds=(kind,))[kind].items():
+                    if legacy is not None: view.load_legacy(key, legacy)
+    except StorageError as e:
+        st.error(f"Errore lettura {', '.join(keys)}: {e}")
+        return
+    st.session_state.loaded_months.update(keys)
+
+def load_month_from_github(key):
+    load_months_from_github([key])
+
+@st.cache_resource
+def get_history_index():
+    """Indice storico dei turni salvati, unico per processo (vedi analytics.py)"""
+    from analytics import HistoryIndex
+    return HistoryIndex()
+
+def saved_months(kind):
+    """Mesi elencati in {kind}/index.json"""
+    path = f"{kind}/index.json"
+    return (get_files_from_github([path])[path].data or {}).get("months", [])
+
+def prefetch_months():
+    """Carica in background nella cache condivisa i mesi salvati non ancora letti (dopo quello selezionato)"""
+    get_shared_data().prefetch([st.session_state[kind].path(key) for kind in ("leaves", "shifts") for key in saved_months(kind)])
+
+def months_loading():
+    """Mesi di turni salvati non ancora nella cache condivisa"""
+    return len(get_shared_data().missing([st.session_state.shifts.path(key) for key in saved_months("shifts")]))
+
+def refresh_history_index(wait=True):
+    """Porta nell'indice i mesi di shifts/index.json; ricalcola solo quelli con SHA cambiato.
+
+    Con wait=False usa solo i mesi già nella cache condivisa, senza attendere il
+    caricamento degli altri (vedi prefetch_months).
+    """
+    index = get_history_index()
+    view = st.session_state.shifts
+    keys = saved_months("shifts")
+    if wait: load_months_from_github(keys)
+    for key in keys:
+        entry = view.shared_entry(key)
+        if entry.data is not None: index.update(key, entry.data, entry.sha)
+    return index
+
+def save_config():
+    """Mette in coda il salvataggio di config.json"""
+    base = st.session_state.config_base
+    queue_save("config.json", CONFIG, base.sha, base.data, tag="config")
 
 # ==============================================================================
 # 2. CARICAMENTO DATI
 # ==============================================================================
 
 if 'config' not in st.session_state:
-    cfg_data, cfg_sha = get_file_from_github("config.json")
+    with rerun_timer.stage("caricamento dati"):
+        loaded = get_files_from_github(["config.json", "leaves/index.json", "shifts/index.json"])
+    cfg_data, cfg_sha = loaded["config.json"]
     if cfg_data and "SERVICES" in cfg_data:
-        st.session_state.config = cfg_data
-        st.session_state.config_sha = cfg_sha
+        # La config si modifica in sessione (anche prima di salvarla): copia propria,
+        # con la versione condivisa come base del merge
+        st.session_state.config = copy.deepcopy(cfg_data)
+        st.session_state.config_base = Entry(cfg_data, cfg_sha)
+        st.session_state.save_conflicts = []
     else:
-        st.error("Errore critico: config.json mancante o struttura errata.")
+        status_area.error("Errore critico: config.json mancante o struttura errata.")
         st.stop()
-    
-    leaves_data, leaves_sha = get_file_from_github("leaves.json")
-    st.session_state.leaves = leaves_data if leaves_data else {}
-    st.session_state.leaves_sha = leaves_sha
 
-    shifts_data, shifts_sha = get_file_from_github("shifts.json")
-    st.session_state.shifts = shifts_data if shifts_data else {}
-    st.session_state.shifts_sha = shifts_sha
+    # Migrazione una tantum da leaves.json / shifts.json ai file mensili
+    for kind in ("leaves", "shifts"):
+        if not loaded[f"{kind}/index.json"][0]:
+            try:
+                n = MonthlyStore(get_storage(), kind).migrate()
+                if n:
+                    get_shared_data().invalidate(f"{kind}/index.json")
+                    st.toast(f"{kind}: {n} mesi migrati in {kind}/", icon="📦")
+            except StorageError as e:
+                status_area.error(f"Errore migrazione {kind}: {e}")
+
+    # Assenze e turni vengono caricati per mese, solo quando selezionato, nella cache
+    # condivisa: la sessione tiene solo le proprie modifiche non ancora salvate
+    st.session_state.leaves = SessionMonths(get_shared_data(), "leaves")
+    st.session_state.shifts = SessionMonths(get_shared_data(), "shifts")
+    st.session_state.loaded_months = set()
     
     st.toast("Accesso effettuato e dati sincronizzati!", icon="🔓")
 
+apply_saved_results()
 CONFIG = st.session_state.config
 
+# Config salvata da un'altra sessione: si adotta se qui non ci sono modifiche in sospeso
+remote_config = get_shared_data().peek("config.json")
+if (remote_config and remote_config.data and remote_config.sha != st.session_state.config_base.sha
+        and "config.json" not in get_save_queue().status()["pending"]
+        and CONFIG == st.session_state.config_base.data):
+    CONFIG.clear()
+    CONFIG.update(copy.deepcopy(remote_config.data))
+    st.session_state.config_base = remote_config
+
+queue_status = get_save_queue().status()
+if queue_status["last_error"]:
+    status_area.warning(f"⚠️ Salvataggio non riuscito, nuovo tentativo automatico: {queue_status['last_error']}")
+elif queue_status["pending"]:
+    status_area.caption(f"⏳ Salvataggio in corso: {', '.join(queue_status['pending'])}")
+elif queue_status["last_saved"]:
+    status_area.caption(f"✅ Tutto salvato su GitHub ({datetime.datetime.fromtimestamp(queue_status['last_saved']):%H:%M:%S})")
+
+if st.session_state.save_conflicts:
+    with status_area.container(border=True):
+        st.warning(f"⚠️ {len(st.session_state.save_conflicts)} modifiche concorrenti sovrascritte durante l'ultimo salvataggio "
+                   "(un altro utente aveva cambiato gli stessi campi; è stata mantenuta la tua versione).")
+        st.dataframe(pd.DataFrame(st.session_state.save_conflicts).astype(str), hide_index=True, use_container_width=True)
+        if st.button("OK, ho verificato"):
+            st.session_state.save_conflicts = []
+            st.rerun()
+
+# Ricerca "migliore di N" dalla UI: deve stare nei tempi di una richiesta interattiva
+SEARCH_BUDGET_S = 3.0
+SEARCH_PATIENCE = 100
+
+# Griglia assenze: righe per pagina e tipi dell'inserimento a intervalli (None = cancella)
+ABSENCE_PAGE_SIZE = 50
+RANGE_KINDS = KINDS + (None,)
+
 # ==============================================================================
 # 3. UTILS DI VISUALIZZAZIONE
 # ==============================================================================
 
-def get_style_map():
+# Derivazioni costose memorizzate tra i rerun e condivise tra le sessioni, con
+# numero massimo di voci. Le chiavi sono impronte del contenuto e non gli SHA di
+# GitHub: la sessione può avere modifiche non ancora salvate (colori, coda).
+# Gli argomenti con "_" iniziale sono esclusi dalla chiave.
+
+def data_version(data):
+    """Impronta del contenuto JSON, usata come chiave di cache"""
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+@st.cache_data(max_entries=24, show_spinner=False)
+def cached_calendar(year, month):
+    """(giorni, colonne, festività) del mese, festività come dict data -> nome"""
+    days, cols, hols = month_calendar(year, month)
+    return days, cols, dict(hols)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_style_map(services_version, _services):
     col_map = {}
-    for s, d in CONFIG["SERVICES"].items():
+    for s, d in _services.items():
         for t in d["tasks"]:
             col_map[f"{s}: {t}"] = d["color"]
     return col_map
 
-def styler(v, col_map):
-    s = str(v)
-    if "FERIE" in s: return "background-color: #ffc4c4"
-    if "P." in s: return "background-color: #ffd966"
-    if "🎉" in s: return "background-color: #f4cccc"
-    for t, c in col_map.items():
-        if t in s: return f"background-color: {c}"
-    return ""
-
-def display_weeks(df_month, col_map, month_name, year):
-    weeks_list = []
-    current_week_cols = []
-    for col in df_month.columns:
-        if "Lun" in col and current_week_cols: 
-            weeks_list.append(df_month[current_week_cols])
-            current_week_cols = []
-        current_week_cols.append(col)
-    if current_week_cols: 
-        weeks_list.append(df_month[current_week_cols])
-
-    for i, w_df in enumerate(weeks_list):
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_skills_frame(skills_version, svc, _config):
+    """Matrice competenze (operatori x task) di un servizio"""
+    cols_show = [f"{svc}: {t}" for t in _config["SERVICES"][svc]["tasks"]]
+    rows = []
+    for op in _config["OPERATORS"]:
+        curr = _config["SKILLS"].get(op, [])
+        r = {"Operatore": op}
+        for c in cols_show: r[c] = c in curr
+        rows.append(r)
+    return pd.DataFrame(rows, columns=["Operatore"] + cols_show).set_index("Operatore")
+
+def get_style_map():
+    services = CONFIG["SERVICES"]
+    return cached_style_map(data_version(services), services)
+
+def display_weeks(df_month, col_map, month_name, year, month):
+    from exports import cached_export, frame_hash, month_bundle, split_weeks, week_csv, week_html
+    # Stili calcolati una volta per il mese, condivisi da tabella e export HTML
+    month_styles = get_cell_styler(col_map).frame_styles(df_month)
+    style_key = tuple(col_map.items())
+    file_base = f"Turni_{month_name}_{year}"
+
+    # Gli export si generano solo al click (data=callable) e restano in cache per contenuto
+    month_hash = frame_hash(df_month, style_key)
+    st.download_button(
+        label="📦 Scarica tutto il mese (ZIP: CSV, HTML e calendario ICS per settimana)",
+        data=lambda: cached_export(("zip", month_hash),
+                                   lambda: month_bundle(df_month, month_styles, month_name, year, month)),
+        file_name=f"{file_base}.zip",
+        mime="application/zip",
+        key=f"dl_zip_{year}_{month}"
+    )
+
+    for i, w_df in enumerate(split_weeks(df_month)):
         week_num = i + 1
         st.markdown(f"### 📅 Settimana {week_num}")
-        st.dataframe(w_df.style.applymap(lambda x: styler(x, col_map)), use_container_width=True)
+        w_styles = month_styles[w_df.columns]
+        st.dataframe(styled(w_df, w_styles), use_container_width=True)
         
+        w_hash = frame_hash(w_df, style_key)
+        title = f"Turni {month_name} {year} - Settimana {week_num}"
         c1, c2 = st.columns(2)
-        csv_data = w_df.to_csv(sep=";").encode("utf-8")
         c1.download_button(
             label=f"📥 Scarica CSV (Settimana {week_num})",
-            data=csv_data,
-            file_name=f"Turni_{month_name}_{year}_Week{week_num}.csv",
+            data=lambda w_df=w_df, w_hash=w_hash: cached_export(("csv", w_hash), lambda: week_csv(w_df)),
+            file_name=f"{file_base}_Week{week_num}.csv",
             mime="text/csv",
-            key=f"dl_csv_{month_name}_{week_num}_{random.randint(0,9999)}"
+            key=f"dl_csv_{year}_{month}_{week_num}"
         )
-        
-        def html_formatter(val):
-            return str(val).replace("\n", "<br>")
-            
-        html_table = w_df.style.applymap(lambda x: styler(x, col_map)).format(html_formatter).to_html()
-        
-        html_full = f"""
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                table {{ border-collapse: collapse; width: 100%; font-family: Arial, sans-serif; font-size: 12px; }}
-                th, td {{ border: 1px solid #999; padding: 8px; text-align: center; vertical-align: top; }}
-                th {{ background-color: #f2f2f2; }}
-                tr:nth-child(even) {{ background-color: #f9f9f9; }}
-                td {{ white-space: pre-wrap; }} 
-            </style>
-        </head>
-        <body>
-            <h3>Turni {month_name} {year} - Settimana {week_num}</h3>
-            {html_table}
-        </body>
-        </html>
-        """
         c2.download_button(
             label=f"📥 Scarica HTML (Settimana {week_num})",
-            data=html_full,
-            file_name=f"Turni_{month_name}_{year}_Week{week_num}.html",
+            data=lambda w_df=w_df, w_styles=w_styles, w_hash=w_hash, title=title:
+                cached_export(("html", w_hash), lambda: week_html(w_df, w_styles, title)),
+            file_name=f"{file_base}_Week{week_num}.html",
             mime="text/html",
-            key=f"dl_html_{month_name}_{week_num}_{random.randint(0,9999)}"
+            key=f"dl_html_{year}_{month}_{week_num}"
         )
         st.markdown("---")
 
@@ -216,140 +449,522 @@ def display_weeks(df_month, col_map, month_name, year):
 # 4. INTERFACCIA PRINCIPALE
 # ==============================================================================
 
-tab_gen, tab_settings = st.tabs(["🗓️ GENERAZIONE TURNI", "⚙️ IMPOSTAZIONI"])
+# Ogni sezione è un frammento (st.fragment): un widget modificato riesegue solo
+# la sua sezione, con gli argomenti dell'ultima esecuzione completa. Dipendenze:
+# - mese/anno e config salvata valgono per tutte: cambiano con un rerun completo
+# - assenze a schermo: session_state.absence_draft, scritta da griglia e intervalli
+# - parametri del motore: widget con chiave gen_*, letti al momento del calcolo
+# - turni generati o eliminati: rerun completo (cambiano visualizzazione e analisi)
+
+def timed_fragment(func):
+    """st.fragment che registra in session_state.fragment_ms la durata dell'ultima esecuzione"""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            st.session_state.setdefault("fragment_ms", {})[func.__name__] = (time.perf_counter() - t0) * 1000
+    return st.fragment(run)
+
+def long_run_fairness(year, month):
+    """Stato di equità dallo storico (None se disattivato)"""
+    if not st.session_state.gen_history: return None
+    from analytics import history_fairness
+    with rerun_timer.stage("indice storico"):
+        return history_fairness(refresh_history_index(), year, month)
+
+def edited_leaves(key):
+    """Assenze del mese come sono a schermo nell'editor, anche se non ancora salvate"""
+    draft = st.session_state.get("absence_draft")
+    if draft and draft["key"] == key: return draft["leaves"]
+    return st.session_state.leaves.get(key)
+
+def shifts_view(shifts, year, month):
+    """Turni dei giorni feriali, con l'orario del telefono accanto all'operatore"""
+    days, cols, _ = cached_calendar(year, month)
+    df = pd.DataFrame(shifts)
+    view = df[[c for i, c in enumerate(cols) if days[i].weekday() < 5 and c in df.columns]]
+    new_idx = []
+    for op in view.index:
+        t = CONFIG["TELEFONI"].get(op)
+        new_idx.append(f"{op} (☎️ {t})" if t else op)
+    view.index = new_idx
+    return view
 
 # ------------------------------------------------------------------------------
-# TAB IMPOSTAZIONI
+# SEZIONE ANALISI
 # ------------------------------------------------------------------------------
-with tab_settings:
-    st.header("⚙️ Configurazione")
 
-    # 1. SERVIZI
-    with st.expander("🎨 1. Servizi e Colori", expanded=True):
-        services = CONFIG["SERVICES"]
-        st.markdown("#### ➕ Crea Nuovo Servizio")
-        with st.container(border=True):
-            c1, c2 = st.columns([3, 1])
-            new_svc = c1.text_input("Nome nuovo servizio")
-            if c2.button("Aggiungi Servizio"):
-                if new_svc and new_svc not in services:
-                    services[new_svc] = {"color": "#cccccc", "tasks": []}
-                    save_file_to_github("config.json", CONFIG, st.session_state.config_sha)
-                    st.rerun()
-        
-        st.divider()
-        st.markdown("#### ✏️ Modifica Servizi")
-        for s_name, s_data in services.items():
-            c_col, c_name, c_del = st.columns([0.5, 3, 1])
-            new_color = c_col.color_picker(f"Colore {s_name}", s_data["color"], key=f"c_{s_name}")
-            c_name.markdown(f"**{s_name}**")
-            if new_color != s_data["color"]: s_data["color"] = new_color
-            
-            tasks_str = "\n".join(s_data["tasks"])
-            new_tasks = st.text_area(f"Task {s_name}", value=tasks_str, height=100, key=f"t_{s_name}")
-            
-            cb1, cb2 = st.columns([1, 5])
-            if cb1.button(f"💾 Salva {s_name}"):
-                s_data["tasks"] = [t.strip() for t in new_tasks.split("\n") if t.strip()]
-                save_file_to_github("config.json", CONFIG, st.session_state.config_sha)
-                st.rerun()
-            if c_del.button("🗑️ Elimina", key=f"del_{s_name}"):
-                del services[s_name]
-                save_file_to_github("config.json", CONFIG, st.session_state.config_sha)
+@timed_fragment
+def stats_section():
+    from analytics import load_table, pause_matrix, task_matrix
+    st.header("📊 Analisi dei turni salvati")
+    with rerun_timer.stage("indice storico"):
+        history = refresh_history_index(wait=False)
+    loading = months_loading()
+    if loading:
+        c_info, c_btn = st.columns([4, 1])
+        c_info.caption(f"⏳ {loading} mesi ancora in caricamento in background.")
+        c_btn.button("🔄 Aggiorna", key="stats_reload")
+    history_months = history.months()
+    if not history_months:
+        st.info("Nessun mese di turni salvato.")
+        return
+    if len(history_months) > 1:
+        first, last = st.select_slider("Periodo", options=history_months,
+                                       value=(history_months[0], history_months[-1]))
+        period = history_months[history_months.index(first):history_months.index(last) + 1]
+    else:
+        period = history_months
+    with rerun_timer.stage("analisi"):
+        frames = history.frames(period)
+        detail = st.radio("Dettaglio coperture", ["servizio", "task"], horizontal=True)
+        st.subheader("👥 Coperture per operatore (giorni)")
+        st.dataframe(task_matrix(frames, by=detail), use_container_width=True)
+        st.subheader("⚖️ Carico corretto per le assenze")
+        st.caption("Giorni disponibili = giorni lavorativi non in ferie (un permesso conta mezza giornata).")
+        st.dataframe(load_table(frames), use_container_width=True)
+        st.subheader("☕ Distribuzione delle pause")
+        st.dataframe(pause_matrix(frames), use_container_width=True)
+
+    st.subheader("🔎 Controllo dei turni salvati")
+    max_tasks = st.session_state.get("gen_max_tasks", 2)
+    st.caption(f"Competenze e operatori della config attuale, assenze salvate, al più {max_tasks} task al giorno, "
+               "pausa per chi lavora.")
+    if not st.toggle("Controlla i mesi del periodo", key="stats_validate"): return
+    with rerun_timer.stage("controllo"):
+        load_months_from_github(period)
+        violations = validate(CONFIG, {k: st.session_state.shifts.get(k) for k in period},
+                              {k: st.session_state.leaves.get(k) for k in period}, max_tasks)
+    if violations.empty:
+        st.success(f"Nessuna violazione in {len(period)} mesi.")
+    else:
+        st.dataframe(pd.DataFrame(list(violation_counts(violations).items()), columns=["regola", "violazioni"]),
+                     hide_index=True)
+        st.dataframe(violations, hide_index=True, use_container_width=True)
+
+# ------------------------------------------------------------------------------
+# SEZIONI IMPOSTAZIONI
+# ------------------------------------------------------------------------------
+# Le modifiche restano in CONFIG (bozza della sessione) e rieseguono solo la
+# sezione; un salvataggio che cambia la config riesegue tutta l'app.
+
+@timed_fragment
+def services_section():
+    services = CONFIG["SERVICES"]
+    st.markdown("#### ➕ Crea Nuovo Servizio")
+    with st.container(border=True):
+        c1, c2 = st.columns([3, 1])
+        new_svc = c1.text_input("Nome nuovo servizio")
+        if c2.button("Aggiungi Servizio"):
+            if new_svc and new_svc not in services:
+                services[new_svc] = {"color": "#cccccc", "tasks": []}
+                save_config()
                 st.rerun()
-            st.divider()
 
-    # 2. OPERATORI
-    with st.expander("👥 2. Operatori", expanded=False):
-        curr_ops = "\n".join(CONFIG["OPERATORS"])
-        new_ops = st.text_area("Lista Operatori", value=curr_ops, height=200)
-        if st.button("💾 Salva Operatori"):
-            CONFIG["OPERATORS"] = [x.strip() for x in new_ops.split("\n") if x.strip()]
-            CONFIG["SKILLS"] = {op: CONFIG["SKILLS"].get(op, []) for op in CONFIG["OPERATORS"]}
-            save_file_to_github("config.json", CONFIG, st.session_state.config_sha)
-            st.rerun()
+    st.divider()
+    st.markdown("#### ✏️ Modifica Servizi")
+    for s_name, s_data in services.items():
+        c_col, c_name, c_del = st.columns([0.5, 3, 1])
+        new_color = c_col.color_picker(f"Colore {s_name}", s_data["color"], key=f"c_{s_name}")
+        c_name.markdown(f"**{s_name}**")
+        if new_color != s_data["color"]: s_data["color"] = new_color
 
-    # 3. MATRICE
-    with st.expander("🛠️ 3. Matrice Competenze", expanded=False):
-        svc_names = list(CONFIG["SERVICES"].keys())
-        if svc_names:
-            sel_svc = st.selectbox("Filtra per Servizio:", svc_names)
-            svc_tasks = CONFIG["SERVICES"][sel_svc]["tasks"]
-            cols_show = [f"{sel_svc}: {t}" for t in svc_tasks]
-            
-            rows = []
-            for op in CONFIG["OPERATORS"]:
-                curr = CONFIG["SKILLS"].get(op, [])
-                r = {"Operatore": op}
-                for c in cols_show: r[c] = c in curr
-                rows.append(r)
-            
-            df_sk = pd.DataFrame(rows).set_index("Operatore")
-            ed_sk = st.data_editor(df_sk, use_container_width=True, key=f"ed_{sel_svc}")
-            
-            if st.button(f"💾 Salva Competenze ({sel_svc})"):
-                for op, row in ed_sk.iterrows():
-                    old = CONFIG["SKILLS"].get(op, [])
-                    others = [s for s in old if not s.startswith(f"{sel_svc}:")]
-                    new_sel = [c for c in cols_show if row[c]]
-                    CONFIG["SKILLS"][op] = others + new_sel
-                save_file_to_github("config.json", CONFIG, st.session_state.config_sha)
-                st.success("Salvato!")
-
-    # 4. PAUSE
-    with st.expander("☕ 4. Telefoni & Pause", expanded=False):
-        c1, c2 = st.columns(2)
-        
-        with c1:
-            st.markdown("#### 📞 Orari Telefono")
-            ph_rows = []
-            for op in CONFIG["OPERATORS"]:
-                ph_rows.append({"Operatore": op, "Orario Telefono": CONFIG["TELEFONI"].get(op, "")})
-            
-            df_ph = pd.DataFrame(ph_rows)
-            ed_ph = st.data_editor(df_ph, hide_index=True, use_container_width=True, key="ph_editor")
-            
-        with c2:
-            st.markdown("#### 🥪 Gestione Pause (Fisse vs Variabili)")
-            st.info("Se lasci l'orario **VUOTO**, la pausa sarà **VARIABILE**. Se scrivi un orario, sarà **FISSA**.")
-            
-            pause_rows = []
-            for op in CONFIG["OPERATORS"]:
-                fixed_p = CONFIG["PAUSE"]["FISSI"].get(op, "")
-                pause_rows.append({"Operatore": op, "Orario Pausa (Es. 13:00)": fixed_p})
-            
-            df_pause = pd.DataFrame(pause_rows)
-            ed_pause = st.data_editor(df_pause, hide_index=True, use_container_width=True, key="pause_editor")
-            
-            st.markdown("##### 🎰 Slot per Pause Variabili")
-            slots_str = "\n".join(CONFIG["PAUSE"]["SLOTS"])
-            new_slots = st.text_area("Elenco Slot (uno per riga)", value=slots_str, height=100)
-
-        if st.button("💾 Salva Telefoni e Pause"):
-            new_telefoni = {}
-            for index, row in ed_ph.iterrows():
-                if row["Orario Telefono"]:
-                    new_telefoni[row["Operatore"]] = row["Orario Telefono"]
-            CONFIG["TELEFONI"] = new_telefoni
-            
-            new_fissi = {}
-            for index, row in ed_pause.iterrows():
-                if row["Orario Pausa (Es. 13:00)"]:
-                    new_fissi[row["Operatore"]] = row["Orario Pausa (Es. 13:00)"]
-            CONFIG["PAUSE"]["FISSI"] = new_fissi
-            
-            CONFIG["PAUSE"]["SLOTS"] = [x.strip() for x in new_slots.split("\n") if x.strip()]
-            
-            save_file_to_github("config.json", CONFIG, st.session_state.config_sha)
-            st.success("Configurazione salvata!")
+        tasks_str = "\n".join(s_data["tasks"])
+        new_tasks = st.text_area(f"Task {s_name}", value=tasks_str, height=100, key=f"t_{s_name}")
+
+        cb1, cb2 = st.columns([1, 5])
+        if cb1.button(f"💾 Salva {s_name}"):
+            s_data["tasks"] = [t.strip() for t in new_tasks.split("\n") if t.strip()]
+            save_config()
+            st.rerun()
+        if c_del.button("🗑️ Elimina", key=f"del_{s_name}"):
+            del services[s_name]
+            save_config()
             st.rerun()
+        st.divider()
+
+@timed_fragment
+def operators_section():
+    curr_ops = "\n".join(CONFIG["OPERATORS"])
+    new_ops = st.text_area("Lista Operatori", value=curr_ops, height=200)
+    if st.button("💾 Salva Operatori"):
+        CONFIG["OPERATORS"] = [x.strip() for x in new_ops.split("\n") if x.strip()]
+        CONFIG["SKILLS"] = {op: CONFIG["SKILLS"].get(op, []) for op in CONFIG["OPERATORS"]}
+        save_config()
+        st.rerun()
+
+@timed_fragment
+def skills_section():
+    svc_names = list(CONFIG["SERVICES"].keys())
+    if not svc_names: return
+    sel_svc = st.selectbox("Filtra per Servizio:", svc_names)
+    svc_tasks = CONFIG["SERVICES"][sel_svc]["tasks"]
+    cols_show = [f"{sel_svc}: {t}" for t in svc_tasks]
+
+    with rerun_timer.stage("frame competenze"):
+        df_sk = cached_skills_frame(skills_fingerprint(CONFIG), sel_svc, CONFIG)
+    ed_sk = st.data_editor(df_sk, use_container_width=True, key=f"ed_{sel_svc}")
+
+    if st.button(f"💾 Salva Competenze ({sel_svc})"):
+        for op, row in ed_sk.iterrows():
+            old = CONFIG["SKILLS"].get(op, [])
+            others = [s for s in old if not s.startswith(f"{sel_svc}:")]
+            new_sel = [c for c in cols_show if row[c]]
+            CONFIG["SKILLS"][op] = others + new_sel
+        save_config()
+        st.success("Salvato!")
+
+@timed_fragment
+def phones_section():
+    c1, c2 = st.columns(2)
+
+    with c1:
+        st.markdown("#### 📞 Orari Telefono")
+        ph_rows = []
+        for op in CONFIG["OPERATORS"]:
+            ph_rows.append({"Operatore": op, "Orario Telefono": CONFIG["TELEFONI"].get(op, "")})
+
+        df_ph = pd.DataFrame(ph_rows)
+        ed_ph = st.data_editor(df_ph, hide_index=True, use_container_width=True, key="ph_editor")
+
+    with c2:
+        st.markdown("#### 🥪 Gestione Pause (Fisse vs Variabili)")
+        st.info("Se lasci l'orario **VUOTO**, la pausa sarà **VARIABILE**. Se scrivi un orario, sarà **FISSA**.")
+
+        pause_rows = []
+        for op in CONFIG["OPERATORS"]:
+            fixed_p = CONFIG["PAUSE"]["FISSI"].get(op, "")
+            pause_rows.append({"Operatore": op, "Orario Pausa (Es. 13:00)": fixed_p})
+
+        df_pause = pd.DataFrame(pause_rows)
+        ed_pause = st.data_editor(df_pause, hide_index=True, use_container_width=True, key="pause_editor")
+
+        st.markdown("##### 🎰 Slot per Pause Variabili")
+        slots_str = "\n".join(CONFIG["PAUSE"]["SLOTS"])
+        new_slots = st.text_area("Elenco Slot (uno per riga)", value=slots_str, height=100)
+
+    if st.button("💾 Salva Telefoni e Pause"):
+        new_telefoni = {}
+        for index, row in ed_ph.iterrows():
+            if row["Orario Telefono"]:
+                new_telefoni[row["Operatore"]] = row["Orario Telefono"]
+        CONFIG["TELEFONI"] = new_telefoni
+
+        new_fissi = {}
+        for index, row in ed_pause.iterrows():
+            if row["Orario Pausa (Es. 13:00)"]:
+                new_fissi[row["Operatore"]] = row["Orario Pausa (Es. 13:00)"]
+        CONFIG["PAUSE"]["FISSI"] = new_fissi
+
+        CONFIG["PAUSE"]["SLOTS"] = [x.strip() for x in new_slots.split("\n") if x.strip()]
+
+        save_config()
+        st.success("Configurazione salvata!")
+        st.rerun()
+
+@timed_fragment
+def api_section():
+    # Il pulsante aggiorna solo questa sezione
+    from localdb import SQLiteStorage
+    st.button("🔄 Aggiorna statistiche")
+    storage = get_storage()
+    github = storage.remote if isinstance(storage, SQLiteStorage) else storage
+    if isinstance(storage, SQLiteStorage):
+        db_status = storage.status()
+        db_info = f"Archivio locale SQLite `{db_status['db']}`: {db_status['dirty']} file da sincronizzare"
+        if db_status["last_sync"]:
+            db_info += f", ultima sincronizzazione {datetime.datetime.fromtimestamp(db_status['last_sync']):%H:%M:%S}"
+        if db_status["last_error"]: db_info += f", errore: {db_status['last_error']}"
+        st.caption(db_info)
+    if github is None:
+        st.info("GitHub non configurato: l'app lavora offline sull'archivio locale.")
+        return
+    api_stats = github.stats.snapshot()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Chiamate", api_stats["calls"])
+    m2.metric("Non modificati (304)", api_stats["not_modified"])
+    m3.metric("KB scaricati / inviati", f"{api_stats['bytes_down'] / 1024:.0f} / {api_stats['bytes_up'] / 1024:.0f}")
+    m4.metric("Latenza media", f"{api_stats['latency_avg_ms']} ms")
+    queue_status = get_save_queue().status()
+    st.caption(f"Coda salvataggi: {queue_status['commits']} commit, {queue_status['files']} file scritti, "
+               f"{len(queue_status['pending'])} in attesa")
+    shared_status = get_shared_data().status()
+    last_refresh = shared_status["last_refresh"]
+    last_refresh = f"{datetime.datetime.fromtimestamp(last_refresh):%H:%M:%S}" if last_refresh else "mai"
+    st.caption(f"Cache condivisa: {shared_status['files']} file per tutte le sessioni "
+               f"({shared_status['prefetching']} in caricamento), "
+               f"versione {shared_status['version']}, ultimo controllo remoto {last_refresh}")
+    st.json(api_stats, expanded=False)
+
+# ------------------------------------------------------------------------------
+# SEZIONI GENERAZIONE
+# ------------------------------------------------------------------------------
+
+@timed_fragment
+def engine_params():
+    """Parametri del motore: restano in session_state (gen_*) fino al calcolo"""
+    # DEFAULT CAMBIATO DA 3 A 2
+    st.slider("Max Task Simultanei", 1, 6, 2, key="gen_max_tasks")
+    engine_mode = st.radio("Motore di assegnazione", MODES, horizontal=True, key="gen_mode",
+                           format_func=lambda m: {MODE_GREEDY: "Veloce (greedy)", MODE_OPTIMAL: "Ottimale (min-cost)"}[m])
+    st.number_input("Tentativi (tiene il migliore)", 1, 1000, 1, disabled=engine_mode == MODE_OPTIMAL, key="gen_trials",
+                    help=f"Solo greedy: prova più semi per al massimo {SEARCH_BUDGET_S:.0f} s e tiene il mese col punteggio migliore.")
+    st.text_input("Seed (vuoto = casuale)", key="gen_seed",
+                  help="Con lo stesso seed si riottengono esattamente gli stessi turni.")
+    st.checkbox("⚖️ Equità sugli ultimi 12 mesi salvati", key="gen_history",
+                help="Parte dai conteggi per task dei mesi precedenti, corretti per le assenze.")
+
+def absence_draft(year, month, key):
+    """Bozza delle assenze a schermo (formato compatto): la leggono griglia, intervalli e calcolo.
+
+    Si ricarica cambiando mese o, se non ci sono modifiche, quando cambiano le
+    assenze salvate (anche da un'altra sessione).
+    """
+    saved = st.session_state.leaves.get(key, {})
+    saved_version = data_version(saved)
+    draft = st.session_state.get("absence_draft")
+    if draft is None or draft["key"] != key or (not draft["dirty"] and draft["base"] != saved_version):
+        leaves = from_cells(to_cells(saved))
+        if "ferie" not in saved:
+            # Mese mai salvato: fine settimana e festività già segnati come ferie
+            days, _, hols = cached_calendar(year, month)
+            off = [d.day for d in days if d.weekday() >= 5 or d in hols]
+            leaves["ferie"] = {op: list(off) for op in CONFIG["OPERATORS"]}
+        rev = draft["rev"] + 1 if draft else 0
+        draft = {"key": key, "leaves": leaves, "base": saved_version, "dirty": False, "rev": rev}
+        st.session_state.absence_draft = draft
+    return draft
+
+def absence_filter_ops(name_filter, service):
+    """Operatori della config filtrati per nome e servizio (competenze)"""
+    ops = CONFIG["OPERATORS"]
+    if service:
+        ops = [op for op in ops if any(s.startswith(f"{service}:") for s in CONFIG["SKILLS"].get(op, []))]
+    if name_filter:
+        ops = [op for op in ops if name_filter.lower() in op.lower()]
+    return ops
+
+@timed_fragment
+def absence_editor(year, month, key):
+    _, cols, _ = cached_calendar(year, month)
+    draft = absence_draft(year, month, key)
+
+    with st.expander("↔️ Inserisci un intervallo (es. ferie dal 10 al 21)", expanded=False):
+        r1, r2, r3 = st.columns([2, 1, 2])
+        range_ops = r1.multiselect("Operatori", CONFIG["OPERATORS"], key="range_ops")
+        range_kind = r2.selectbox("Assenza", RANGE_KINDS, key="range_kind",
+                                  format_func=lambda k: ABSENCE_LABELS[KINDS.index(k) + 1] if k else "Nessuna (cancella)")
+        first, last = r3.slider("Giorni", 1, len(cols), (1, len(cols)), key="range_days")
+        if st.button("Applica intervallo", disabled=not range_ops):
+            draft["leaves"] = set_range(draft["leaves"], range_ops, range_kind, first, last)
+            draft["dirty"] = True
+            # Editor nuovo: le modifiche già nella bozza non devono coprire l'intervallo
+            draft["rev"] += 1
+
+    f1, f2, f3 = st.columns([2, 2, 1])
+    name_filter = f1.text_input("🔎 Cerca operatore", key="abs_name")
+    service = f2.selectbox("Servizio", [""] + list(CONFIG["SERVICES"]), key="abs_service",
+                           format_func=lambda s: s or "Tutti")
+    ops = absence_filter_ops(name_filter, service)
+    n_pages = max(1, -(-len(ops) // ABSENCE_PAGE_SIZE))
+    page = f3.selectbox("Pagina", range(1, n_pages + 1), format_func=lambda p: f"{p} / {n_pages}")
+    page_ops = ops[(page - 1) * ABSENCE_PAGE_SIZE:page * ABSENCE_PAGE_SIZE]
+
+    if not page_ops:
+        st.info("Nessun operatore corrisponde al filtro.")
+    else:
+        st.caption(f"Operatori {(page - 1) * ABSENCE_PAGE_SIZE + 1}–{(page - 1) * ABSENCE_PAGE_SIZE + len(page_ops)} "
+                   f"di {len(ops)}. Un'assenza per cella: FERIE (giornata intera), P.MATT o P.POM (permesso).")
+        with rerun_timer.stage("griglia assenze"):
+            grid = grid_frame(draft["leaves"], page_ops, cols)
+        column_config = {c: st.column_config.SelectboxColumn(c, options=ABSENCE_LABELS, width="small") for c in cols}
+        edited = st.data_editor(grid, column_config=column_config, height=400,
+                                key=f"ed_assenze_{key}_{draft['rev']}_{data_version(page_ops)[:8]}")
+        merged = merge_grid(draft["leaves"], edited)
+        if merged != draft["leaves"]:
+            draft["leaves"] = merged
+            draft["dirty"] = True
+
+    if st.button("💾 SALVA ASSENZE SU CLOUD", type="secondary"):
+        with st.spinner("Salvataggio..."):
+            st.session_state.leaves[key] = draft["leaves"]
+            save_month_to_github("leaves", key, draft["leaves"])
+            draft["dirty"] = False
+            draft["base"] = data_version(draft["leaves"])
+            st.success("Assenze salvate! Invio a GitHub in background.")
+
+@timed_fragment
+def generation_controls(year, month, month_name, key):
+    saved_shifts_for_month = st.session_state.shifts.get(key, None)
+    smart_update = False
+
+    if saved_shifts_for_month:
+        st.warning(f"Ci sono turni già salvati per {month_name} {year}.")
+        col_opt1, col_opt2 = st.columns([1, 1])
+        with col_opt1:
+            smart_update = st.checkbox("🔄 Preserva turni esistenti (Modifica solo assenti)", value=True)
+        with col_opt2:
+            if st.button("🗑️ ELIMINA TURNI SALVATI (RESET)", type="primary"):
+                if delete_month_from_github("shifts", key):
+                    st.session_state.pop("last_run", None)
+                    st.rerun()
+
+    if st.button("🚀 CALCOLA TURNI", type="primary"):
+        params = st.session_state
+        month_leaves = edited_leaves(key)
+        previous = saved_shifts_for_month if smart_update else None
+        run_seed = int(params.gen_seed) if params.gen_seed.strip().isdigit() else random.randrange(1_000_000)
+        only_days = None
+        if previous:
+            # Rigenerazione incrementale: solo i giorni toccati dalle modifiche alle assenze
+            changed = changed_days(st.session_state.leaves.get(key), month_leaves)
+            only_days = affected_days(CONFIG, month_leaves, year, month, previous, changed)
+        fairness = long_run_fairness(year, month)
+        from search import best_of, score_schedule
+        t0 = time.perf_counter()
+        with rerun_timer.stage("motore"):
+            if params.gen_trials > 1 and params.gen_mode == MODE_GREEDY:
+                search = best_of(CONFIG, month_leaves, year, month, params.gen_max_tasks, n_trials=params.gen_trials,
+                                 base_seed=run_seed, budget_s=SEARCH_BUDGET_S, patience=SEARCH_PATIENCE,
+                                 previous_shifts=previous, only_days=only_days, fairness=fairness)
+                out, missing, run_seed = search.out, search.missing, search.seed
+                run_info = f"migliore di {search.trials} tentativi in {search.elapsed:.1f} s, punteggio {search.score.total}"
+            else:
+                out, missing = schedule_month(CONFIG, month_leaves, year, month, params.gen_max_tasks,
+                                              previous_shifts=previous, seed=run_seed, mode=params.gen_mode,
+                                              only_days=only_days, fairness=fairness)
+                run_info = f"punteggio {score_schedule(CONFIG, out, missing, params.gen_max_tasks).total}"
+
+        with rerun_timer.stage("controllo"):
+            violations = validate_month(CONFIG, out, month_leaves, year, month, params.gen_max_tasks)
+
+        # Controllo prima del salvataggio: con violazioni il mese resta una bozza in last_run
+        # e diventa il turno salvato (base di "Preserva") solo su conferma
+        if violations.empty:
+            st.session_state.shifts[key] = out
+            save_month_to_github("shifts", key, out)
+        st.session_state.last_run = {"key": key, "out": out, "seed": run_seed, "info": run_info, "missing": missing,
+                                     "only_days": only_days, "ms": (time.perf_counter() - t0) * 1000,
+                                     "violations": violations, "saved": violations.empty}
+        # I turni nuovi cambiano anche visualizzazione e analisi: rerun completo
+        st.rerun()
+
+@timed_fragment
+def results_viewer(year, month, month_name, key):
+    run = st.session_state.get("last_run")
+    if run and run["key"] != key:
+        st.session_state.pop("last_run")
+        run = None
+    shifts = run["out"] if run else st.session_state.shifts.get(key, None)
+    if not shifts: return
+
+    if run:
+        st.success("Turni Generati!")
+        st.caption(f"Seed {run['seed']} ({run['info']}, {run['ms']:.0f} ms): "
+                   "inseriscilo nel campo Seed per riottenere gli stessi turni.")
+        only_days = run["only_days"]
+        if only_days is not None:
+            st.caption(f"🔄 Ricalcolati {len(only_days)} giorni su {len(shifts)}"
+                       + (f" ({', '.join(str(d) for d in sorted(only_days))})" if only_days else "")
+                       + ": gli altri sono rimasti identici ai turni salvati.")
+        if run["missing"]: st.warning("Non assegnati:"); st.json(run["missing"])
+        violations = run["violations"]
+        if not violations.empty:
+            counts = ", ".join(f"{rule}: {n}" for rule, n in violation_counts(violations).items())
+            if run["saved"]:
+                st.warning(f"Salvati nonostante il controllo ({counts}).")
+            else:
+                st.error(f"🔎 Controllo non superato, turni NON salvati ({counts}).")
+            st.dataframe(violations, hide_index=True, use_container_width=True)
+            if not run["saved"] and st.button("💾 SALVA COMUNQUE"):
+                st.session_state.shifts[key] = shifts
+                save_month_to_github("shifts", key, shifts)
+                run["saved"] = True
+                st.rerun()
+    else:
+        st.divider()
+        st.subheader(f"📂 Turni Salvati: {month_name} {year}")
+
+    with rerun_timer.stage("tabelle settimanali"):
+        display_weeks(shifts_view(shifts, year, month), get_style_map(), month_name, year, month)
+
+    with st.expander("☕ Copertura pause per fascia", expanded=False):
+        day = st.selectbox("Giorno", list(shifts), key=f"pause_day_{key}")
+        coverage = pause_coverage(CONFIG, {day: shifts[day]})
+        if coverage:
+            st.caption("Persone al banco per servizio in ogni fascia (chi copre un servizio ha almeno un suo task del giorno).")
+            st.dataframe(pd.DataFrame(coverage).drop(columns="giorno"), hide_index=True, use_container_width=True)
+        else:
+            st.info("Nessun operatore al lavoro in questo giorno.")
+
+@timed_fragment
+def batch_generation(year, month, month_name, key):
+    st.caption(f"Parte da {month_name} {year} con le assenze salvate di ogni mese (per {month_name} quelle a schermo). "
+               "L'equità (conteggi, settimana a cavallo, rotazione pause) prosegue da un mese all'altro; "
+               "i mesi che superano il controllo vengono salvati con un solo commit.")
+    cb1, cb2 = st.columns(2)
+    n_batch = cb1.number_input("Numero di mesi", 1, 12, 3)
+    batch_preserve = cb2.checkbox("🔄 Preserva turni esistenti", value=True, key="batch_preserve")
+    if st.button("🚀 CALCOLA PERIODO", type="primary"):
+        from batch import report as batch_report, schedule_range
+        params = st.session_state
+        batch_keys = [leaves_key(y, m) for y, m in month_range(year, month, n_batch)]
+        with rerun_timer.stage("caricamento mese"):
+            load_months_from_github(batch_keys)
+        batch_leaves = {k: st.session_state.leaves.get(k) for k in batch_keys}
+        batch_leaves[key] = edited_leaves(key)
+        batch_previous = {k: st.session_state.shifts.get(k) for k in batch_keys} if batch_preserve else None
+        batch_fairness = long_run_fairness(year, month)
+        with rerun_timer.stage("motore"):
+            batch_results = schedule_range(CONFIG, batch_leaves, year, month, n_batch, params.gen_max_tasks,
+                                           mode=params.gen_mode, previous_by_key=batch_previous,
+                                           fairness=batch_fairness)
+        # Stesso controllo del singolo mese: si salvano solo i mesi senza violazioni
+        blocked, passed = {}, {}
+        with rerun_timer.stage("controllo"):
+            for r in batch_results:
+                violations = validate_month(CONFIG, r.out, batch_leaves[r.key], *map(int, r.key.split("_")),
+                                            params.gen_max_tasks)
+                if violations.empty: passed[r.key] = r.out
+                else: blocked[r.key] = violations
+        for k, out in passed.items(): st.session_state.shifts[k] = out
+        save_months_to_github("shifts", passed)
+        st.session_state.pop("last_run", None)
+        st.session_state.batch_run = {
+            "key": key,
+            "ms": sum(r.ms for r in batch_results),
+            "report": batch_report(batch_results),
+            "missing": {r.key: r.missing for r in batch_results if r.missing},
+            "blocked": blocked,
+        }
+        # Come per il singolo mese: turni cambiati, rerun completo
+        st.rerun()
+
+    run = st.session_state.get("batch_run")
+    if run and run["key"] == key:
+        blocked = run["blocked"]
+        n_saved = len(run["report"]) - len(blocked)
+        st.success(f"Generati {len(run['report'])} mesi in {run['ms']:.0f} ms, {n_saved} in salvataggio.")
+        st.dataframe(pd.DataFrame(run["report"]), hide_index=True, use_container_width=True)
+        if blocked:
+            st.error(f"🔎 Controllo non superato, turni NON salvati: {', '.join(blocked)}.")
+            for k, violations in blocked.items():
+                counts = ", ".join(f"{rule}: {n}" for rule, n in violation_counts(violations).items())
+                with st.expander(f"{k}: {len(violations)} violazioni ({counts})"):
+                    st.dataframe(violations, hide_index=True, use_container_width=True)
+        if run["missing"]: st.warning("Non assegnati:"); st.json(run["missing"], expanded=False)
 
 # ------------------------------------------------------------------------------
-# TAB GENERAZIONE
+# PAGINA
 # ------------------------------------------------------------------------------
+
+# Le schede sono già create (vedi "MODULI DELL'APP"); prima la scheda visibile all'apertura
 with tab_gen:
     st.header("Gestione Turni")
-    
+
+    # Mese e anno valgono per tutte le sezioni: cambiarli riesegue l'app
     c1, c2, c3 = st.columns(3)
     with c1:
         mesi = ["Gennaio", "Febbraio", "Marzo", "Aprile", "Maggio", "Giugno", "Luglio", "Agosto", "Settembre", "Ottobre", "Novembre", "Dicembre"]
@@ -358,243 +973,63 @@ with tab_gen:
     with c2:
         anno_s = st.number_input("Anno", 2024, 2030, 2026)
     with c3:
-        # DEFAULT CAMBIATO DA 3 A 2
-        max_tasks = st.slider("Max Task Simultanei", 1, 6, 2)
-
-    LEAVES_KEY = f"{anno_s}_{mese_n}"
-    _, nd = calendar.monthrange(anno_s, mese_n)
-    days = [date(anno_s, mese_n, x) for x in range(1, nd+1)]
-    hols = holidays.IT(years=anno_s)
-    cols = [f"{d.day:02d} {['Lun','Mar','Mer','Gio','Ven','Sab','Dom'][d.weekday()]}" for d in days]
-    ops = CONFIG["OPERATORS"]
-    
+        engine_params()
+
+    LEAVES_KEY = leaves_key(anno_s, mese_n)
+    with rerun_timer.stage("caricamento mese"):
+        load_month_from_github(LEAVES_KEY)
+    # Gli altri mesi salvati arrivano in background (analisi, più mesi di seguito)
+    prefetch_months()
+
     st.divider()
-    
-    # 1. GESTIONE ASSENZE
-    current_leaves = st.session_state.leaves.get(LEAVES_KEY, {"ferie": {}, "p_matt": {}, "p_pom": {}})
-    
-    def create_bool_df(saved_dict, prefill_weekends=False):
-        df = pd.DataFrame(False, index=ops, columns=cols)
-        if prefill_weekends and not saved_dict:
-            for i, c in enumerate(cols):
-                if days[i].weekday() >= 5 or days[i] in hols: df[c] = True
-        if saved_dict:
-            temp_df = pd.DataFrame(saved_dict)
-            df.update(temp_df)
-            df = df.fillna(False).astype(bool)
-        return df
-
-    t1, t2, t3 = st.tabs(["🔴 FERIE", "🟡 P. MATTINA", "🟠 P. POMERIGGIO"])
-    with t1:
-        st.caption("Spunta i giorni di assenza completa.")
-        df_ferie = create_bool_df(current_leaves.get("ferie"), prefill_weekends=True)
-        in_ferie = st.data_editor(df_ferie, key="ed_ferie", height=250)
-    with t2:
-        df_pm = create_bool_df(current_leaves.get("p_matt"))
-        in_pm = st.data_editor(df_pm, key="ed_pm", height=250)
-    with t3:
-        df_pp = create_bool_df(current_leaves.get("p_pom"))
-        in_pp = st.data_editor(df_pp, key="ed_pp", height=250)
 
-    if st.button("💾 SALVA ASSENZE SU CLOUD", type="secondary"):
-        with st.spinner("Salvataggio..."):
-            st.session_state.leaves[LEAVES_KEY] = {
-                "ferie": in_ferie.to_dict(),
-                "p_matt": in_pm.to_dict(),
-                "p_pom": in_pp.to_dict()
-            }
-            res, new_sha = save_file_to_github("leaves.json", st.session_state.leaves, st.session_state.leaves_sha)
-            if res:
-                st.session_state.leaves_sha = new_sha
-                st.success("Assenze salvate!")
+    # 1. GESTIONE ASSENZE
+    absence_editor(anno_s, mese_n, LEAVES_KEY)
 
     st.divider()
 
     # 2. LOGICA TURNI
-    saved_shifts_for_month = st.session_state.shifts.get(LEAVES_KEY, None)
-    smart_update = False
-    
-    if saved_shifts_for_month:
-        st.warning(f"Ci sono turni già salvati per {mese_s} {anno_s}.")
-        col_opt1, col_opt2 = st.columns([1, 1])
-        with col_opt1:
-            smart_update = st.checkbox("🔄 Preserva turni esistenti (Modifica solo assenti)", value=True)
-        with col_opt2:
-            if st.button("🗑️ ELIMINA TURNI SALVATI (RESET)", type="primary"):
-                del st.session_state.shifts[LEAVES_KEY]
-                res, new_sha = save_file_to_github("shifts.json", st.session_state.shifts, st.session_state.shifts_sha)
-                if res:
-                    st.session_state.shifts_sha = new_sha
-                    st.rerun()
+    generation_controls(anno_s, mese_n, mese_s, LEAVES_KEY)
 
-    if st.button("🚀 CALCOLA TURNI", type="primary"):
-        out = {}
-        missing = {}
-        cnt = {op: {} for op in ops}
-        
-        all_tasks = []
-        for s, d in CONFIG["SERVICES"].items():
-            for t in d["tasks"]:
-                all_tasks.append(f"{s}: {t}")
-        
-        def scarcity(t): return sum(1 for op in ops if t in CONFIG["SKILLS"].get(op, []))
-        all_tasks.sort(key=scarcity)
-        
-        weekly_assignments = {} 
-        last_week_assignments = {} 
-        weekly_lunches = {}
-        current_week_idx = 0 
-        
-        for i, col in enumerate(cols):
-            d_obj = days[i]
-            if d_obj.weekday() == 0:
-                last_week_assignments = copy.deepcopy(weekly_assignments)
-                weekly_assignments = {}
-                weekly_lunches = {}
-                current_week_idx += 1
-
-            if d_obj.weekday() >= 5: 
-                out[col] = {op: "" for op in ops}; continue
-            if d_obj in hols: 
-                out[col] = {op: f"🎉 {hols[d_obj]}" for op in ops}; continue
-
-            day_ass = {op: "" for op in ops}
-            available_ops = []
-            for op in ops:
-                if in_ferie.at[op, col]: day_ass[op] = "FERIE"
-                elif in_pm.at[op, col]: day_ass[op] = "P.MATT"; available_ops.append(op)
-                elif in_pp.at[op, col]: day_ass[op] = "P.POM"; available_ops.append(op)
-                else: available_ops.append(op)
-            
-            if not available_ops:
-                out[col] = day_ass; continue
+    # 3. TURNI GENERATI O SALVATI
+    results_viewer(anno_s, mese_n, mese_s, LEAVES_KEY)
 
-            tasks_to_assign = copy.deepcopy(all_tasks)
-            assigned_this_day = []
-            
-            # SMART UPDATE
-            if smart_update and saved_shifts_for_month and col in saved_shifts_for_month:
-                saved_day = saved_shifts_for_month[col]
-                for op in available_ops:
-                    if op in saved_day:
-                        prev = saved_day[op]
-                        found_tasks = [t for t in tasks_to_assign if t in prev]
-                        if found_tasks:
-                            day_ass[op] = prev
-                            assigned_this_day.append(op)
-                            for ft in found_tasks: 
-                                if ft in tasks_to_assign: tasks_to_assign.remove(ft)
-                            if d_obj.weekday() == 0:
-                                if op not in weekly_assignments: weekly_assignments[op] = []
-                                weekly_assignments[op].extend(found_tasks)
-
-            # STANDARD
-            for op in available_ops:
-                if op not in assigned_this_day and op in weekly_assignments:
-                    my_weekly = weekly_assignments[op]
-                    valid_weekly = [t for t in my_weekly if t in tasks_to_assign]
-                    confirmed = valid_weekly[:max_tasks]
-                    for t in confirmed: tasks_to_assign.remove(t)
-                    
-                    if confirmed:
-                        t_str = " + ".join(confirmed)
-                        prefix = f"({day_ass[op]}) " if "P." in day_ass[op] else ""
-                        if day_ass[op] and "P." not in day_ass[op]: day_ass[op] += " + " + t_str
-                        else: day_ass[op] = prefix + t_str
-                        assigned_this_day.append(op)
-
-            # NEW TASKS
-            def load(op):
-                if day_ass[op] in ["FERIE", "P.MATT", "P.POM"]: return 99
-                if op in assigned_this_day: return day_ass[op].count('+') + 1
-                if not day_ass[op]: return 0
-                return day_ass[op].count('+') + 1
-
-            for t in tasks_to_assign:
-                cands = [op for op in available_ops if t in CONFIG["SKILLS"].get(op, [])]
-                if not cands:
-                    if col not in missing: missing[col] = []
-                    missing[col].append(t)
-                    continue
-                
-                random.shuffle(cands)
-                cands.sort(key=lambda x: (
-                    load(x), 
-                    1 if t in last_week_assignments.get(x, []) else 0,
-                    cnt[x].get(t, 0)
-                ))
-                
-                chosen = None
-                for op in cands:
-                    if load(op) < max_tasks: chosen = op; break
-                if not chosen: 
-                    for op in cands:
-                        if day_ass[op] not in ["FERIE"]: chosen = op; break
-                
-                if chosen:
-                    prefix = f"({day_ass[chosen]}) " if "P." in day_ass[chosen] else ""
-                    if day_ass[chosen] and "P." not in day_ass[chosen]: day_ass[chosen] += f" + {t}"
-                    else: day_ass[chosen] = prefix + t
-                    cnt[chosen][t] = cnt[chosen].get(t, 0) + 1
-                    assigned_this_day.append(chosen)
-                    if d_obj.weekday() == 0:
-                        if chosen not in weekly_assignments: weekly_assignments[chosen] = []
-                        weekly_assignments[chosen].append(t)
-
-            # PAUSE
-            base_slots = copy.deepcopy(CONFIG["PAUSE"]["SLOTS"])
-            if base_slots:
-                rotate_idx = current_week_idx % len(base_slots)
-                rotated_slots = base_slots[rotate_idx:] + base_slots[:rotate_idx]
-            else:
-                rotated_slots = []
-            s_i = 0
-            for op in available_ops:
-                has_pause = "☕" in day_ass[op]
-                if not has_pause and "P." not in day_ass[op] and "FERIE" not in day_ass[op]:
-                    p_time = None
-                    if op in CONFIG["PAUSE"]["FISSI"]: p_time = CONFIG["PAUSE"]["FISSI"][op]
-                    elif op in weekly_lunches: p_time = weekly_lunches[op]
-                    elif rotated_slots:
-                        p_time = rotated_slots[s_i % len(rotated_slots)]; s_i += 1
-                        if d_obj.weekday() == 0: weekly_lunches[op] = p_time
-                    if p_time: day_ass[op] += f"\n☕ {p_time}"
-            
-            out[col] = day_ass
-            
-        st.session_state.shifts[LEAVES_KEY] = out
-        res, new_sha = save_file_to_github("shifts.json", st.session_state.shifts, st.session_state.shifts_sha)
-        if res:
-             st.session_state.shifts_sha = new_sha
-             st.toast("Turni salvati!", icon="💾")
-
-        res_df = pd.DataFrame(out)
-        cols_to_show = [c for i, c in enumerate(cols) if days[i].weekday() < 5]
-        final_view = res_df[cols_to_show]
-
-        new_idx = []
-        for op in final_view.index:
-            t = CONFIG["TELEFONI"].get(op)
-            new_idx.append(f"{op} (☎️ {t})" if t else op)
-        final_view.index = new_idx
-        
-        st.success("Turni Generati!")
-        if missing: st.warning("Non assegnati:"); st.json(missing)
-        
-        display_weeks(final_view, get_style_map(), mese_s, anno_s)
+    # 4. PIÙ MESI DI SEGUITO
+    st.divider()
+    with st.expander("📆 Genera più mesi di seguito", expanded=False):
+        batch_generation(anno_s, mese_n, mese_s, LEAVES_KEY)
 
-    # 3. VISUALIZZAZIONE TURNI SALVATI
-    if saved_shifts_for_month and "final_view" not in locals():
-        st.divider()
-        st.subheader(f"📂 Turni Salvati: {mese_s} {anno_s}")
-        
-        saved_df = pd.DataFrame(saved_shifts_for_month)
-        cols_viz = [c for c in saved_df.columns if "Sab" not in c and "Dom" not in c] 
-        saved_view = saved_df[cols_viz]
-        
-        new_idx_viz = []
-        for op in saved_view.index:
-            t = CONFIG["TELEFONI"].get(op)
-            new_idx_viz.append(f"{op} (☎️ {t})" if t else op)
-        saved_view.index = new_idx_viz
-        display_weeks(saved_view, get_style_map(), mese_s, anno_s)
+with tab_stats:
+    stats_section()
+
+with tab_settings:
+    st.header("⚙️ Configurazione")
+
+    with st.expander("🎨 1. Servizi e Colori", expanded=True):
+        services_section()
+    with st.expander("👥 2. Operatori", expanded=False):
+        operators_section()
+    with st.expander("🛠️ 3. Matrice Competenze", expanded=False):
+        skills_section()
+    with st.expander("☕ 4. Telefoni & Pause", expanded=False):
+        phones_section()
+    with st.expander("📡 5. Statistiche GitHub API", expanded=False):
+        api_section()
+
+# ==============================================================================
+# 5. TEMPI DEL RERUN
+# ==============================================================================
+
+with st.sidebar.expander("⏱️ Tempi ultimo rerun", expanded=False):
+    rerun_rows = rerun_timer.summary()
+    history = st.session_state.setdefault("rerun_history", [])
+    history.append(rerun_rows[-1]["ms"])
+    del history[:-20]
+    st.metric("Rerun", f"{rerun_rows[-1]['ms']:.0f} ms", help=f"Media ultimi {len(history)}: {sum(history) / len(history):.0f} ms")
+    st.dataframe(pd.DataFrame(rerun_rows), hide_index=True, use_container_width=True)
+    # Anche le esecuzioni delle singole sezioni, che non passano da qui
+    fragment_ms = st.session_state.get("fragment_ms", {})
+    if fragment_ms:
+        st.caption("Ultima esecuzione di ogni sezione (anche da sola):")
+        st.dataframe(pd.DataFrame({"sezione": list(fragment_ms), "ms": [round(v, 1) for v in fragment_ms.values()]}),
+                     hide_index=True, use_container_width=True)
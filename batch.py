@@ -0,0 +1,72 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import MODE_GREEDY, Fairness, leaves_key, month_range, schedule_month, schedule_stats
+
+# ==============================================================================
+# GENERAZIONE DI PIÙ MESI
+# ==============================================================================
+
+MonthResult = namedtuple("MonthResult", "key out missing ms assigned overloaded n_missing")
+Scenario = namedtuple("Scenario", "max_tasks seed mode")
+
+def schedule_range(config, leaves_by_key, year, month, n_months, max_tasks, seed=None, mode=MODE_GREEDY,
+                   previous_by_key=None, fairness=None):
+    """Genera `n_months` mesi consecutivi da year/month portando avanti l'equità.
+
+    Conteggi, settimana a cavallo e rotazione pause passano da un mese al
+    successivo tramite engine.Fairness. Con `seed` ogni mese usa un seme
+    derivato (seed + mese), quindi il risultato di un mese non dipende da
+    quanti mesi lo precedono nel batch. Ritorna una lista di MonthResult.
+    """
+    fairness = fairness if fairness is not None else Fairness()
+    previous_by_key = previous_by_key or {}
+    results = []
+    for y, m in month_range(year, month, n_months):
+        key = leaves_key(y, m)
+        t0 = time.perf_counter()
+        out, missing = schedule_month(config, leaves_by_key.get(key) or {}, y, m, max_tasks,
+                                      previous_shifts=previous_by_key.get(key),
+                                      seed=None if seed is None else f"{seed}-{key}", mode=mode, fairness=fairness)
+        ms = (time.perf_counter() - t0) * 1000
+        stats = schedule_stats(out, max_tasks)
+        results.append(MonthResult(key, out, missing, ms, stats["assigned"], stats["overloaded"],
+                                   sum(len(v) for v in missing.values())))
+    return results
+
+def report(results):
+    """Righe di riepilogo per mese: tempo e copertura dei task"""
+    rows = []
+    for r in results:
+        total = r.assigned + r.n_missing
+        rows.append({
+            "mese": r.key,
+            "ms": round(r.ms, 1),
+            "task assegnati": r.assigned,
+            "oltre max": r.overloaded,
+            "non assegnati": r.n_missing,
+            "copertura %": round(r.assigned * 100 / total, 1) if total else 100.0,
+        })
+    return rows
+
+# ==============================================================================
+# SCENARI IN PARALLELO
+# ==============================================================================
+
+def _run_scenario(args):
+    config, leaves_by_key, year, month, n_months, scenario, previous_by_key = args
+    return schedule_range(config, leaves_by_key, year, month, n_months, scenario.max_tasks, seed=scenario.seed,
+                          mode=scenario.mode, previous_by_key=previous_by_key)
+
+def run_scenarios(config, leaves_by_key, year, month, n_months, scenarios, workers=None, previous_by_key=None):
+    """Esegue scenari indipendenti (max_tasks / seed / modalità diversi) in un pool di processi.
+
+    Ogni scenario genera l'intero periodo con il proprio stato di equità.
+    Ritorna {Scenario: [MonthResult]} nell'ordine di `scenarios`.
+    """
+    jobs = [(config, leaves_by_key, year, month, n_months, s, previous_by_key) for s in scenarios]
+    if workers == 1 or len(jobs) <= 1:
+        return {s: _run_scenario(job) for s, job in zip(scenarios, jobs)}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(scenarios, pool.map(_run_scenario, jobs)))
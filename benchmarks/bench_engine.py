@@ -0,0 +1,43 @@
+"""Benchmark del motore di generazione turni.
+
+Uso: python -m benchmarks.bench_engine [--months 1 12 60] [--operators 15 150 1500]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.synthetic import make_config, make_leaves_history
+from engine import leaves_key, month_range, schedule_month
+
+def run_case(n_ops, n_months, max_tasks, repeat, year=2026, month=1):
+    config = make_config(n_ops)
+    history = make_leaves_history(config, year, month, n_months)
+    timings = []
+    missing = 0
+    for r in range(repeat):
+        missing = 0
+        t0 = time.perf_counter()
+        for y, m in month_range(year, month, n_months):
+            _, miss = schedule_month(config, history[leaves_key(y, m)], y, m, max_tasks, seed=r)
+            missing += sum(len(v) for v in miss.values())
+        timings.append(time.perf_counter() - t0)
+    return timings, missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", type=int, nargs="+", default=[1, 12, 60])
+    parser.add_argument("--operators", type=int, nargs="+", default=[15, 150, 1500])
+    parser.add_argument("--max-tasks", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'operatori':>9} {'mesi':>5} {'min (s)':>10} {'mediana (s)':>12} {'ms/mese':>9} {'mancanti':>9}")
+    for n_ops in args.operators:
+        for n_months in args.months:
+            timings, missing = run_case(n_ops, n_months, args.max_tasks, args.repeat)
+            best = min(timings)
+            print(f"{n_ops:>9} {n_months:>5} {best:>10.3f} {statistics.median(timings):>12.3f} "
+                  f"{best * 1000 / n_months:>9.1f} {missing:>9}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Dimensione e tempo di lettura delle assenze: formato denso vs compatto.
+
+Si misura json.loads da solo e json.loads + costruzione dei frame degli editor
+(per il denso con la vecchia decodifica DataFrame + update).
+
+Uso: python -m benchmarks.bench_leaves [--operators 15 150] [--months 36]
+"""
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from absences import KINDS, decode_frame, to_sparse
+from benchmarks.synthetic import make_config, make_leaves_history
+from engine import month_calendar
+
+def legacy_frame(saved_dict, ops, cols):
+    """Decodifica del formato denso com'era in app.py (DataFrame + update)"""
+    df = pd.DataFrame(False, index=ops, columns=cols)
+    if saved_dict:
+        df.update(pd.DataFrame(saved_dict))
+        df = df.fillna(False).astype(bool)
+    return df
+
+def load_dense(text, ops, calendars):
+    for key, month_leaves in json.loads(text).items():
+        for kind in KINDS:
+            legacy_frame(month_leaves.get(kind), ops, calendars[key])
+
+def load_sparse(text, ops, calendars):
+    for key, month_leaves in json.loads(text).items():
+        for kind in KINDS:
+            decode_frame(month_leaves, kind, ops, calendars[key])
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operators", type=int, nargs="+", default=[15, 150])
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'operatori':>9} {'mesi':>5} {'KB denso':>9} {'KB comp.':>9} {'x':>5} "
+          f"{'json denso':>11} {'json comp.':>11} {'x':>5} {'frame denso':>12} {'frame comp.':>12} {'x':>5}")
+    for n_ops in args.operators:
+        config = make_config(n_ops)
+        dense = make_leaves_history(config, 2026, 1, args.months)
+        sparse = {k: to_sparse(v) for k, v in dense.items()}
+        calendars = {}
+        for key in dense:
+            y, m = map(int, key.split("_"))
+            calendars[key] = month_calendar(y, m)[1]
+        dense_txt, sparse_txt = json.dumps(dense, indent=4), json.dumps(sparse, indent=4)
+        ops = config["OPERATORS"]
+        j_dense = best_of(lambda: json.loads(dense_txt), args.repeat)
+        j_sparse = best_of(lambda: json.loads(sparse_txt), args.repeat)
+        f_dense = best_of(lambda: load_dense(dense_txt, ops, calendars), args.repeat)
+        f_sparse = best_of(lambda: load_sparse(sparse_txt, ops, calendars), args.repeat)
+        print(f"{n_ops:>9} {args.months:>5} {len(dense_txt) / 1024:>9.0f} {len(sparse_txt) / 1024:>9.0f} "
+              f"{len(dense_txt) / len(sparse_txt):>5.1f} {j_dense:>11.4f} {j_sparse:>11.4f} {j_dense / j_sparse:>5.1f} "
+              f"{f_dense:>12.3f} {f_sparse:>12.3f} {f_dense / f_sparse:>5.1f}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Tempo e memoria di picco (tracemalloc) del motore su un mese.
+
+Uso: python -m benchmarks.bench_memory [--operators 15 150 600] [--ref vecchio_engine.py]
+
+Con --ref misura anche un'altra versione di engine.py (es. estratta con
+`git show HEAD~1:engine.py > /tmp/old_engine.py`) e controlla che, a parità
+di seed, i turni generati siano identici.
+"""
+import argparse
+import importlib.util
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_config, make_leaves
+import engine
+
+def load_engine(path):
+    spec = importlib.util.spec_from_file_location("ref_engine", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def measure(module, config, leaves, year, month, max_tasks, mode, repeat):
+    run = lambda: module.schedule_month(config, leaves, year, month, max_tasks, seed=0, mode=mode)
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - t0)
+    # Memoria misurata a parte: tracemalloc rallenta molto le allocazioni
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operators", type=int, nargs="+", default=[15, 150, 600])
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--month", type=int, default=3)
+    parser.add_argument("--max-tasks", type=int, default=2)
+    parser.add_argument("--mode", choices=engine.MODES, default=engine.MODE_GREEDY)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ref", help="Percorso di un'altra versione di engine.py da confrontare")
+    args = parser.parse_args(argv)
+
+    versions = [("attuale", engine)]
+    if args.ref: versions.append(("ref", load_engine(args.ref)))
+
+    print(f"{'operatori':>9} {'versione':>8} {'ms':>9} {'picco KiB':>10} {'uguale':>7}")
+    for n_ops in args.operators:
+        config = make_config(n_ops)
+        leaves = make_leaves(config, args.year, args.month)
+        first = None
+        for name, module in versions:
+            best, peak, result = measure(module, config, leaves, args.year, args.month, args.max_tasks,
+                                         args.mode, args.repeat)
+            if first is None: first = result
+            same = "" if module is engine else ("sì" if result == first else "NO")
+            print(f"{n_ops:>9} {name:>8} {best * 1000:>9.1f} {peak / 1024:>10.0f} {same:>7}", flush=True)
+
+if __name__ == "__main__":
+    main()
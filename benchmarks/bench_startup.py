@@ -0,0 +1,113 @@
+"""Avvio a freddo dell'app: tempo di import e tempo al primo elemento mostrato.
+
+Uso: python -m benchmarks.bench_startup [--repeat 5] [--password] [--json risultati.json] [--app vecchia_app.py]
+
+Ogni misura gira in un processo nuovo, come il primo accesso dopo uno
+scale-down. `import` è il tempo per importare streamlit e i moduli dell'app;
+l'app gira con streamlit.testing (AppTest) sui JSON della cartella, offline
+su un database SQLite temporaneo, e si registra l'istante di ogni elemento
+inviato al browser:
+- primo elemento: il primo elemento della pagina (login o titolo);
+- interfaccia: le schede della pagina;
+- completa: fine dell'esecuzione dello script.
+Con --password l'app chiede la password: si misura la pagina di login e poi,
+dopo --typing-s secondi, il primo rerun dopo l'accesso. Si riporta la mediana
+delle ripetizioni. Con --app si misura un'altra versione di app.py (es.
+`git show HEAD~1:app.py > /tmp/old_app.py`) sugli stessi moduli.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ["pandas", "numpy", "holidays", "requests", "absences", "analytics", "batch", "engine", "exports",
+               "localdb", "savequeue", "search", "shared", "skills", "storage", "styling", "timing", "validate"]
+PASSWORD = "bench"
+
+def measure_imports():
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401
+    t1 = time.perf_counter()
+    for name in APP_MODULES: __import__(name)
+    t2 = time.perf_counter()
+    return {"import streamlit": (t1 - t0) * 1000, "import moduli app": (t2 - t1) * 1000}
+
+def measure_app(app, password, typing_s):
+    from streamlit.runtime.scriptrunner import script_runner
+    from streamlit.testing.v1 import AppTest
+
+    marks = {}
+    enqueue = script_runner.ScriptRunner._enqueue_forward_msg
+
+    def timed_enqueue(self, msg):
+        if msg.HasField("delta"):
+            now = time.perf_counter()
+            marks.setdefault("primo elemento", now)
+            if msg.delta.HasField("add_block") and msg.delta.add_block.HasField("tab_container"):
+                marks.setdefault("interfaccia", now)
+        enqueue(self, msg)
+
+    script_runner.ScriptRunner._enqueue_forward_msg = timed_enqueue
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        at = AppTest.from_file(os.path.abspath(app), default_timeout=120)
+        at.secrets["LOCAL_DB"] = os.path.join(tmp, "bench.db")
+        if password: at.secrets["APP_PASSWORD"] = PASSWORD
+        t0 = time.perf_counter()
+        at.run()
+        res.update({k: (t - t0) * 1000 for k, t in marks.items()})
+        res["completa"] = (time.perf_counter() - t0) * 1000
+        if password:
+            time.sleep(typing_s)
+            marks.clear()
+            at.text_input[0].set_value(PASSWORD)
+            t0 = time.perf_counter()
+            at.run()
+            res.update({f"accesso: {k}": (t - t0) * 1000 for k, t in marks.items()})
+            res["accesso: completa"] = (time.perf_counter() - t0) * 1000
+        if at.exception: res["errore"] = str(at.exception[0].message)
+    return res
+
+def run_child(kind, args):
+    """Una misura in un processo nuovo; ritorna il dict dei tempi (ms)"""
+    cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--child", kind, "--app", os.path.abspath(args.app),
+           "--typing-s", str(args.typing_s)] + (["--password"] if args.password else [])
+    out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--password", action="store_true", help="Misura anche la pagina di login (APP_PASSWORD)")
+    parser.add_argument("--typing-s", type=float, default=2.0, help="Attesa prima di inserire la password")
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"), help="Versione di app.py da misurare")
+    parser.add_argument("--json", help="Salva le mediane su file, per confrontare le versioni")
+    parser.add_argument("--child", choices=["imports", "app"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        os.chdir(ROOT)
+        sys.path.insert(0, ROOT)
+        res = measure_imports() if args.child == "imports" else measure_app(args.app, args.password, args.typing_s)
+        print(json.dumps(res))
+        return
+
+    runs = {}
+    for _ in range(args.repeat):
+        for kind in ("imports", "app"):
+            for name, ms in run_child(kind, args).items():
+                runs.setdefault(name, []).append(ms)
+    medians = {name: statistics.median(v) if name != "errore" else v[0] for name, v in runs.items()}
+    for name, ms in medians.items():
+        print(f"{name:<28} {ms:>9.1f} ms" if name != "errore" else f"errore: {ms}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(medians, f, indent=4)
+
+if __name__ == "__main__":
+    main()
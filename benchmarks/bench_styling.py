@@ -0,0 +1,57 @@
+"""Colorazione della griglia turni: vecchio styler cella per cella vs CellStyler.
+
+Uso: python -m benchmarks.bench_styling [--operators 15 60 150 300]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_config, make_leaves
+from engine import schedule_month
+from styling import CellStyler
+
+def legacy_styler(v, col_map):
+    """Regola di colore com'era in app.py (chiamata per cella con applymap)"""
+    s = str(v)
+    if "FERIE" in s: return "background-color: #ffc4c4"
+    if "P." in s: return "background-color: #ffd966"
+    if "🎉" in s: return "background-color: #f4cccc"
+    for t, c in col_map.items():
+        if t in s: return f"background-color: {c}"
+    return ""
+
+def style_map(config):
+    return {f"{s}: {t}": d["color"] for s, d in config["SERVICES"].items() for t in d["tasks"]}
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operators", type=int, nargs="+", default=[15, 60, 150, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'operatori':>9} {'task':>5} {'celle':>6} {'cella/cella ms':>15} {'CellStyler ms':>14} {'x':>6}")
+    for n_ops in args.operators:
+        config = make_config(n_ops)
+        out, _ = schedule_month(config, make_leaves(config, 2026, 3), 2026, 3, 2, seed=0)
+        df = pd.DataFrame(out)
+        col_map = style_map(config)
+        legacy = df.map(lambda v: legacy_styler(v, col_map))
+        new = CellStyler(col_map).frame_styles(df)
+        assert legacy.equals(new), "stili diversi dal vecchio styler"
+        t_old = best_of(lambda: df.map(lambda v: legacy_styler(v, col_map)), args.repeat)
+        # Compilazione della regex inclusa nella misura
+        t_new = best_of(lambda: CellStyler(col_map).frame_styles(df), args.repeat)
+        print(f"{n_ops:>9} {len(col_map):>5} {df.size:>6} {t_old * 1000:>15.1f} {t_new * 1000:>14.1f} "
+              f"{t_old / t_new:>6.1f}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Confronto mensile tra modalità greedy e optimal del motore.
+
+Uso: python -m benchmarks.compare_modes [--operators 15 150] [--months 12] [--local]
+Con --local usa config.json / leaves.json locali, per i mesi presenti in leaves.json.
+
+Per mese e modalità: task oltre max_tasks, varianza dei carichi giornalieri e
+task ripetuti rispetto alla settimana precedente (search.score_schedule), più
+i tempi. I task mancanti sono solo quelli senza nessun operatore abilitato e
+disponibile, quindi uguali nelle due modalità: sono riportati una volta come
+controllo. La modalità optimal risolve un min-cost flow al giorno ed è più
+lenta (colonna "x" e riga "totale"): circa 3 volte con 15 operatori, 7-10
+volte con 150.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.synthetic import make_config, make_leaves_history
+from engine import MODE_GREEDY, MODE_OPTIMAL, leaves_key, month_range, schedule_month
+from search import score_schedule
+
+HEADER = (f"{'mese':>16} {'manc.':>6} {'sovracc.G':>9} {'sovracc.O':>9} {'var.G':>7} {'var.O':>7} "
+          f"{'rip.G':>6} {'rip.O':>6} {'ms G':>9} {'ms O':>9} {'x':>5}")
+
+def compare_month(config, month_leaves, year, month, max_tasks, seed):
+    row = {}
+    for mode in (MODE_GREEDY, MODE_OPTIMAL):
+        t0 = time.perf_counter()
+        out, missing = schedule_month(config, month_leaves, year, month, max_tasks, seed=seed, mode=mode)
+        elapsed = time.perf_counter() - t0
+        row[mode] = (score_schedule(config, out, missing, max_tasks), elapsed)
+    return row
+
+def print_row(label, row):
+    (g, g_t), (o, o_t) = row[MODE_GREEDY], row[MODE_OPTIMAL]
+    miss = g.missing if g.missing == o.missing else f"{g.missing}/{o.missing}"
+    print(f"{label:>16} {miss:>6} {g.overloaded:>9} {o.overloaded:>9} {g.load_var:>7.3f} {o.load_var:>7.3f} "
+          f"{g.repeats:>6} {o.repeats:>6} {g_t * 1000:>9.1f} {o_t * 1000:>9.1f} {o_t / g_t:>5.1f}", flush=True)
+
+def print_total(rows):
+    g_over, o_over = (sum(r[mode][0].overloaded for r in rows) for mode in (MODE_GREEDY, MODE_OPTIMAL))
+    g_rep, o_rep = (sum(r[mode][0].repeats for r in rows) for mode in (MODE_GREEDY, MODE_OPTIMAL))
+    g_t, o_t = (sum(r[mode][1] for r in rows) for mode in (MODE_GREEDY, MODE_OPTIMAL))
+    print(f"{'totale':>16} {'':>6} {g_over:>9} {o_over:>9} {'':>7} {'':>7} {g_rep:>6} {o_rep:>6} "
+          f"{g_t * 1000:>9.1f} {o_t * 1000:>9.1f} {o_t / g_t:>5.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operators", type=int, nargs="+", default=[15, 150])
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--max-tasks", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--local", action="store_true")
+    args = parser.parse_args(argv)
+
+    months = []
+    if args.local:
+        with open("config.json", encoding="utf-8") as f: config = json.load(f)
+        with open("leaves.json", encoding="utf-8") as f: leaves = json.load(f)
+        months = [(key, config, leaves[key], *map(int, key.split("_"))) for key in leaves]
+    else:
+        for n_ops in args.operators:
+            config = make_config(n_ops)
+            history = make_leaves_history(config, 2026, 1, args.months)
+            months += [(f"{n_ops} op {leaves_key(y, m)}", config, history[leaves_key(y, m)], y, m)
+                       for y, m in month_range(2026, 1, args.months)]
+
+    # Prima esecuzione a vuoto: calendari e competenze in cache, come nell'app dopo il primo rerun
+    _, config, month_leaves, y, m = months[0]
+    compare_month(config, month_leaves, y, m, args.max_tasks, args.seed)
+    print(HEADER)
+    rows = []
+    for label, config, month_leaves, y, m in months:
+        rows.append(compare_month(config, month_leaves, y, m, args.max_tasks, args.seed))
+        print_row(label, rows[-1])
+    print_total(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import random
+
+from engine import leaves_key, month_calendar, month_range
+
+# ==============================================================================
+# DATI SINTETICI PER I BENCHMARK
+# ==============================================================================
+
+def make_config(n_ops, tasks_per_service=3, skills_per_op=6, seed=0):
+    """Config sintetica: circa un task ogni due operatori, `skills_per_op` competenze a testa"""
+    rng = random.Random(seed)
+    n_services = max(5, n_ops // (2 * tasks_per_service))
+    services = {}
+    for s in range(n_services):
+        services[f"SVC{s:04d}"] = {
+            "color": f"#{rng.randrange(0x1000000):06x}",
+            "tasks": [f"task{t}" for t in range(tasks_per_service)],
+        }
+    all_tasks = [f"{s}: {t}" for s, d in services.items() for t in d["tasks"]]
+    ops = [f"Operatore {i:04d}" for i in range(n_ops)]
+    skills = {op: rng.sample(all_tasks, min(skills_per_op, len(all_tasks))) for op in ops}
+    slots = ["12:30 - 14:00", "13:00 - 14:30", "13:30 - 15:00"]
+    fissi = {op: rng.choice(slots) for op in ops if rng.random() < 0.5}
+    telefoni = {op: "10:00 - 11:00" for op in ops if rng.random() < 0.2}
+    return {
+        "OPERATORS": ops,
+        "SERVICES": services,
+        "SKILLS": skills,
+        "PAUSE": {"FISSI": fissi, "SLOTS": slots},
+        "TELEFONI": telefoni,
+    }
+
+def make_leaves(config, year, month, p_ferie=0.08, p_perm=0.03, seed=0):
+    """Assenze sintetiche di un mese nel formato di leaves.json"""
+    rng = random.Random(f"{seed}-{year}-{month}")
+    days, cols, hols = month_calendar(year, month)
+    ferie, p_matt, p_pom = {}, {}, {}
+    for d, c in zip(days, cols):
+        weekend = d.weekday() >= 5 or d in hols
+        ferie[c], p_matt[c], p_pom[c] = {}, {}, {}
+        for op in config["OPERATORS"]:
+            r = rng.random()
+            ferie[c][op] = weekend or r < p_ferie
+            p_matt[c][op] = not weekend and p_ferie <= r < p_ferie + p_perm
+            p_pom[c][op] = not weekend and p_ferie + p_perm <= r < p_ferie + 2 * p_perm
+    return {"ferie": ferie, "p_matt": p_matt, "p_pom": p_pom}
+
+def make_leaves_history(config, year, month, n_months, seed=0):
+    return {leaves_key(y, m): make_leaves(config, y, m, seed=seed) for y, m in month_range(year, month, n_months)}
@@ -0,0 +1,324 @@
+import argparse
+import json
+import sys
+import time
+
+from absences import is_sparse, to_sparse
+from analytics import HistoryIndex, history_fairness, window_keys
+from batch import Scenario, report, run_scenarios
+from engine import MODE_GREEDY, MODES, affected_days, leaves_key, month_range, pause_coverage, schedule_month
+from localdb import SQLiteStorage
+from search import best_of, score_schedule
+from storage import LocalStorage, MonthlyStore, load_months
+from validate import month_sort_key, validate, validate_month, violation_counts
+
+# ==============================================================================
+# UTILS FILE LOCALI
+# ==============================================================================
+
+def dump_json(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=4)
+
+def passes_check(config, key, out, month_leaves, max_tasks, force):
+    """Controllo prima di --write (come "CALCOLA TURNI" nell'app): False se il mese non va salvato"""
+    year, month = map(int, key.split("_"))
+    violations = validate_month(config, out, month_leaves or {}, year, month, max_tasks)
+    if violations.empty: return True
+    counts = ", ".join(f"{rule}: {n}" for rule, n in violation_counts(violations).items())
+    print(f"{key}: controllo non superato ({counts})" + (", salvato con --force" if force else ", NON salvato"),
+          file=sys.stderr)
+    return force
+
+def open_backend(args, db=None):
+    """Cartella JSON (--data-dir) o database SQLite (--db), creato dai JSON della cartella se vuoto"""
+    db = db or args.db
+    if not db: return LocalStorage(args.data_dir)
+    backend = SQLiteStorage(db)
+    if backend.is_empty(): backend.import_from(LocalStorage(args.data_dir))
+    return backend
+
+def load_config(backend):
+    config, _ = backend.read("config.json")
+    if not config or "SERVICES" not in config:
+        print("Errore: config.json mancante o struttura errata.", file=sys.stderr)
+        return None
+    return config
+
+# ==============================================================================
+# COMANDI
+# ==============================================================================
+
+def cmd_schedule(args):
+    backend = open_backend(args)
+    config = load_config(backend)
+    if config is None: return 2
+    if args.trials > 1 and args.mode != MODE_GREEDY:
+        print("Errore: --trials ha senso solo con --mode greedy (optimal è deterministico).", file=sys.stderr)
+        return 2
+    key = leaves_key(args.year, args.month)
+    shifts_store = MonthlyStore(backend, "shifts")
+    loaded = load_months(backend, [key])
+    month_leaves, _ = loaded["leaves"][key]
+    previous, previous_sha = loaded["shifts"][key]
+
+    fairness = None
+    if args.history_months:
+        history = HistoryIndex()
+        window = window_keys(args.year, args.month, args.history_months)
+        for k, (data, sha) in load_months(backend, window, kinds=("shifts",))["shifts"].items():
+            if data: history.update(k, data, sha)
+        fairness = history_fairness(history, args.year, args.month, args.history_months)
+        print(f"{key}: equità dallo storico di {len(history.months())} mesi salvati", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    only_days = None
+    if args.incremental and previous:
+        only_days = affected_days(config, month_leaves or {}, args.year, args.month, previous)
+        print(f"{key}: giorni da ricalcolare {sorted(only_days)}", file=sys.stderr)
+    if args.trials > 1:
+        search = best_of(config, month_leaves or {}, args.year, args.month, args.max_tasks, n_trials=args.trials,
+                         base_seed=args.seed or 0, budget_s=args.budget, patience=args.patience,
+                         workers=args.workers, previous_shifts=previous if args.preserve else None,
+                         only_days=only_days, fairness=fairness)
+        out, missing, seed = search.out, search.missing, search.seed
+        print(f"{key}: migliore di {search.trials} tentativi (stop: {search.stopped}), seed {seed}, "
+              f"punteggio {search.score._asdict()}", file=sys.stderr)
+    else:
+        seed = args.seed
+        out, missing = schedule_month(config, month_leaves or {}, args.year, args.month, args.max_tasks,
+                                      previous_shifts=previous if args.preserve else None,
+                                      seed=seed, mode=args.mode, only_days=only_days, fairness=fairness)
+    elapsed = time.perf_counter() - t0
+
+    result = {"month": key, "seed": seed, "score": score_schedule(config, out, missing, args.max_tasks)._asdict(),
+              "shifts": out, "missing": missing}
+    if args.output:
+        dump_json(args.output, result)
+    else:
+        print(json.dumps(result, indent=4, ensure_ascii=False))
+
+    blocked = args.write and not passes_check(config, key, out, month_leaves, args.max_tasks, args.force)
+    if args.write and not blocked:
+        shifts_store.save(key, out, previous_sha)
+
+    if args.coverage:
+        print_coverage(config, out)
+
+    n_missing = sum(len(v) for v in missing.values())
+    print(f"{key}: generato in {elapsed * 1000:.1f} ms, task non assegnati: {n_missing}", file=sys.stderr)
+    return 1 if blocked else 0
+
+def print_coverage(config, out):
+    """Per giorno e servizio: minimo di persone al banco durante le pause e fascia in cui si raggiunge"""
+    by_day = {}
+    for row in pause_coverage(config, out):
+        by_day.setdefault(row["giorno"], []).append(row)
+    print("copertura pause (minimo al banco per servizio, fascia)", file=sys.stderr)
+    for day, rows in by_day.items():
+        services = sorted({s for r in rows for s in r} - {"giorno", "fascia", "in pausa"})
+        parts = []
+        for s in services:
+            worst = min(rows, key=lambda r: r.get(s, 0))
+            parts.append(f"{s} {worst.get(s, 0)} ({worst['fascia']})")
+        print(f"{day:>12}: " + ", ".join(parts), file=sys.stderr)
+
+def print_report(title, rows):
+    print(title, file=sys.stderr)
+    print(f"{'mese':>8} {'ms':>8} {'assegnati':>10} {'oltre max':>10} {'mancanti':>9} {'copertura':>10}", file=sys.stderr)
+    for r in rows:
+        print(f"{r['mese']:>8} {r['ms']:>8.1f} {r['task assegnati']:>10} {r['oltre max']:>10} "
+              f"{r['non assegnati']:>9} {r['copertura %']:>9.1f}%", file=sys.stderr)
+
+def cmd_batch(args):
+    backend = open_backend(args)
+    config = load_config(backend)
+    if config is None: return 2
+    keys = [leaves_key(y, m) for y, m in month_range(args.year, args.month, args.months)]
+    shifts_store = MonthlyStore(backend, "shifts")
+    loaded = load_months(backend, keys)
+    leaves_by_key = {key: data for key, (data, _) in loaded["leaves"].items()}
+    saved = loaded["shifts"]
+    previous = {key: data for key, (data, _) in saved.items() if data} if args.preserve else None
+
+    scenarios = [Scenario(mt, seed, args.mode) for mt in args.max_tasks for seed in args.seeds]
+    if args.write and len(scenarios) > 1:
+        print("Errore: --write richiede un solo scenario (un valore di --max-tasks e di --seeds).", file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    results = run_scenarios(config, leaves_by_key, args.year, args.month, args.months, scenarios,
+                            workers=args.workers, previous_by_key=previous)
+    elapsed = time.perf_counter() - t0
+
+    payload = []
+    for scenario, months in results.items():
+        rows = report(months)
+        print_report(f"max_tasks={scenario.max_tasks} seed={scenario.seed} mode={scenario.mode}", rows)
+        payload.append({"scenario": scenario._asdict(), "report": rows,
+                        "shifts": {r.key: r.out for r in months}, "missing": {r.key: r.missing for r in months}})
+    if args.output:
+        dump_json(args.output, payload)
+    print(f"{len(scenarios)} scenari x {args.months} mesi in {elapsed:.2f} s", file=sys.stderr)
+
+    if args.write:
+        months = results[scenarios[0]]
+        ok = [r for r in months if passes_check(config, r.key, r.out, leaves_by_key[r.key], scenarios[0].max_tasks,
+                                                 args.force)]
+        if ok: shifts_store.save_months({r.key: (r.out, saved[r.key][1], saved[r.key][0] or {}) for r in ok})
+        if len(ok) < len(months): return 1
+    return 0
+
+def cmd_migrate(args):
+    backend = open_backend(args)
+    for kind in ("leaves", "shifts"):
+        n = MonthlyStore(backend, kind).migrate()
+        print(f"{kind}: {n} mesi migrati in {kind}/" if n else f"{kind}: già suddiviso per mese")
+    return 0
+
+def cmd_compact(args):
+    backend = open_backend(args)
+    store = MonthlyStore(backend, "leaves")
+    store.migrate()
+    months, _ = store.read_index()
+    converted = 0
+    for key, (data, sha) in load_months(backend, months, kinds=("leaves",))["leaves"].items():
+        if data and not is_sparse(data):
+            store.save(key, to_sparse(data), sha)
+            converted += 1
+    print(f"leaves: {converted} mesi convertiti nel formato compatto")
+    return 0
+
+def saved_months(store):
+    """Mesi salvati secondo l'indice (o le chiavi del vecchio file unico)"""
+    months, _ = store.read_index()
+    if months is None:
+        legacy, _ = store.backend.read(store.legacy_path)
+        months = sorted(legacy or {}, key=month_sort_key)
+    return months
+
+def cmd_validate(args):
+    backend = open_backend(args)
+    config = load_config(backend)
+    if config is None: return 2
+    if (args.year is None) != (args.month is None):
+        print("Errore: --year e --month vanno indicati insieme.", file=sys.stderr)
+        return 2
+    if args.year is None:
+        keys = saved_months(MonthlyStore(backend, "shifts"))
+    else:
+        keys = [leaves_key(y, m) for y, m in month_range(args.year, args.month, args.months)]
+    loaded = load_months(backend, keys)
+    shifts_by_key = {key: data for key, (data, _) in loaded["shifts"].items() if data}
+    leaves_by_key = {key: loaded["leaves"][key][0] for key in shifts_by_key}
+
+    t0 = time.perf_counter()
+    violations = validate(config, shifts_by_key, leaves_by_key, args.max_tasks)
+    elapsed = time.perf_counter() - t0
+
+    if args.output:
+        dump_json(args.output, violations.to_dict("records"))
+    else:
+        for r in violations.itertuples(index=False):
+            print(f"{r.mese:>8} {r.giorno:>3} {r.operatore:<25} {r.regola:<22} {r.dettaglio}")
+    for rule, n in violation_counts(violations).items():
+        print(f"{rule:<22} {n:>6}", file=sys.stderr)
+    print(f"{len(shifts_by_key)} mesi controllati in {elapsed * 1000:.1f} ms, violazioni: {len(violations)}",
+          file=sys.stderr)
+    return 1 if len(violations) else 0
+
+def cmd_history(args):
+    # Senza --db le tabelle si costruiscono in memoria dai JSON della cartella
+    backend = open_backend(args, db=args.db or ":memory:")
+    rows = backend.coverage(operator=args.operator, service=args.service, task=args.task,
+                            year=args.year, month=args.month)
+    for op, task, n in rows:
+        print(f"{op:<25} {task:<40} {n:>5}")
+    if not rows: print("Nessun turno trovato.")
+    if args.absences:
+        print()
+        for op, kind, n in backend.absence_summary(operator=args.operator, year=args.year, month=args.month):
+            print(f"{op:<25} {kind:<40} {n:>5}")
+    return 0
+
+# ==============================================================================
+# ENTRY POINT
+# ==============================================================================
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Turni Trust - generazione turni da riga di comando")
+    parser.add_argument("--data-dir", default=".", help="Cartella con config.json e i dati di assenze/turni")
+    parser.add_argument("--db", help="Database SQLite da usare al posto della cartella (creato da --data-dir se vuoto)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("schedule", help="Genera i turni di un mese")
+    p.add_argument("--year", type=int, required=True)
+    p.add_argument("--month", type=int, required=True)
+    p.add_argument("--max-tasks", type=int, default=2)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--mode", choices=MODES, default=MODES[0], help="Motore di assegnazione")
+    p.add_argument("--preserve", action="store_true", help="Preserva i turni già salvati (smart update)")
+    p.add_argument("--incremental", action="store_true",
+                   help="Richiede --preserve: ricalcola solo i giorni non più coerenti con le assenze, gli altri restano identici")
+    p.add_argument("--trials", type=int, default=1,
+                   help="Migliore di N: prova i semi seed, seed+1, ... (solo greedy) e tiene il punteggio migliore")
+    p.add_argument("--budget", type=float, default=10.0, help="Tempo massimo della ricerca in secondi")
+    p.add_argument("--patience", type=int, default=None, help="Ferma dopo N tentativi senza miglioramenti")
+    p.add_argument("--workers", type=int, default=1, help="Processi per i tentativi")
+    p.add_argument("--history-months", type=int, default=0,
+                   help="Parte dai conteggi per task degli N mesi salvati precedenti (corretti per le assenze)")
+    p.add_argument("--output", help="Scrive il risultato su file invece che su stdout")
+    p.add_argument("--write", action="store_true",
+                   help="Salva il mese generato in shifts/ se supera il controllo (exit code 1 altrimenti)")
+    p.add_argument("--force", action="store_true", help="Con --write salva anche se il controllo trova violazioni")
+    p.add_argument("--coverage", action="store_true",
+                   help="Stampa per ogni giorno il minimo di persone al banco per servizio durante le pause")
+    p.set_defaults(func=cmd_schedule)
+
+    p = sub.add_parser("batch", help="Genera più mesi di seguito, con equità portata da un mese all'altro")
+    p.add_argument("--year", type=int, required=True)
+    p.add_argument("--month", type=int, required=True)
+    p.add_argument("--months", type=int, default=12, help="Numero di mesi consecutivi")
+    p.add_argument("--max-tasks", type=int, nargs="+", default=[2], help="Uno scenario per valore")
+    p.add_argument("--seeds", type=int, nargs="+", default=[0], help="Uno scenario per seme")
+    p.add_argument("--mode", choices=MODES, default=MODES[0], help="Motore di assegnazione")
+    p.add_argument("--workers", type=int, default=None, help="Processi per gli scenari (default: CPU)")
+    p.add_argument("--preserve", action="store_true", help="Preserva i turni già salvati (smart update)")
+    p.add_argument("--output", help="Scrive turni e riepilogo di tutti gli scenari su file JSON")
+    p.add_argument("--write", action="store_true",
+                   help="Salva in shifts/ con un solo commit i mesi che superano il controllo (exit code 1 se ne resta fuori qualcuno)")
+    p.add_argument("--force", action="store_true", help="Con --write salva anche i mesi con violazioni")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("migrate", help="Suddivide leaves.json / shifts.json in file mensili")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("compact", help="Riscrive le assenze salvate nel formato compatto")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("history", help="Storico: quante volte ogni operatore ha coperto ogni task")
+    p.add_argument("--operator")
+    p.add_argument("--service", help="Es. PEC: tutti i task del servizio")
+    p.add_argument("--task", help="Nome completo, es. \"PEC: Protocollo\"")
+    p.add_argument("--year", type=int)
+    p.add_argument("--month", type=int)
+    p.add_argument("--absences", action="store_true", help="Mostra anche i giorni di assenza per tipo")
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("validate", help="Controlla i turni salvati contro config e assenze (exit code 1 se ci sono violazioni)")
+    p.add_argument("--year", type=int, help="Primo mese da controllare (default: tutti i mesi salvati)")
+    p.add_argument("--month", type=int)
+    p.add_argument("--months", type=int, default=1, help="Numero di mesi consecutivi da --year/--month")
+    p.add_argument("--max-tasks", type=int, default=2)
+    p.add_argument("--output", help="Scrive le violazioni su file JSON invece che su stdout")
+    p.set_defaults(func=cmd_validate)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "incremental", False) and not args.preserve:
+        parser.error("--incremental richiede --preserve: senza turni da preservare ricalcolerebbe tutto il mese")
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+import calendar
+import random
+import re
+from collections import namedtuple
+from datetime import date
+
+from absences import ABSENCE_LABELS, absence_codes
+from pauses import day_board, plan_day
+from skills import get_skill_index
+from solver import assign_day
+
+WEEKDAYS = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
+
+# ==============================================================================
+# CALENDARIO
+# ==============================================================================
+
+def leaves_key(year, month):
+    """Chiave usata in leaves.json / shifts.json per un mese"""
+    return f"{year}_{month}"
+
+def month_range(year, month, n):
+    """Sequenza di n coppie (anno, mese) a partire da year/month"""
+    res = []
+    for i in range(n):
+        m0 = month - 1 + i
+        res.append((year + m0 // 12, m0 % 12 + 1))
+    return res
+
+def month_calendar(year, month):
+    """Ritorna (giorni, colonne, festività) del mese richiesto"""
+    _, nd = calendar.monthrange(year, month)
+    days = [date(year, month, x) for x in range(1, nd + 1)]
+    cols = [f"{d.day:02d} {WEEKDAYS[d.weekday()]}" for d in days]
+    import holidays  # import lento (~50 ms): solo quando serve un calendario
+    hols = holidays.IT(years=year)
+    return days, cols, hols
+
+# ==============================================================================
+# STATO GIORNALIERO OPERATORE
+# ==============================================================================
+
+ABSENCES = ("FERIE", "P.MATT", "P.POM")
+NO_CAPACITY = 99
+
+MODE_GREEDY = "greedy"
+MODE_OPTIMAL = "optimal"
+MODES = (MODE_GREEDY, MODE_OPTIMAL)
+
+Cell = namedtuple("Cell", "absence tasks pause holiday")
+
+class OpDay:
+    """Stato compatto di un operatore in un giorno: assenza, id dei task, pausa.
+
+    Il carico è tenuto come intero; la stringa "SVC: task + SVC: task\n☕ hh:mm"
+    viene prodotta solo da render(), al momento dell'output. Il motore crea un
+    OpDay per operatore a inizio mese e lo riusa ogni giorno con reset().
+    """
+    __slots__ = ("absence", "tasks", "pause", "load")
+
+    def __init__(self, absence=None):
+        self.tasks = []
+        self.reset(absence)
+
+    def reset(self, absence=None):
+        self.absence = absence
+        self.tasks.clear()
+        self.pause = None
+        self.load = NO_CAPACITY if absence else 0
+
+    def add_task(self, t_i):
+        self.tasks.append(t_i)
+        self.load = len(self.tasks)
+
+    def render(self, task_names):
+        if self.absence == "FERIE": return "FERIE"
+        s = " + ".join(task_names[t] for t in self.tasks)
+        if self.absence: s = f"({self.absence}) {s}" if s else self.absence
+        if self.pause: s += f"\n☕ {self.pause}"
+        return s
+
+_PERMESSO_PREFIX = re.compile(r"^(\(+)(P\.MATT|P\.POM)\) ")
+
+def parse_cell(value):
+    """Scompone una cella salvata in shifts.json in Cell(absence, tasks, pause, holiday).
+
+    Gestisce anche i vecchi formati "((P.MATT) a) b" e "a\n☕ hh:mm + b".
+    """
+    s = str(value or "")
+    if s.startswith("🎉"): return Cell(None, [], None, s[1:].strip())
+    body, _, pause = s.partition("\n☕ ")
+    # Vecchio formato: task aggiunti dopo la riga della pausa ("a\n☕ hh:mm + b")
+    pause, *late_tasks = pause.split(" + ")
+    if late_tasks: body = " + ".join([body] + late_tasks)
+    pause = pause.strip() or None
+    if body in ABSENCES: return Cell(body, [], pause, None)
+    absence = None
+    m = _PERMESSO_PREFIX.match(body)
+    if m:
+        absence = m.group(2)
+        segments = body[m.end():].split(") ", len(m.group(1)) - 1)
+    else:
+        segments = [body]
+    tasks = [t for seg in segments for t in seg.split(" + ") if t]
+    return Cell(absence, tasks, pause, None)
+
+# ==============================================================================
+# MOTORE DI ASSEGNAZIONE
+# ==============================================================================
+
+class Fairness:
+    """Stato di equità passato da un mese al successivo quando se ne generano più di seguito.
+
+    Conteggi operatore/task, task e pause della settimana in corso e della
+    precedente, indice settimana per la rotazione delle pause e ultimo giorno
+    generato. I task sono per nome, indipendenti dagli id dell'indice competenze.
+    """
+    __slots__ = ("cnt", "weekly", "last_week", "lunches", "week_idx", "last_day")
+
+    def __init__(self):
+        self.cnt = {}        # operatore -> {task: volte}
+        self.weekly = {}     # operatore -> [task] dal lunedì della settimana in corso
+        self.last_week = {}  # operatore -> [task] della settimana precedente
+        self.lunches = {}    # operatore -> pausa della settimana in corso
+        self.week_idx = 0
+        self.last_day = None
+
+# Assenza della cella per codice di absence_codes (None = presente)
+CELL_ABSENCE = tuple(label or None for label in ABSENCE_LABELS)
+
+def affected_days(config, leaves, year, month, previous_shifts, changed=()):
+    """Giorni da ricalcolare con la rigenerazione incrementale (vedi schedule_month `only_days`).
+
+    Oltre ai giorni in `changed` (assenze modificate) include i giorni non
+    salvati, quelli con operatori diversi dalla config e quelli in cui le
+    assenze scritte nelle celle non corrispondono più a `leaves`. Se cambia un
+    lunedì si ricalcola tutta la sua settimana, perché il lunedì fissa i task
+    e le pause confermati nei giorni seguenti.
+    """
+    days, cols, hols = month_calendar(year, month)
+    op_list = config["OPERATORS"]
+    ops = set(op_list)
+    op_row = {op: i for i, op in enumerate(op_list)}
+    codes = absence_codes(leaves, op_list, len(days))
+    previous_shifts = previous_shifts or {}
+    res = set(changed)
+    absence_of_cell = {}
+    for d_obj, col in zip(days, cols):
+        saved_day = previous_shifts.get(col)
+        if saved_day is None or set(saved_day) != ops:
+            res.add(d_obj.day); continue
+        if d_obj.weekday() >= 5 or d_obj in hols: continue
+        for op, value in saved_day.items():
+            if value not in absence_of_cell: absence_of_cell[value] = parse_cell(value).absence
+            if absence_of_cell[value] != CELL_ABSENCE[codes[op_row[op], d_obj.day - 1]]:
+                res.add(d_obj.day); break
+    for d_obj in days:
+        if d_obj.weekday() == 0 and d_obj.day in res:
+            res.update(d.day for d in days if 0 <= (d - d_obj).days < 7)
+    return res
+
+def _replay_day(skill_idx, saved_day, d_obj, cnt, weekly_assignments, weekly_lunches, fissi, parsed):
+    """Aggiorna lo stato di equità con un giorno salvato che non viene ricalcolato.
+
+    `parsed` memorizza (cella, id dei task) per valore: nel mese le celle si ripetono molto.
+    """
+    for op, value in saved_day.items():
+        if value not in parsed:
+            cell = parse_cell(value)
+            parsed[value] = (cell, [skill_idx.task_id[n] for n in cell.tasks if n in skill_idx.task_id])
+        cell, ids = parsed[value]
+        op_cnt = cnt.setdefault(op, {})
+        for t in ids:
+            op_cnt[t] = op_cnt.get(t, 0) + 1
+        if d_obj.weekday() == 0:
+            if ids: weekly_assignments[op] = list(ids)
+            if cell.pause and cell.absence is None and op not in fissi: weekly_lunches[op] = cell.pause
+
+def schedule_month(config, leaves, year, month, max_tasks, previous_shifts=None, seed=None, mode=MODE_GREEDY,
+                   fairness=None, only_days=None):
+    """Genera i turni di un mese senza dipendere da Streamlit.
+
+    `leaves` sono le assenze del mese (formato compatto o denso, vedi
+    absences.py), `previous_shifts` i turni già salvati del mese da preservare
+    (None = nessuno smart update). `mode` sceglie l'assegnazione dei nuovi task:
+    "greedy" (shuffle + ordinamento per task) o "optimal" (min-cost flow
+    giornaliero, vedi solver.assign_day). `fairness` (Fairness) porta i
+    conteggi dal mese precedente e viene aggiornato con quelli di questo mese.
+    Con `only_days` (giorni del mese, vedi affected_days) si ricalcolano solo
+    quei giorni: gli altri sono copiati tali e quali da `previous_shifts` e
+    riletti solo per aggiornare lo stato di equità. Ritorna (out, missing).
+    """
+    if mode not in MODES: raise ValueError(f"Modalità sconosciuta: {mode}")
+    rng = random.Random(seed)
+    days, cols, hols = month_calendar(year, month)
+    ops = config["OPERATORS"]
+    codes = absence_codes(leaves, ops, len(days))
+    skill_idx = get_skill_index(config)
+
+    task_names = skill_idx.tasks
+    task_id = skill_idx.task_id
+    task_cands = skill_idx.task_cands
+    all_tasks = sorted(range(len(task_names)), key=lambda t_i: len(task_cands[t_i]))
+    task_service = [name.split(": ", 1)[0] for name in task_names]
+    slots = config["PAUSE"]["SLOTS"]
+    fissi = config["PAUSE"]["FISSI"]
+    phones = config.get("TELEFONI", {})
+
+    out = {}
+    missing = {}
+    cnt = {op: {} for op in ops}
+
+    weekly_assignments = {}
+    last_week_assignments = {}
+    last_week_sets = {}
+    weekly_lunches = {}
+    current_week_idx = 0
+    replay_cache = {}
+
+    if fairness is not None:
+        to_ids = lambda names: [task_id[n] for n in names if n in task_id]
+        for op in ops:
+            cnt[op] = {task_id[n]: c for n, c in fairness.cnt.get(op, {}).items() if n in task_id}
+        current_week_idx = fairness.week_idx
+        if fairness.last_day is not None and (days[0] - fairness.last_day).days == 1:
+            # Mese consecutivo: la settimana a cavallo prosegue (il lunedì la ruota il ciclo)
+            weekly_assignments = {op: to_ids(ts) for op, ts in fairness.weekly.items()}
+            last_week_assignments = {op: to_ids(ts) for op, ts in fairness.last_week.items()}
+            last_week_sets = {op: set(ts) for op, ts in last_week_assignments.items()}
+            weekly_lunches = dict(fairness.lunches)
+
+    # Strutture allocate una volta per mese e riusate ogni giorno: stato degli
+    # operatori, task ancora da assegnare (flag per id) e slot pausa ruotati
+    state = {op: OpDay() for op in ops}
+    pending = [False] * len(task_names)
+    no_last_week = frozenset()
+    rotated_slots, rotated_week = [], None
+
+    for i, col in enumerate(cols):
+        d_obj = days[i]
+        monday = d_obj.weekday() == 0
+        if monday:
+            # Il dict della settimana finita non viene più modificato: basta spostarlo
+            last_week_assignments = weekly_assignments
+            last_week_sets = {op: set(ts) for op, ts in last_week_assignments.items()}
+            weekly_assignments = {}
+            weekly_lunches = {}
+            current_week_idx += 1
+
+        if only_days is not None and d_obj.day not in only_days and previous_shifts and col in previous_shifts:
+            out[col] = dict(previous_shifts[col])
+            _replay_day(skill_idx, out[col], d_obj, cnt, weekly_assignments, weekly_lunches, fissi, replay_cache)
+            continue
+
+        if d_obj.weekday() >= 5:
+            out[col] = {op: "" for op in ops}; continue
+        if d_obj in hols:
+            out[col] = {op: f"🎉 {hols[d_obj]}" for op in ops}; continue
+
+        for op, code in zip(ops, codes[:, d_obj.day - 1].tolist()): state[op].reset(CELL_ABSENCE[code])
+        available_ops = [op for op in ops if state[op].absence != "FERIE"]
+
+        if not available_ops:
+            out[col] = {op: state[op].render(task_names) for op in ops}; continue
+        available_set = set(available_ops)
+
+        for t in all_tasks: pending[t] = True
+        assigned_this_day = set()
+
+        # SMART UPDATE (match esatto sui nomi dei task salvati)
+        if previous_shifts and col in previous_shifts:
+            saved_day = previous_shifts[col]
+            for op in available_ops:
+                if op in saved_day:
+                    prev = parse_cell(saved_day[op])
+                    found_tasks = []
+                    for name in prev.tasks:
+                        t_i = task_id.get(name)
+                        if t_i is not None and pending[t_i]:
+                            pending[t_i] = False
+                            found_tasks.append(t_i)
+                    if found_tasks:
+                        rec = state[op]
+                        for t_i in found_tasks: rec.add_task(t_i)
+                        if rec.absence is None: rec.pause = prev.pause
+                        assigned_this_day.add(op)
+                        if monday: weekly_assignments.setdefault(op, []).extend(found_tasks)
+
+        # STANDARD (in modalità optimal i task della settimana entrano nel flusso come archi preferiti)
+        keep = {}
+        for op in available_ops:
+            if op not in assigned_this_day and op in weekly_assignments:
+                if mode == MODE_OPTIMAL:
+                    for t in weekly_assignments[op]:
+                        if pending[t]: keep.setdefault(t, op)
+                    continue
+                rec = state[op]
+                for t in weekly_assignments[op]:
+                    if len(rec.tasks) >= max_tasks: break
+                    if pending[t]:
+                        pending[t] = False
+                        rec.add_task(t)
+                if rec.tasks: assigned_this_day.add(op)
+
+        # NEW TASKS
+        tasks_to_assign = [t for t in all_tasks if pending[t]]
+        picks = None
+        if mode == MODE_OPTIMAL:
+            picks = assign_day(
+                tasks_to_assign,
+                lambda t: [op for op in task_cands[t] if op in available_set],
+                {op: len(state[op].tasks) for op in available_ops},
+                {op: state[op].absence is not None for op in available_ops},
+                max_tasks,
+                lambda op, t: 1 if t in last_week_sets.get(op, no_last_week) else 0,
+                lambda op, t: cnt[op].get(t, 0),
+                keep,
+            )
+            # Task della settimana rimasti a chi li aveva: come lo STANDARD greedy, prima degli altri e senza conteggio
+            for op in available_ops:
+                for t in weekly_assignments.get(op, ()) if op not in assigned_this_day else ():
+                    if keep.get(t) == op and picks.get(t) == op: state[op].add_task(t)
+            kept = {t for t, op in keep.items() if picks.get(t) == op}
+            assigned_this_day.update(keep[t] for t in kept)
+            tasks_to_assign = [t for t in tasks_to_assign if t not in kept]
+
+        for t in tasks_to_assign:
+            cands = [op for op in task_cands[t] if op in available_set]
+            if not cands:
+                missing.setdefault(col, []).append(task_names[t])
+                continue
+
+            if picks is not None:
+                chosen = picks[t]
+            else:
+                rng.shuffle(cands)
+                # Ordinamento stabile su chiavi precalcolate: stesso risultato del sort con lambda
+                keys = [(state[op].load, t in last_week_sets.get(op, no_last_week), cnt[op].get(t, 0))
+                        for op in cands]
+                order = sorted(range(len(cands)), key=keys.__getitem__)
+
+                chosen = None
+                for j in order:
+                    if keys[j][0] < max_tasks: chosen = cands[j]; break
+                # Nessuno sotto soglia: va al meno carico
+                if not chosen: chosen = cands[order[0]]
+
+            state[chosen].add_task(t)
+            op_cnt = cnt[chosen]
+            op_cnt[t] = op_cnt.get(t, 0) + 1
+            assigned_this_day.add(chosen)
+            if monday: weekly_assignments.setdefault(chosen, []).append(t)
+
+        # PAUSE
+        if rotated_week != current_week_idx:
+            rotate_idx = current_week_idx % len(slots) if slots else 0
+            rotated_slots, rotated_week = slots[rotate_idx:] + slots[:rotate_idx], current_week_idx
+        to_place = []
+        for op in available_ops:
+            rec = state[op]
+            if rec.pause is None and rec.absence is None:
+                if op in fissi: rec.pause = fissi[op] or None
+                elif op in weekly_lunches: rec.pause = weekly_lunches[op]
+                elif rotated_slots: to_place.append(op)
+        if to_place:
+            # Slot scelti per la copertura dei servizi, con le pause già decise come vincolo
+            placing = set(to_place)
+            present = [({task_service[t] for t in state[op].tasks}, state[op].pause)
+                       for op in available_ops if op not in placing]
+            plan = plan_day(rotated_slots, present,
+                            [(op, {task_service[t] for t in state[op].tasks}) for op in to_place], phones)
+            for op in to_place:
+                state[op].pause = plan[op]
+                if monday: weekly_lunches[op] = plan[op]
+
+        out[col] = {op: state[op].render(task_names) for op in ops}
+
+    if fairness is not None:
+        to_names = lambda ts: [task_names[t] for t in ts]
+        for op in ops:
+            fairness.cnt[op] = {task_names[t]: c for t, c in cnt[op].items()}
+        fairness.weekly = {op: to_names(ts) for op, ts in weekly_assignments.items()}
+        fairness.last_week = {op: to_names(ts) for op, ts in last_week_assignments.items()}
+        fairness.lunches = dict(weekly_lunches)
+        fairness.week_idx = current_week_idx
+        fairness.last_day = days[-1]
+
+    return out, missing
+
+def schedule_stats(out, max_tasks):
+    """Conteggi sintetici di un mese generato: celle con task e task oltre max_tasks"""
+    assigned, overloaded = 0, 0
+    for day in out.values():
+        for value in day.values():
+            n = len(parse_cell(value).tasks)
+            assigned += n
+            overloaded += max(0, n - max_tasks)
+    return {"assigned": assigned, "overloaded": overloaded}
+
+def pause_coverage(config, out):
+    """Persone al banco per servizio in ogni fascia delle pause, giorno per giorno.
+
+    Righe {"giorno", "fascia", "in pausa", <servizio>: al banco} per i giorni
+    lavorativi; un operatore copre i servizi dei suoi task del giorno.
+    """
+    slots = config["PAUSE"]["SLOTS"]
+    rows = []
+    parsed = {}
+    for col, day in out.items():
+        present = []
+        for value in day.values():
+            if not value: continue
+            if value not in parsed: parsed[value] = parse_cell(value)
+            cell = parsed[value]
+            if cell.holiday or cell.absence == "FERIE": continue
+            present.append(({t.split(": ", 1)[0] for t in cell.tasks}, cell.pause))
+        if not present: continue
+        for band, away, staff in day_board(slots, present).rows():
+            rows.append({"giorno": col, "fascia": band, "in pausa": away, **staff})
+    return rows
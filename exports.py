@@ -0,0 +1,145 @@
+import hashlib
+import io
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+from absences import col_day
+from styling import styled
+
+# ==============================================================================
+# SETTIMANE DEL MESE
+# ==============================================================================
+
+def split_weeks(df_month):
+    """Divide le colonne del mese in settimane (una nuova a ogni lunedì)"""
+    weeks, current = [], []
+    for col in df_month.columns:
+        if "Lun" in col and current:
+            weeks.append(df_month[current])
+            current = []
+        current.append(col)
+    if current: weeks.append(df_month[current])
+    return weeks
+
+# ==============================================================================
+# CACHE PER CONTENUTO
+# ==============================================================================
+# Gli export si generano solo al click e restano in cache per impronta del
+# contenuto: la stessa settimana scaricata più volte si genera una volta sola.
+
+_CACHE = OrderedDict()
+_CACHE_SIZE = 32
+_CACHE_LOCK = threading.Lock()
+
+def frame_hash(df, *extra):
+    """Impronta di un frame (valori, indice e colonne) più eventuali parametri"""
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(repr((list(df.columns), extra)).encode("utf-8"))
+    return h.hexdigest()
+
+def cached_export(key, build):
+    """Contenuto per `key`, generato con build() solo la prima volta"""
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+    data = build()
+    with _CACHE_LOCK:
+        _CACHE[key] = data
+        while len(_CACHE) > _CACHE_SIZE: _CACHE.popitem(last=False)
+    return data
+
+# ==============================================================================
+# FORMATI
+# ==============================================================================
+
+HTML_PAGE = """
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        table {{ border-collapse: collapse; width: 100%; font-family: Arial, sans-serif; font-size: 12px; }}
+        th, td {{ border: 1px solid #999; padding: 8px; text-align: center; vertical-align: top; }}
+        th {{ background-color: #f2f2f2; }}
+        tr:nth-child(even) {{ background-color: #f9f9f9; }}
+        td {{ white-space: pre-wrap; }}
+    </style>
+</head>
+<body>
+    <h3>{title}</h3>
+    {table}
+</body>
+</html>
+"""
+
+def week_csv(w_df):
+    return w_df.to_csv(sep=";").encode("utf-8")
+
+def week_html(w_df, w_styles, title):
+    table = styled(w_df, w_styles).format(lambda v: str(v).replace("\n", "<br>")).to_html()
+    return HTML_PAGE.format(title=title, table=table)
+
+def _ics_text(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\n", "\\n"))
+
+def _ics_fold(line):
+    """Righe ICS di al più 75 byte, continuate con uno spazio (RFC 5545)"""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75: return [line]
+    parts, current = [], b""
+    for ch in line:
+        b = ch.encode("utf-8")
+        if len(current) + len(b) > (75 if not parts else 74):
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += b
+    parts.append(current.decode("utf-8"))
+    return [parts[0]] + [" " + p for p in parts[1:]]
+
+def week_ics(w_df, year, month, title):
+    """Calendario ICS: un evento di un giorno per ogni cella non vuota"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Turni Trust//IT", f"X-WR-CALNAME:{_ics_text(title)}"]
+    for col in w_df.columns:
+        day = date(year, month, col_day(col))
+        for op, value in w_df[col].items():
+            if pd.isna(value) or not str(value).strip(): continue
+            uid = hashlib.sha1(f"{day}-{op}".encode("utf-8")).hexdigest()[:16]
+            lines += [
+                "BEGIN:VEVENT",
+                f"UID:{uid}@turni-trust",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+                f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}",
+                f"SUMMARY:{_ics_text(f'{op}: ' + str(value).splitlines()[0])}",
+                f"DESCRIPTION:{_ics_text(value)}",
+                "END:VEVENT",
+            ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(folded for line in lines for folded in _ics_fold(line)) + "\r\n"
+
+def month_bundle(df_month, month_styles, month_name, year, month):
+    """ZIP del mese: CSV/HTML/ICS di ogni settimana più il CSV completo.
+
+    Le voci vengono scritte una alla volta nell'archivio, senza tenere in
+    memoria tutti gli export insieme.
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(f"Turni_{month_name}_{year}.csv", "w") as f:
+            f.write(week_csv(df_month))
+        for i, w_df in enumerate(split_weeks(df_month), start=1):
+            base = f"Turni_{month_name}_{year}_Week{i}"
+            title = f"Turni {month_name} {year} - Settimana {i}"
+            with zf.open(f"{base}.csv", "w") as f:
+                f.write(week_csv(w_df))
+            with zf.open(f"{base}.html", "w") as f:
+                f.write(week_html(w_df, month_styles[w_df.columns], title).encode("utf-8"))
+            with zf.open(f"{base}.ics", "w") as f:
+                f.write(week_ics(w_df, year, month, title).encode("utf-8"))
+    return buf.getvalue()
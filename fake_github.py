@@ -0,0 +1,199 @@
+"""API contents di GitHub finta, su file locali, per sviluppo e prove offline.
+
+Supporta anche la parte dell'API Git Data usata per i commit di più file
+(ref, commit, tree ricorsivo, creazione di tree/commit, aggiornamento del ref).
+
+Uso: python fake_github.py --root ./dati --port 8765
+e nei secrets: GITHUB_API_URL = "http://127.0.0.1:8765", REPO_NAME = "locale/turni".
+"""
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from storage import blob_sha
+
+class FakeGitHub:
+    """Stato del repository finto: file su disco sotto `root`"""
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self._counter = itertools.count()
+        self.head = self._new_id("commit")
+        self.trees = {}    # sha -> voci del tree creato con POST
+        self.commits = {}  # sha -> {"tree", "parents"}
+
+    def _new_id(self, kind):
+        return hashlib.sha1(f"{kind}-{next(self._counter)}".encode()).hexdigest()
+
+    def bump(self):
+        """Ogni scrittura crea un nuovo commit sul branch"""
+        self.head = self._new_id("commit")
+
+    def files(self):
+        """{path: sha} di tutti i file sotto root (tree del commit corrente)"""
+        res = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for fn in filenames:
+                full = os.path.join(dirpath, fn)
+                with open(full, "rb") as f: data = f.read()
+                res[os.path.relpath(full, self.root).replace(os.sep, "/")] = blob_sha(data)
+        return res
+
+    def path(self, name):
+        full = os.path.normpath(os.path.join(self.root, name))
+        if not full.startswith(os.path.normpath(self.root)): raise ValueError(name)
+        return full
+
+    def get(self, name):
+        try:
+            with open(self.path(name), "rb") as f: return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, name, data):
+        full = self.path(name)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f: f.write(data)
+
+def make_handler(repo):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args): pass
+
+        def _send(self, status, body=None, headers=None):
+            raw = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            for k, v in (headers or {}).items(): self.send_header(k, v)
+            if body is not None: self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _contents_path(self):
+            parts = urlparse(self.path).path.split("/", 5)
+            # /repos/{owner}/{repo}/contents/{path}
+            if len(parts) == 6 and parts[1] == "repos" and parts[4] == "contents":
+                return unquote(parts[5])
+            return None
+
+        def _body(self):
+            return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+        def _git_path(self):
+            # /repos/{owner}/{repo}/git/{...} -> lista delle parti dopo git/
+            parts = urlparse(self.path).path.split("/")
+            if len(parts) > 5 and parts[1] == "repos" and parts[4] == "git": return parts[5:]
+            return None
+
+        def _git_get(self, parts):
+            if parts[:2] == ["ref", "heads"]:
+                return self._send(200, {"ref": "refs/heads/" + "/".join(parts[2:]), "object": {"sha": repo.head}})
+            if parts[0] == "commits" and len(parts) == 2:
+                return self._send(200, {"sha": parts[1], "tree": {"sha": "tree-" + parts[1]}})
+            if parts[0] == "trees" and len(parts) == 2:
+                # Solo il tree del commit corrente: i file su disco
+                with repo.lock: files = repo.files()
+                return self._send(200, {"sha": parts[1], "truncated": False,
+                                        "tree": [{"path": p, "type": "blob", "sha": sha} for p, sha in files.items()]})
+            self._send(404, {"message": "Not Found"})
+
+        def do_POST(self):
+            parts = self._git_path()
+            if parts == ["trees"]:
+                body = self._body()
+                sha = repo._new_id("tree")
+                repo.trees[sha] = body["tree"]
+                return self._send(201, {"sha": sha})
+            if parts == ["commits"]:
+                body = self._body()
+                sha = repo._new_id("commit")
+                repo.commits[sha] = {"tree": body["tree"], "parents": body["parents"]}
+                return self._send(201, {"sha": sha, "message": body.get("message")})
+            self._send(404, {"message": "Not Found"})
+
+        def do_PATCH(self):
+            parts = self._git_path()
+            if not parts or parts[:2] != ["refs", "heads"]: return self._send(404, {"message": "Not Found"})
+            body = self._body()
+            commit = repo.commits.get(body["sha"])
+            if commit is None: return self._send(422, {"message": "Object does not exist"})
+            with repo.lock:
+                if commit["parents"] != [repo.head]:
+                    return self._send(422, {"message": "Update is not a fast forward"})
+                for entry in repo.trees[commit["tree"]]:
+                    repo.put(entry["path"], entry["content"].encode("utf-8"))
+                repo.head = body["sha"]
+            self._send(200, {"ref": "refs/heads/" + "/".join(parts[2:]), "object": {"sha": body["sha"]}})
+
+        def do_GET(self):
+            git = self._git_path()
+            if git: return self._git_get(git)
+            parts = urlparse(self.path).path.split("/")
+            if len(parts) == 4 and parts[1] == "repos":
+                return self._send(200, {"full_name": f"{parts[2]}/{parts[3]}", "default_branch": "main"})
+            name = self._contents_path()
+            if name is None: return self._send(404, {"message": "Not Found"})
+            data = repo.get(name)
+            if data is None: return self._send(404, {"message": "Not Found"})
+            sha = blob_sha(data)
+            etag = f'W/"{sha}"'
+            if self.headers.get("If-None-Match") == etag: return self._send(304, headers={"ETag": etag})
+            self._send(200, {"name": os.path.basename(name), "path": name, "sha": sha, "size": len(data),
+                             "encoding": "base64", "content": base64.b64encode(data).decode()},
+                       headers={"ETag": etag})
+
+        def do_PUT(self):
+            name = self._contents_path()
+            if name is None: return self._send(404, {"message": "Not Found"})
+            body = self._body()
+            with repo.lock:
+                current = repo.get(name)
+                if current is not None and "sha" not in body:
+                    return self._send(422, {"message": "\"sha\" wasn't supplied."})
+                if current is not None and body["sha"] != blob_sha(current):
+                    return self._send(409, {"message": f"{name} does not match {body['sha']}"})
+                data = base64.b64decode(body["content"])
+                repo.put(name, data)
+                repo.bump()
+            self._send(201 if current is None else 200,
+                       {"content": {"name": os.path.basename(name), "path": name, "sha": blob_sha(data)},
+                        "commit": {"message": body.get("message")}})
+        def do_DELETE(self):
+            name = self._contents_path()
+            if name is None: return self._send(404, {"message": "Not Found"})
+            body = self._body()
+            with repo.lock:
+                current = repo.get(name)
+                if current is None: return self._send(404, {"message": "Not Found"})
+                if body.get("sha") != blob_sha(current):
+                    return self._send(409, {"message": f"{name} does not match {body.get('sha')}"})
+                os.remove(repo.path(name))
+                repo.bump()
+            self._send(200, {"content": None, "commit": {"message": body.get("message")}})
+    return Handler
+
+def serve(root, host="127.0.0.1", port=8765):
+    """Avvia il server finto; ritorna l'istanza (usare .shutdown() per fermarlo)"""
+    server = ThreadingHTTPServer((host, port), make_handler(FakeGitHub(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(FakeGitHub(args.root)))
+    print(f"API GitHub finta su http://{args.host}:{args.port} (root: {os.path.abspath(args.root)})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from absences import MERGE_CODEC, absent_days, col_day
+from engine import parse_cell
+from storage import (INDEX_CODEC, ConflictError, SaveItem, StorageError, StorageStats, blob_sha, save_many,
+                     serialize, shard_path)
+
+# ==============================================================================
+# ARCHIVIO SQLITE LOCALE
+# ==============================================================================
+# I file JSON restano l'unità di lettura e scrittura (tabella files, con lo SHA
+# git del testo come su GitHub), così MonthlyStore, SaveQueue e la cache
+# condivisa funzionano invariati. A ogni scrittura config, assenze e turni sono
+# anche scomposti in tabelle indicizzate per le interrogazioni sullo storico.
+
+SYNC_S = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    text TEXT,                      -- NULL: eliminato, in attesa di sincronizzazione
+    sha TEXT,
+    synced_sha TEXT,                -- versione remota da cui parte la modifica locale
+    synced_text TEXT,
+    dirty INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS operators (name TEXT PRIMARY KEY, position INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS skills (operator TEXT NOT NULL, task TEXT NOT NULL, PRIMARY KEY (operator, task));
+CREATE TABLE IF NOT EXISTS absences (
+    year INTEGER NOT NULL, month INTEGER NOT NULL, day INTEGER NOT NULL,
+    operator TEXT NOT NULL, kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS absences_month_op ON absences (year, month, operator);
+CREATE TABLE IF NOT EXISTS shift_cells (
+    year INTEGER NOT NULL, month INTEGER NOT NULL, day INTEGER NOT NULL,
+    operator TEXT NOT NULL, value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shift_cells_month_op ON shift_cells (year, month, operator);
+CREATE TABLE IF NOT EXISTS shift_tasks (
+    year INTEGER NOT NULL, month INTEGER NOT NULL, day INTEGER NOT NULL,
+    operator TEXT NOT NULL, service TEXT NOT NULL, task TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shift_tasks_month_op ON shift_tasks (year, month, operator);
+CREATE INDEX IF NOT EXISTS shift_tasks_service ON shift_tasks (service, year, operator);
+CREATE INDEX IF NOT EXISTS shift_tasks_task ON shift_tasks (task, year, operator);
+"""
+
+_SHARD = re.compile(r"^(leaves|shifts)/(\d{4})_(\d{2})\.json$")
+_LEGACY = re.compile(r"^(leaves|shifts)\.json$")
+
+# File letti per primi da un altro archivio; i mesi si ricavano dagli indici
+CORE_PATHS = ("config.json", "leaves/index.json", "shifts/index.json", "leaves.json", "shifts.json")
+
+def _codec_for(path):
+    if path.startswith("leaves/") and _SHARD.match(path): return MERGE_CODEC
+    if path.endswith("/index.json"): return INDEX_CODEC
+    return None
+
+class SQLiteStorage:
+    """Stessa interfaccia di GitHubStorage su un database SQLite (sviluppo, offline, local-first).
+
+    Con `remote` (es. GitHubStorage) le scritture restano locali e vengono
+    portate sul repository da push(), le modifiche remote arrivano con pull();
+    start_sync() esegue entrambi in background ogni `sync_s` secondi.
+    """
+
+    def __init__(self, path, remote=None, sync_s=SYNC_S):
+        self.path = path
+        self.remote = remote
+        self.sync_s = sync_s
+        self.stats = StorageStats()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:": self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._thread = None
+        self._wake = threading.Event()
+        self.last_sync = None
+        self.last_error = None
+
+    # --- LETTURA --------------------------------------------------------------
+
+    def read_text(self, path):
+        with self._lock:
+            row = self._db.execute("SELECT text, sha FROM files WHERE path = ? AND text IS NOT NULL",
+                                   (path,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def read(self, path):
+        text, sha = self.read_text(path)
+        if text is None: return None, None
+        return json.loads(text), sha
+
+    def read_many(self, paths):
+        return {p: self.read(p) for p in paths}
+
+    def cached_sha(self, path):
+        return self.read_text(path)[1]
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+
+    # --- SCRITTURA ------------------------------------------------------------
+
+    def _check(self, path, sha):
+        current = self.cached_sha(path)
+        if current is not None and sha != current:
+            raise ConflictError(f"Conflitto su {path}", 409)
+
+    def _store(self, path, text):
+        """Scrive il testo (None = elimina) e aggiorna le tabelle derivate; nella transazione del chiamante"""
+        new_sha = blob_sha(text.encode("utf-8")) if text is not None else None
+        if self.remote is None and text is None:
+            self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+        else:
+            self._db.execute(
+                "INSERT INTO files (path, text, sha, dirty) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET text = excluded.text, sha = excluded.sha, dirty = excluded.dirty",
+                (path, text, new_sha, int(self.remote is not None)))
+        self._reindex(path, json.loads(text) if text is not None else None)
+        return new_sha
+
+    def write_text(self, path, text, sha=None, message=None):
+        with self._lock, self._db:
+            self._check(path, sha)
+            new_sha = self._store(path, text)
+        self._wake.set()
+        return new_sha
+
+    def write(self, path, content, sha=None, message=None):
+        return self.write_text(path, serialize(content), sha=sha, message=message)
+
+    def write_many(self, files, message=None):
+        """Tutto o niente, in una transazione"""
+        with self._lock, self._db:
+            for path, (_, sha) in files.items():
+                if self.cached_sha(path) != sha: raise ConflictError(f"Conflitto su {path}", 409)
+            new_shas = {path: self._store(path, serialize(content)) for path, (content, _) in files.items()}
+        self._wake.set()
+        return new_shas
+
+    def delete(self, path, sha, message=None):
+        with self._lock, self._db:
+            current = self.cached_sha(path)
+            if current is None: return
+            if sha != current: raise ConflictError(f"Conflitto su {path}", 409)
+            self._store(path, None)
+        self._wake.set()
+
+    # --- TABELLE DERIVATE -----------------------------------------------------
+
+    def _reindex(self, path, content):
+        db = self._db
+        if path == "config.json":
+            db.execute("DELETE FROM operators")
+            db.execute("DELETE FROM skills")
+            if content:
+                db.executemany("INSERT OR IGNORE INTO operators VALUES (?, ?)",
+                               [(op, i) for i, op in enumerate(content.get("OPERATORS", []))])
+                db.executemany("INSERT OR IGNORE INTO skills VALUES (?, ?)",
+                               [(op, t) for op, ts in content.get("SKILLS", {}).items() for t in ts])
+            return
+        m = _LEGACY.match(path)
+        if m:
+            self._reindex_legacy(m.group(1), content)
+            return
+        m = _SHARD.match(path)
+        if m: self._reindex_month(m.group(1), int(m.group(2)), int(m.group(3)), content)
+
+    def _reindex_legacy(self, kind, content):
+        """File unico non ancora migrato: i suoi mesi si indicizzano come file mensili.
+
+        Dopo migrate() (indice presente) fanno fede i file mensili e il file
+        unico, rimasto come copia di sicurezza, non si indicizza più.
+        """
+        if self.read_text(f"{kind}/index.json")[0] is not None: return
+        for table in (("absences",) if kind == "leaves" else ("shift_cells", "shift_tasks")):
+            self._db.execute(f"DELETE FROM {table}")
+        for key, data in (content or {}).items():
+            year, month = map(int, key.split("_"))
+            self._reindex_month(kind, year, month, data)
+
+    def _reindex_month(self, kind, year, month, content):
+        db = self._db
+        if kind == "leaves":
+            db.execute("DELETE FROM absences WHERE year = ? AND month = ?", (year, month))
+            if content:
+                db.executemany("INSERT INTO absences VALUES (?, ?, ?, ?, ?)",
+                               [(year, month, d, op, k) for k, by_op in absent_days(content).items()
+                                for op, ds in by_op.items() for d in ds])
+            return
+        db.execute("DELETE FROM shift_cells WHERE year = ? AND month = ?", (year, month))
+        db.execute("DELETE FROM shift_tasks WHERE year = ? AND month = ?", (year, month))
+        cells, tasks = [], []
+        for col, day in (content or {}).items():
+            d = col_day(col)
+            for op, value in day.items():
+                if not value: continue
+                cells.append((year, month, d, op, value))
+                for t in parse_cell(value).tasks:
+                    tasks.append((year, month, d, op, t.split(": ", 1)[0], t))
+        db.executemany("INSERT INTO shift_cells VALUES (?, ?, ?, ?, ?)", cells)
+        db.executemany("INSERT INTO shift_tasks VALUES (?, ?, ?, ?, ?, ?)", tasks)
+
+    # --- INTERROGAZIONI -------------------------------------------------------
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(**filters):
+        clauses = [f"{col} = ?" for col, v in filters.items() if v is not None]
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", [v for v in filters.values() if v is not None]
+
+    def coverage(self, operator=None, service=None, task=None, year=None, month=None):
+        """Giorni in cui ogni operatore ha coperto ogni task. Ritorna [(operatore, task, giorni)]"""
+        where, params = self._where(operator=operator, service=service, task=task, year=year, month=month)
+        return self._query(f"SELECT operator, task, COUNT(*) FROM shift_tasks{where} "
+                           "GROUP BY operator, task ORDER BY operator, task", params)
+
+    def absence_summary(self, operator=None, year=None, month=None):
+        """Giorni di assenza per operatore e tipo. Ritorna [(operatore, tipo, giorni)]"""
+        where, params = self._where(operator=operator, year=year, month=month)
+        return self._query(f"SELECT operator, kind, COUNT(*) FROM absences{where} "
+                           "GROUP BY operator, kind ORDER BY operator, kind", params)
+
+    def month_cells(self, year, month, operator=None):
+        """Celle salvate del mese. Ritorna [(giorno, operatore, valore)]"""
+        where, params = self._where(year=year, month=month, operator=operator)
+        return self._query(f"SELECT day, operator, value FROM shift_cells{where} ORDER BY day, operator", params)
+
+    # --- IMPORTAZIONE E SINCRONIZZAZIONE --------------------------------------
+
+    @staticmethod
+    def source_paths(source):
+        """File presenti in un altro archivio: config, file unici e mesi elencati negli indici"""
+        loaded = source.read_many(list(CORE_PATHS))
+        paths = [p for p, (data, _) in loaded.items() if data is not None]
+        for kind in ("leaves", "shifts"):
+            index = loaded[f"{kind}/index.json"][0]
+            if index: paths += [shard_path(kind, key) for key in index.get("months", [])]
+        return paths
+
+    def import_from(self, source):
+        """Copia tutti i file di `source` (LocalStorage, GitHubStorage). Ritorna il numero di file"""
+        paths = self.source_paths(source)
+        with self._lock, self._db:
+            for path in paths:
+                text, sha = source.read_text(path)
+                if text is None: continue
+                self._store(path, text)
+                self._db.execute("UPDATE files SET synced_sha = ?, synced_text = ?, dirty = 0 WHERE path = ?",
+                                 (sha, text, path))
+        return len(paths)
+
+    def pull(self):
+        """Porta in locale i file cambiati sul remoto e non modificati qui. Ritorna i path aggiornati"""
+        paths = set(self.source_paths(self.remote))
+        with self._lock:
+            rows = {p: (sha, dirty) for p, sha, dirty in self._db.execute("SELECT path, synced_sha, dirty FROM files")}
+        paths |= {p for p, (sha, dirty) in rows.items() if sha and not dirty}
+        changed = []
+        for path in sorted(paths):
+            synced_sha, dirty = rows.get(path, (None, 0))
+            if dirty: continue
+            text, sha = self.remote.read_text(path)
+            if sha == synced_sha: continue
+            with self._lock, self._db:
+                # Modificato in locale durante la lettura: ci penserà push()
+                if self._db.execute("SELECT dirty FROM files WHERE path = ? AND dirty = 1", (path,)).fetchone():
+                    continue
+                if text is None:
+                    self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+                    self._reindex(path, None)
+                else:
+                    self._store(path, text)
+                    self._db.execute("UPDATE files SET synced_sha = ?, synced_text = ?, dirty = 0 WHERE path = ?",
+                                     (sha, text, path))
+            changed.append(path)
+        return changed
+
+    def push(self):
+        """Scrive sul remoto i file modificati in locale (un commit, merge a tre vie come SaveQueue).
+        Ritorna i path sincronizzati"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, text, sha, synced_sha, synced_text FROM files WHERE dirty = 1"
+                                    ).fetchall()
+        if not rows: return []
+        items = []
+        for path, text, sha, synced_sha, synced_text in rows:
+            if text is None:
+                if synced_sha: self.remote.delete(path, synced_sha, message=f"Delete {path}")
+                with self._lock, self._db:
+                    self._db.execute("DELETE FROM files WHERE path = ? AND text IS NULL", (path,))
+                continue
+            base = json.loads(synced_text) if synced_text is not None else None
+            items.append(SaveItem(path, json.loads(text), synced_sha, base, _codec_for(path)))
+        results = save_many(self.remote, items, message="Sync dal database locale") if items else {}
+        pushed = {path: sha for path, _, sha, _, _ in rows}
+        with self._lock, self._db:
+            for path, result in results.items():
+                text = serialize(result.content)
+                if self.cached_sha(path) == pushed[path]:
+                    # Nessuna modifica locale nel frattempo: si adotta la versione unita
+                    self._store(path, text)
+                    self._db.execute("UPDATE files SET dirty = 0 WHERE path = ?", (path,))
+                self._db.execute("UPDATE files SET synced_sha = ?, synced_text = ? WHERE path = ?",
+                                 (result.sha, text, path))
+        return [path for path, *_ in rows]
+
+    def sync(self):
+        """push() e poi pull(); errori di rete registrati in last_error (si resta offline)"""
+        try:
+            self.push()
+            self.pull()
+            self.last_sync, self.last_error = time.time(), None
+        except StorageError as e:
+            self.last_error = str(e)
+
+    def start_sync(self):
+        """Sincronizzazione in background con il remoto (una volta sola)"""
+        if self.remote is None or self._thread is not None: return
+        self._thread = threading.Thread(target=self._run, name="sqlite-sync", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.sync()
+            # Dopo una scrittura si sincronizza subito, altrimenti ogni sync_s secondi
+            self._wake.wait(self.sync_s)
+            self._wake.clear()
+
+    def status(self):
+        with self._lock:
+            dirty = self._db.execute("SELECT COUNT(*) FROM files WHERE dirty = 1").fetchone()[0]
+        return {"db": self.path, "dirty": dirty, "last_sync": self.last_sync, "last_error": self.last_error,
+                "remote": self.remote is not None}
@@ -0,0 +1,79 @@
+import copy
+
+# ==============================================================================
+# DELTA A LIVELLO DI CAMPO E MERGE A TRE VIE
+# ==============================================================================
+# Un delta è {percorso (tupla di chiavi): valore | DELETED}. I dict vengono
+# attraversati: aggiunte e modifiche sono registrate sulle singole foglie
+# (stringhe, numeri, liste), le rimozioni sulla chiave più alta sparita.
+
+DELETED = object()
+_MISSING = object()
+
+def get_in(doc, path):
+    node = doc
+    for k in path:
+        if not isinstance(node, dict) or k not in node: return _MISSING
+        node = node[k]
+    return node
+
+def diff(base, local, prefix=()):
+    """Delta che trasforma `base` in `local`"""
+    base = base if isinstance(base, dict) else {}
+    delta = {}
+    for k, v in (local or {}).items():
+        path = prefix + (k,)
+        b = base.get(k, _MISSING)
+        if isinstance(v, dict):
+            if not v and not isinstance(b, dict): delta[path] = {}
+            else: delta.update(diff(b, v, path))
+        elif b != v:
+            delta[path] = v
+    for k in base:
+        if k not in (local or {}): delta[prefix + (k,)] = DELETED
+    return delta
+
+def apply_delta(doc, delta):
+    """Applica il delta a `doc` (modificato sul posto) e lo ritorna"""
+    for path, value in delta.items():
+        node = doc
+        for k in path[:-1]:
+            child = node.get(k)
+            if not isinstance(child, dict):
+                if value is DELETED: break
+                child = node[k] = {}
+            node = child
+        else:
+            last = path[-1]
+            if value is DELETED: node.pop(last, None)
+            elif value == {}:
+                if not isinstance(node.get(last), dict): node[last] = {}
+            else: node[last] = copy.deepcopy(value)
+    return doc
+
+def three_way_merge(base, local, remote):
+    """Riporta su `remote` le modifiche fatte da `base` a `local`.
+
+    Ritorna (merged, conflicts): un conflitto è un campo cambiato in modo
+    diverso sia in locale sia in remoto; vince la modifica locale e il valore
+    remoto sovrascritto viene riportato in `conflicts`.
+    """
+    delta = diff(base, local)
+    conflicts = []
+    for path, value in delta.items():
+        if value == {}: continue
+        before, theirs = get_in(base, path), get_in(remote, path)
+        mine = _MISSING if value is DELETED else value
+        if theirs != before and theirs != mine:
+            conflicts.append({
+                "path": " / ".join(str(k) for k in path),
+                "local": None if mine is _MISSING else mine,
+                "remote": None if theirs is _MISSING else theirs,
+            })
+    merged = apply_delta(copy.deepcopy(remote or {}), delta)
+    return merged, conflicts
+
+def describe(delta):
+    """Riepilogo breve di un delta per i messaggi di commit"""
+    n = len(delta)
+    return f"{n} campo modificato" if n == 1 else f"{n} campi modificati"
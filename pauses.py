@@ -0,0 +1,138 @@
+import re
+from bisect import bisect_left
+from functools import lru_cache
+
+# ==============================================================================
+# INTERVALLI ORARI
+# ==============================================================================
+# Slot, pause fisse e turni telefono sono stringhe "13:00 - 14:30", lette come
+# (inizio, fine) in minuti dalla mezzanotte. Un orario singolo ("13:00", come
+# suggerito nelle impostazioni) vale una pausa della durata tipica degli slot.
+
+TIME_RE = re.compile(r"(\d{1,2})[:.](\d{2})")
+DEFAULT_PAUSE_MIN = 60
+
+@lru_cache(maxsize=1024)
+def parse_interval(text, default_len=DEFAULT_PAUSE_MIN):
+    """(inizio, fine) in minuti da "hh:mm - hh:mm" o "hh:mm"; None se non leggibile"""
+    times = [int(h) * 60 + int(m) for h, m in TIME_RE.findall(text or "")]
+    if not times: return None
+    start = times[0]
+    end = times[1] if len(times) > 1 else start + default_len
+    return (start, end) if end > start else None
+
+def typical_length(slots):
+    """Durata più frequente degli slot (minuti)"""
+    lengths = [iv[1] - iv[0] for iv in map(parse_interval, slots) if iv]
+    return max(set(lengths), key=lengths.count) if lengths else DEFAULT_PAUSE_MIN
+
+def format_interval(start, end):
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
+def overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+# ==============================================================================
+# COPERTURA DEI SERVIZI DURANTE LE PAUSE
+# ==============================================================================
+
+class CoverageBoard:
+    """Persone al banco per servizio in una giornata, segmento per segmento.
+
+    I confini di tutti gli intervalli (slot e pause già decise) dividono la
+    giornata in segmenti elementari in cui nessuno entra o esce di pausa
+    (sweep line): ogni intervallo è un blocco contiguo di segmenti, trovato con
+    bisect. Per servizio si tengono i presenti del giorno e, per segmento,
+    quanti di loro sono in pausa.
+    """
+
+    def __init__(self, intervals):
+        self.bounds = sorted({b for iv in intervals for b in iv})
+        self.n = max(len(self.bounds) - 1, 0)
+        self.present = {}  # servizio -> persone che lo coprono oggi
+        self.away = {}     # servizio -> [in pausa per segmento]
+        self.present_total = 0
+        self.away_total = [0] * self.n
+
+    def span(self, iv):
+        return range(bisect_left(self.bounds, iv[0]), bisect_left(self.bounds, iv[1]))
+
+    def add(self, services):
+        """Un operatore al lavoro che copre `services`"""
+        self.present_total += 1
+        for s in services:
+            self.present[s] = self.present.get(s, 0) + 1
+            if s not in self.away: self.away[s] = [0] * self.n
+
+    def take_break(self, services, iv, n=1):
+        """Manda in pausa durante iv un operatore che copre `services` (n=-1 lo riporta al banco)"""
+        for k in self.span(iv):
+            self.away_total[k] += n
+            for s in services: self.away[s][k] += n
+
+    def worst_if_break(self, services, iv):
+        """Effetto di un'altra pausa durante iv, più alto = meglio: (minimo al banco tra `services`,
+        minuti di banco scoperto in meno, minimo dei presenti totali)"""
+        seg = self.span(iv)
+        worst_s, uncovered = float("inf"), 0
+        for s in services:
+            present, away = self.present[s], self.away[s]
+            for k in seg:
+                left = present - away[k] - 1
+                if left < worst_s: worst_s = left
+                if left <= 0: uncovered += self.bounds[k + 1] - self.bounds[k]
+        worst_t = min((self.present_total - self.away_total[k] - 1 for k in seg), default=float("inf"))
+        return worst_s, -uncovered, worst_t
+
+    def rows(self):
+        """Per segmento: (fascia, in pausa, {servizio: al banco})"""
+        return [
+            (format_interval(self.bounds[k], self.bounds[k + 1]), self.away_total[k],
+             {s: n - self.away[s][k] for s, n in self.present.items()})
+            for k in range(self.n)
+        ]
+
+def day_board(slots, present):
+    """CoverageBoard di un giorno; `present` = [(servizi, pausa o None)] degli operatori al lavoro"""
+    default_len = typical_length(tuple(slots))
+    fixed = [(services, parse_interval(p, default_len) if p else None) for services, p in present]
+    board = CoverageBoard([iv for iv in (parse_interval(s, default_len) for s in slots) if iv]
+                          + [iv for _, iv in fixed if iv])
+    for services, iv in fixed:
+        board.add(services)
+        if iv: board.take_break(services, iv)
+    return board
+
+def plan_day(slots, present, to_place, phones=None):
+    """Sceglie lo slot pausa degli operatori `to_place` ([(operatore, servizi)]) in un giorno.
+
+    `slots` sono nell'ordine della rotazione settimanale, `present` sono
+    (servizi, pausa già decisa o None) degli altri operatori al lavoro. Si
+    parte da chi ha meno slot compatibili con il turno telefono (`phones`,
+    operatore -> orario) e poi dai servizi con meno persone; ognuno prende lo
+    slot che lascia più persone al banco nel più scoperto dei suoi servizi,
+    poi meno minuti di banco vuoto, poi più presenti in totale, poi quello
+    della rotazione. Ritorna {operatore: slot}.
+    """
+    phones = phones or {}
+    default_len = typical_length(tuple(slots))
+    slot_iv = [parse_interval(s, default_len) for s in slots]
+    modelled = [k for k, iv in enumerate(slot_iv) if iv]
+    if not modelled:
+        return {op: slots[i % len(slots)] for i, (op, _) in enumerate(to_place)}
+
+    board = day_board(slots, list(present) + [(services, None) for _, services in to_place])
+    options = []
+    for i, (op, services) in enumerate(to_place):
+        phone = parse_interval(phones.get(op), default_len) if phones.get(op) else None
+        allowed = [k for k in modelled if not (phone and overlaps(slot_iv[k], phone))] or modelled
+        scarcity = min((board.present[s] for s in services), default=float("inf"))
+        options.append((len(allowed), scarcity, i, op, services, allowed))
+    options.sort(key=lambda o: o[:3])
+
+    res = {}
+    for placed, (_, _, _, op, services, allowed) in enumerate(options):
+        best = max(allowed, key=lambda k: (*board.worst_if_break(services, slot_iv[k]), -((k - placed) % len(slots))))
+        board.take_break(services, slot_iv[best])
+        res[op] = slots[best]
+    return res
@@ -0,0 +1,206 @@
+import atexit
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+from merge import three_way_merge
+from storage import SAVE_BACKOFF, MonthlyStore, SaveItem, StorageError, save_many
+
+# ==============================================================================
+# CODA DI SALVATAGGIO IN BACKGROUND (WRITE-BEHIND)
+# ==============================================================================
+# Regole di durabilità:
+# - una modifica è al sicuro solo dopo il commit del suo batch (status() la
+#   elenca tra i "pending" fino ad allora);
+# - la coda scrive dopo FLUSH_DELAY secondi senza nuove modifiche, e comunque
+#   entro MAX_DELAY dalla prima modifica in attesa;
+# - più modifiche allo stesso file si fondono (resta l'ultima versione) e tutti
+#   i file in attesa finiscono in un solo commit, insieme agli indici dei mesi
+#   nuovi (index.json);
+# - se il salvataggio fallisce le modifiche restano in coda e vengono
+#   riprovate con attesa crescente, mai scartate;
+# - flush() scrive subito e attende; all'uscita del processo (atexit, anche
+#   con lo stop di Streamlit via SIGTERM) tutte le code fanno flush per al
+#   massimo EXIT_TIMEOUT secondi. Un kill -9 perde al più MAX_DELAY secondi
+#   di modifiche.
+
+FLUSH_DELAY = 1.0
+MAX_DELAY = 5.0
+MAX_RETRY_WAIT = 30.0
+EXIT_TIMEOUT = 10.0
+
+Pending = namedtuple("Pending", "content sha base codec tag index")
+
+_QUEUES = weakref.WeakSet()
+
+class SaveQueue:
+    """Salvataggi asincroni verso un backend (GitHubStorage o LocalStorage).
+
+    submit() ritorna subito; un thread di lavoro scrive i file in attesa con
+    save_many (un commit per batch). I risultati si leggono con drain().
+    """
+
+    def __init__(self, backend, delay=FLUSH_DELAY, max_delay=MAX_DELAY):
+        self.backend = backend
+        self.delay = delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._pending = {}   # path -> Pending in attesa
+        self._inflight = {}  # path -> Pending in scrittura
+        self._known = {}     # path -> (sha, contenuto) dell'ultima scrittura riuscita
+        self._done = {}      # path -> (tag, SaveResult) non ancora letti
+        self._first = self._last = None
+        self._retry_at = 0.0
+        self._failures = 0
+        self._flush_now = False
+        self._thread = None
+        self.commits = 0
+        self.files = 0
+        self.last_saved = None
+        self.last_error = None
+        _QUEUES.add(self)
+
+    # --- API ------------------------------------------------------------------
+
+    def submit(self, path, content, sha=None, base=None, codec=None, tag=None, index=None):
+        """Mette in coda la versione `content` di `path`, modificata a partire da
+        `base` letta allo SHA `sha` (come save_with_merge). Con `index` = (kind,
+        mese) il file è un mese di MonthlyStore: se nuovo, il commit aggiorna
+        anche `{kind}/index.json` (risultato in drain() con tag "index")."""
+        self.submit_many({path: Pending(content, sha, base, codec, tag, index)})
+
+    def submit_many(self, entries):
+        """Come submit() per più file {path: Pending}: entrano insieme in coda e
+        quindi nello stesso commit (con gli indici dei mesi nuovi)"""
+        if not entries: return
+        with self._cond:
+            now = time.monotonic()
+            self._pending.update(entries)
+            if self._first is None: self._first = now
+            self._last = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="save-queue", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Scrive subito quanto è in coda e attende. Ritorna True se tutto è salvato"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_now = True
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: return False
+                self._cond.wait(remaining)
+            return True
+
+    def forget(self, path):
+        """Dimentica un file eliminato: le prossime scritture partono da sha/base passati"""
+        with self._cond:
+            self._known.pop(path, None)
+            self._done.pop(path, None)
+
+    def drain(self):
+        """Risultati dei salvataggi conclusi {path: (tag, SaveResult)}, esclusi i file
+        ancora in coda (la loro versione in sessione è più recente)"""
+        with self._cond:
+            ready = {p: r for p, r in self._done.items() if p not in self._pending and p not in self._inflight}
+            for p in ready: del self._done[p]
+            return ready
+
+    def status(self):
+        with self._cond:
+            return {
+                "pending": sorted(set(self._pending) | set(self._inflight)),
+                "saving": bool(self._inflight),
+                "commits": self.commits,
+                "files": self.files,
+                "last_saved": self.last_saved,
+                "last_error": self.last_error,
+            }
+
+    # --- THREAD DI LAVORO -----------------------------------------------------
+
+    def _next_batch(self):
+        """Attende il momento di scrivere e prende i file in attesa (None se non c'è altro)"""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._flush_now = False
+                    self._thread = None
+                    return None
+                now = time.monotonic()
+                wake = max(min(self._last + self.delay, self._first + self.max_delay), self._retry_at)
+                if self._flush_now or now >= wake: break
+                self._cond.wait(wake - now)
+            batch, self._pending, self._first = self._pending, {}, None
+            self._inflight = batch
+            return batch
+
+    def _rebase(self, path, entry):
+        """Riporta la modifica sull'ultima versione scritta dalla coda, se più recente di `sha`"""
+        known = self._known.get(path)
+        if known is None or known[0] == entry.sha: return entry, []
+        identity = (lambda d: d, lambda d: d)
+        to_fields, from_fields = entry.codec or identity
+        merged, conflicts = three_way_merge(to_fields(entry.base), to_fields(entry.content), to_fields(known[1]))
+        return entry._replace(content=from_fields(merged), sha=known[0], base=known[1]), conflicts
+
+    def _index_items(self, batch):
+        """SaveItem degli indici dei mesi nel batch che non vi sono ancora elencati"""
+        by_kind = {}
+        for entry in batch.values():
+            if entry.index: by_kind.setdefault(entry.index[0], []).append(entry.index[1])
+        items = (MonthlyStore(self.backend, kind).index_item(keys) for kind, keys in by_kind.items())
+        return [item for item in items if item]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None: return
+            with self._cond:
+                rebased = {path: self._rebase(path, entry) for path, entry in batch.items()}
+            items = [SaveItem(path, e.content, e.sha, e.base, e.codec) for path, (e, _) in rebased.items()]
+            try:
+                results = save_many(self.backend, items + self._index_items(batch))
+            except StorageError as e:
+                with self._cond:
+                    for path, entry in batch.items():
+                        # Una versione più recente in coda contiene già questa modifica
+                        self._pending.setdefault(path, entry)
+                    now = time.monotonic()
+                    self._first = self._first or now
+                    self._last = self._last or now
+                    self._inflight = {}
+                    self._failures += 1
+                    self._retry_at = now + min(SAVE_BACKOFF * 2 ** self._failures, MAX_RETRY_WAIT)
+                    self.last_error = str(e)
+                    self._cond.notify_all()
+                continue
+
+            with self._cond:
+                written = [r for r in results.values() if r.attempts]
+                for path, result in results.items():
+                    self._known[path] = (result.sha, result.content)
+                    if path not in batch:
+                        self._done[path] = ("index", result)
+                        continue
+                    conflicts = rebased[path][1] + result.conflicts
+                    self._done[path] = (batch[path].tag, result._replace(conflicts=conflicts))
+                if written:
+                    self.commits += 1
+                    self.files += len(written)
+                    self.last_saved = time.time()
+                self._inflight = {}
+                self._failures = 0
+                self._retry_at = 0.0
+                self.last_error = None
+                self._cond.notify_all()
+
+def _flush_all():
+    for queue in list(_QUEUES):
+        queue.flush(timeout=EXIT_TIMEOUT)
+
+atexit.register(_flush_all)
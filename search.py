@@ -0,0 +1,119 @@
+import copy
+import statistics
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from engine import MODE_GREEDY, parse_cell, schedule_month
+from skills import get_skill_index
+
+# ==============================================================================
+# PUNTEGGIO DI UN MESE GENERATO
+# ==============================================================================
+
+# Pesi del punteggio (più basso = meglio): prima la copertura, poi i sovraccarichi,
+# poi l'equilibrio dei carichi e la rotazione dei task
+MISSING_W = 1000
+OVERLOAD_W = 100
+LOAD_VAR_W = 10
+REPEAT_W = 1
+SPREAD_W = 1
+
+Score = namedtuple("Score", "total missing overloaded load_var repeats spread")
+
+def score_schedule(config, out, missing, max_tasks):
+    """Punteggio di un mese: task mancanti, task oltre max_tasks, varianza dei carichi
+    giornalieri, task ripetuti rispetto alla settimana precedente e differenza
+    tra chi ha fatto più e meno volte ogni task (tra gli abilitati)."""
+    skill_idx = get_skill_index(config)
+    n_missing = sum(len(v) for v in missing.values())
+    overloaded = 0
+    loads = []
+    counts = {}
+    weeks = []
+    for col, day in out.items():
+        if "Lun" in col or not weeks: weeks.append(set())
+        for op, value in day.items():
+            cell = parse_cell(value)
+            if cell.holiday or cell.absence == "FERIE" or not value: continue
+            loads.append(len(cell.tasks))
+            overloaded += max(0, len(cell.tasks) - max_tasks)
+            for t in cell.tasks:
+                counts[(op, t)] = counts.get((op, t), 0) + 1
+                weeks[-1].add((op, t))
+    load_var = statistics.pvariance(loads) if len(loads) > 1 else 0.0
+    repeats = sum(len(a & b) for a, b in zip(weeks, weeks[1:]))
+    spread = 0
+    for t_i, name in enumerate(skill_idx.tasks):
+        done = [counts.get((op, name), 0) for op in skill_idx.task_cands[t_i]]
+        if done: spread += max(done) - min(done)
+    total = (MISSING_W * n_missing + OVERLOAD_W * overloaded + LOAD_VAR_W * load_var
+             + REPEAT_W * repeats + SPREAD_W * spread)
+    return Score(round(total, 3), n_missing, overloaded, round(load_var, 4), repeats, spread)
+
+# ==============================================================================
+# RICERCA MIGLIORE DI N
+# ==============================================================================
+
+SearchResult = namedtuple("SearchResult", "seed out missing score trials elapsed stopped")
+
+def _trial(args):
+    config, leaves, year, month, max_tasks, previous_shifts, only_days, fairness, seed = args
+    # Ogni tentativo parte dallo stesso stato di equità (schedule_month lo aggiorna)
+    fairness = copy.deepcopy(fairness)
+    out, missing = schedule_month(config, leaves, year, month, max_tasks, previous_shifts=previous_shifts,
+                                  seed=seed, mode=MODE_GREEDY, only_days=only_days, fairness=fairness)
+    return seed, out, missing, score_schedule(config, out, missing, max_tasks)
+
+def best_of(config, leaves, year, month, max_tasks, n_trials=100, base_seed=0, budget_s=2.0, patience=None,
+            workers=1, previous_shifts=None, only_days=None, fairness=None):
+    """Genera il mese con i semi base_seed, base_seed+1, ... e tiene il punteggio migliore.
+
+    Si ferma dopo `n_trials` tentativi, allo scadere di `budget_s` secondi o
+    dopo `patience` tentativi di fila senza miglioramenti. Con `workers` > 1 i
+    tentativi girano in un pool di processi. Il seed del migliore riproduce
+    esattamente lo stesso mese con schedule_month(..., seed=seed) e la stessa `fairness`,
+    che i tentativi non modificano.
+    Ritorna SearchResult (`stopped`: "trials", "budget" o "patience").
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + budget_s if budget_s else None
+    best, trials, since_best, stopped = None, 0, 0, "trials"
+    seeds = iter(range(base_seed, base_seed + n_trials))
+
+    def consider(result):
+        nonlocal best, trials, since_best
+        trials += 1
+        # A parità di punteggio vince il seed più basso: risultato indipendente dai worker
+        if best is None or (result[3].total, result[0]) < (best[3].total, best[0]):
+            best, since_best = result, 0
+        else:
+            since_best += 1
+
+    def should_stop():
+        nonlocal stopped
+        if deadline is not None and time.perf_counter() >= deadline: stopped = "budget"
+        elif patience and since_best >= patience: stopped = "patience"
+        else: return False
+        return True
+
+    job = lambda seed: (config, leaves, year, month, max_tasks, previous_shifts, only_days, fairness, seed)
+    if not workers or workers <= 1:
+        for seed in seeds:
+            consider(_trial(job(seed)))
+            if should_stop(): break
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = set()
+            for seed in seeds:
+                running.add(pool.submit(_trial, job(seed)))
+                if len(running) < 2 * workers: continue
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for f in done: consider(f.result())
+                if should_stop(): break
+            for f in running: f.cancel()
+            for f in running:
+                if not f.cancelled(): consider(f.result())
+
+    seed, out, missing, score = best
+    return SearchResult(seed, out, missing, score, trials, time.perf_counter() - t0, stopped)
@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import StorageError, shard_path
+
+# ==============================================================================
+# CACHE CONDIVISA TRA LE SESSIONI
+# ==============================================================================
+# Una sola copia per processo di ogni file letto dal repository, per SHA. Le
+# sessioni leggono gli stessi oggetti e non li modificano mai: le loro
+# modifiche restano in una sovrapposizione locale (SessionMonths) finché il
+# salvataggio non le riporta qui con put(). Un thread rilegge ogni REFRESH_S
+# secondi i file noti (304 se invariati) e sostituisce quelli cambiati sul
+# repository, così ogni sessione vede i salvataggi degli altri al rerun.
+
+REFRESH_S = 30.0
+
+Entry = namedtuple("Entry", "data sha")
+MISSING = Entry(None, None)
+
+class SharedData:
+    """Cache di processo {path: Entry(dati, sha)} sopra un backend (GitHubStorage o LocalStorage)"""
+
+    def __init__(self, backend, refresh_s=REFRESH_S):
+        self.backend = backend
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._prefetching = set()
+        self.version = 0
+        self.last_refresh = None
+        self.last_error = None
+
+    # --- LETTURA --------------------------------------------------------------
+
+    def get_many(self, paths):
+        """Ritorna {path: Entry}; legge dal backend (in parallelo) solo i file mai caricati"""
+        missing = self.missing(paths)
+        if missing:
+            loaded = self.backend.read_many(missing)
+            with self._lock:
+                for path, (data, sha) in loaded.items():
+                    # Un'altra sessione può averlo caricato o salvato nel frattempo: vince quello
+                    self._entries.setdefault(path, Entry(data, sha))
+        with self._lock:
+            return {p: self._entries[p] for p in paths}
+
+    def get(self, path):
+        return self.get_many([path])[path]
+
+    def peek(self, path):
+        """Entry già in cache, senza leggere dal backend (None se mai caricato)"""
+        with self._lock:
+            return self._entries.get(path)
+
+    def missing(self, paths):
+        """Path mai caricati"""
+        with self._lock:
+            return [p for p in paths if p not in self._entries]
+
+    def prefetch(self, paths):
+        """Carica in background i file mai letti (e non già in arrivo); ritorna il thread o None"""
+        with self._lock:
+            todo = [p for p in paths if p not in self._entries and p not in self._prefetching]
+            self._prefetching.update(todo)
+        if not todo: return None
+
+        def run():
+            try:
+                self.get_many(todo)
+            except StorageError as e:
+                self.last_error = str(e)
+            finally:
+                with self._lock: self._prefetching.difference_update(todo)
+
+        thread = threading.Thread(target=run, name="shared-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    # --- AGGIORNAMENTO --------------------------------------------------------
+
+    def put(self, path, data, sha):
+        """Registra la versione appena salvata (o eliminata, con sha None)"""
+        with self._lock:
+            old = self._entries.get(path)
+            if old is not None and old.sha == sha and sha is not None: return
+            self._entries[path] = Entry(data, sha)
+            self.version += 1
+
+    def invalidate(self, *paths):
+        """Dimentica i file indicati: la prossima get li rilegge"""
+        with self._lock:
+            for path in paths: self._entries.pop(path, None)
+
+    def refresh(self):
+        """Rilegge tutti i file noti e sostituisce quelli con SHA cambiato. Ritorna i path cambiati"""
+        with self._lock:
+            known = dict(self._entries)
+        if not known: return []
+        paths = list(known)
+        with ThreadPoolExecutor(max_workers=min(4, len(paths))) as pool:
+            texts = list(pool.map(self.backend.read_text, paths))
+        changed = []
+        with self._lock:
+            for path, (text, sha) in zip(paths, texts):
+                # Salvato da questo processo durante la rilettura: la versione in cache è più nuova
+                if self._entries.get(path) is not known[path] or sha == known[path].sha: continue
+                self._entries[path] = Entry(json.loads(text) if text is not None else None, sha)
+                changed.append(path)
+            if changed: self.version += 1
+            self.last_refresh = time.time()
+        return changed
+
+    def start(self):
+        """Avvia il thread di rilettura periodica (una volta sola)"""
+        if self._thread is None and self.refresh_s:
+            self._thread = threading.Thread(target=self._run, name="shared-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_s):
+            try:
+                self.refresh()
+                self.last_error = None
+            except StorageError as e:
+                self.last_error = str(e)
+
+    def status(self):
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "prefetching": len(self._prefetching),
+                "version": self.version,
+                "last_refresh": self.last_refresh,
+                "last_error": self.last_error,
+            }
+
+# ==============================================================================
+# VISTA DI UNA SESSIONE SUI FILE MENSILI
+# ==============================================================================
+
+class SessionMonths:
+    """Mesi di un tipo ("leaves" o "shifts") visti da una sessione.
+
+    Le letture passano alla cache condivisa; un'assegnazione `view[key] = dati`
+    resta locale alla sessione (copy-on-write) insieme alla Entry condivisa da
+    cui parte, che fa da base per l'unione a tre vie del salvataggio. Quando il
+    salvataggio termina, saved() sposta la versione nella cache condivisa.
+    """
+
+    def __init__(self, shared, kind):
+        self.shared = shared
+        self.kind = kind
+        self.local = {}  # key -> dati modificati dalla sessione
+        self.bases = {}  # key -> Entry condivisa su cui si basano
+
+    def path(self, key):
+        return shard_path(self.kind, key)
+
+    def shared_entry(self, key):
+        """Ultima versione salvata (Entry), ignorando le modifiche della sessione"""
+        return self.shared.peek(self.path(key)) or MISSING
+
+    def get(self, key, default=None):
+        if key in self.local: return self.local[key]
+        data = self.shared_entry(key).data
+        return default if data is None else data
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None: raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, data):
+        if key not in self.local: self.bases[key] = self.shared_entry(key)
+        self.local[key] = data
+
+    def sha(self, key):
+        return self.bases[key].sha if key in self.local else self.shared_entry(key).sha
+
+    def base(self, key):
+        return self.bases[key].data if key in self.local else self.shared_entry(key).data
+
+    def load_legacy(self, key, data):
+        """Mese letto dal vecchio file unico (repository non ancora migrato)"""
+        self.local[key] = data
+        self.bases[key] = Entry(data, None)
+
+    def saved(self, key, data, sha):
+        self.shared.put(self.path(key), data, sha)
+        self.local.pop(key, None)
+        self.bases.pop(key, None)
+
+    def deleted(self, key):
+        self.saved(key, None, None)
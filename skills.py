@@ -0,0 +1,79 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+# ==============================================================================
+# INDICE COMPETENZE (operatori/task -> id interi)
+# ==============================================================================
+
+class SkillIndex:
+    """Catalogo task e matrice competenze precompilati.
+
+    I task ("SERVIZIO: task") e gli operatori sono mappati su id interi; per ogni
+    operatore la matrice è una bitmask intera (bit i = sa fare il task i) e per
+    ogni task è pronta la lista dei candidati in ordine di roster.
+    """
+    __slots__ = ("fingerprint", "tasks", "task_id", "ops", "op_id", "op_masks", "task_cands")
+
+    def __init__(self, config, fingerprint=None):
+        self.fingerprint = fingerprint or skills_fingerprint(config)
+        self.tasks = [f"{s}: {t}" for s, d in config["SERVICES"].items() for t in d["tasks"]]
+        self.task_id = {}
+        for i, t in enumerate(self.tasks):
+            self.task_id.setdefault(t, i)
+
+        self.ops = list(config["OPERATORS"])
+        self.op_id = {}
+        for i, op in enumerate(self.ops):
+            self.op_id.setdefault(op, i)
+
+        skills = config["SKILLS"]
+        self.op_masks = []
+        for op in self.ops:
+            mask = 0
+            for t in skills.get(op, []):
+                t_i = self.task_id.get(t)
+                if t_i is not None: mask |= 1 << t_i
+            self.op_masks.append(mask)
+
+        self.task_cands = [[] for _ in self.tasks]
+        for op, mask in zip(self.ops, self.op_masks):
+            while mask:
+                low = mask & -mask
+                self.task_cands[low.bit_length() - 1].append(op)
+                mask ^= low
+        # Task con nome duplicato nel catalogo condividono i candidati del primo
+        for t_i, t in enumerate(self.tasks):
+            if self.task_id[t] != t_i: self.task_cands[t_i] = self.task_cands[self.task_id[t]]
+
+    def has_skill(self, op, task):
+        op_i, t_i = self.op_id.get(op), self.task_id.get(task)
+        if op_i is None or t_i is None: return False
+        return bool(self.op_masks[op_i] >> t_i & 1)
+
+def skills_fingerprint(config):
+    """Impronta di operatori, catalogo servizi e matrice competenze"""
+    payload = json.dumps(
+        [config["OPERATORS"], {s: d["tasks"] for s, d in config["SERVICES"].items()}, config["SKILLS"]],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+_INDEX_CACHE = OrderedDict()
+_INDEX_CACHE_SIZE = 8
+
+def get_skill_index(config):
+    """Indice competenze per la config, ricalcolato solo se cambia la sua impronta.
+
+    Salvare la matrice competenze, la lista operatori o i task dei servizi cambia
+    l'impronta, quindi l'indice viene invalidato automaticamente.
+    """
+    fp = skills_fingerprint(config)
+    idx = _INDEX_CACHE.get(fp)
+    if idx is None:
+        idx = SkillIndex(config, fingerprint=fp)
+        _INDEX_CACHE[fp] = idx
+        if len(_INDEX_CACHE) > _INDEX_CACHE_SIZE: _INDEX_CACHE.popitem(last=False)
+    else:
+        _INDEX_CACHE.move_to_end(fp)
+    return idx
@@ -0,0 +1,145 @@
+import heapq
+
+# ==============================================================================
+# MIN-COST FLOW (successive shortest paths + potenziali di Johnson)
+# ==============================================================================
+
+class MinCostFlow:
+    """Rete di flusso a costo minimo, pura Python, con costi interi non negativi"""
+
+    def __init__(self, n):
+        self.n = n
+        self.graph = [[] for _ in range(n)]
+        # Archi come liste parallele: destinazione, capacità residua, costo
+        self.to, self.cap, self.cost = [], [], []
+
+    def add_edge(self, u, v, cap, cost):
+        e = len(self.to)
+        self.to += [v, u]
+        self.cap += [cap, 0]
+        self.cost += [cost, -cost]
+        self.graph[u].append(e)
+        self.graph[v].append(e + 1)
+        return e
+
+    def flow(self, s, t, max_flow=None):
+        """Spinge flusso da s a t (fino a max_flow) a costo minimo. Ritorna (flusso, costo)"""
+        n, to, cap, cost, graph = self.n, self.to, self.cap, self.cost, self.graph
+        potential = [0] * n
+        total_flow, total_cost = 0, 0
+        inf = float("inf")
+        while max_flow is None or total_flow < max_flow:
+            dist = [inf] * n
+            prev_edge = [-1] * n
+            dist[s] = 0
+            heap = [(0, s)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]: continue
+                # Oltre t non serve: i potenziali si aggiornano con min(dist, dist[t])
+                if u == t: break
+                pu = potential[u]
+                for e in graph[u]:
+                    if cap[e] <= 0: continue
+                    v = to[e]
+                    nd = d + cost[e] + pu - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev_edge[v] = e
+                        heapq.heappush(heap, (nd, v))
+            if dist[t] == inf: break
+            dt = dist[t]
+            for v in range(n):
+                potential[v] += min(dist[v], dt)
+
+            push = inf if max_flow is None else max_flow - total_flow
+            v = t
+            while v != s:
+                e = prev_edge[v]
+                push = min(push, cap[e])
+                v = to[e ^ 1]
+            v = t
+            while v != s:
+                e = prev_edge[v]
+                cap[e] -= push
+                cap[e ^ 1] += push
+                v = to[e ^ 1]
+            total_flow += push
+            total_cost += push * (potential[t] - potential[s])
+        return total_flow, total_cost
+
+# ==============================================================================
+# ASSEGNAZIONE GIORNALIERA OTTIMA
+# ==============================================================================
+
+# Pesi lessicografici: prima il sovraccarico, poi il task della settimana che
+# resta a chi lo ha (KEEP_W, sopra i costi di carico fino a max_tasks < 10), poi
+# il carico (come l'ordinamento della modalità greedy), la ripetizione della
+# settimana precedente e infine il conteggio mensile.
+LOAD_W = 10_000
+REPEAT_W = 100
+KEEP_W = 100_000
+OVERLOAD_W = 1_000_000
+
+def assign_day(tasks, cands_of, loads, permesso, max_tasks, repeat, count, keep=None):
+    """Assegna i task di un giorno risolvendo un min-cost flow task -> operatori.
+
+    `cands_of(t)` ritorna gli operatori abilitati e disponibili per il task t,
+    `loads[op]` il numero di task già assegnati, `permesso[op]` se l'operatore è
+    in permesso, `repeat(op, t)` / `count(op, t)` i costi di equità. Ogni
+    operatore ha `max_tasks` posti a costo crescente; oltre la soglia resta un
+    arco di sovraccarico molto costoso, così un task viene lasciato scoperto solo
+    se nessun operatore abilitato è disponibile. `keep` ({task: operatore}, i
+    task della settimana) rende preferito l'arco verso chi ha già il task: lo
+    perde solo se tenerlo costringe a un sovraccarico. Ritorna {task: operatore}.
+    """
+    keep = keep or {}
+    # Scorciatoia: prima con i task della settimana fissati (fino a max_tasks) e la
+    # rete solo sugli altri. Senza sovraccarichi è già l'ottimo della rete intera,
+    # perché KEEP_W supera ogni costo di carico: tutti i task tenibili restano.
+    kept, taken = {}, {}
+    for t, op in keep.items():
+        if loads[op] + taken.get(op, 0) < max_tasks and op in cands_of(t):
+            kept[t] = op
+            taken[op] = taken.get(op, 0) + 1
+    if kept:
+        rest = [t for t in tasks if t not in kept]
+        picks = {**kept, **_flow_day(rest, cands_of, loads, permesso, max_tasks, repeat, count, {}, taken)}
+        final = dict(loads)
+        for op in picks.values(): final[op] += 1
+        if all(n <= max(loads[op], max_tasks) for op, n in final.items()): return picks
+    return _flow_day(tasks, cands_of, loads, permesso, max_tasks, repeat, count, keep)
+
+def _flow_day(tasks, cands_of, loads, permesso, max_tasks, repeat, count, keep, taken=None):
+    """Rete e soluzione di assign_day; `taken[op]` posti già occupati dai task fissati"""
+    taken = taken or {}
+    ops = list(dict.fromkeys(op for t in tasks for op in cands_of(t)))
+    if not ops: return {}
+    n_t, n_o = len(tasks), len(ops)
+    src, sink = 0, 1 + n_t + n_o
+    op_node = {op: 1 + n_t + j for j, op in enumerate(ops)}
+    net = MinCostFlow(sink + 1)
+
+    arc_of = []
+    for i, t in enumerate(tasks):
+        net.add_edge(src, 1 + i, 1, 0)
+        for op in cands_of(t):
+            cost = REPEAT_W * repeat(op, t) + count(op, t) + (0 if keep.get(t) == op else KEEP_W)
+            e = net.add_edge(1 + i, op_node[op], 1, cost)
+            arc_of.append((e, t, op))
+
+    extra = n_t // n_o + 1
+    for op in ops:
+        node, load = op_node[op], loads[op]
+        # Il primo task di chi è in permesso costa come un posto oltre gli altri; il
+        # flusso usa i posti dal meno costoso, i task fissati occupano i primi
+        slots = sorted(max_tasks if permesso[op] and k == load == 0 else k for k in range(load, max_tasks))
+        for slot in slots[taken.get(op, 0):]:
+            net.add_edge(node, sink, 1, LOAD_W * slot)
+        first_over = max(load + taken.get(op, 0), max_tasks)
+        for k in range(first_over, first_over + extra):
+            net.add_edge(node, sink, 1, OVERLOAD_W + LOAD_W * k)
+        net.add_edge(node, sink, n_t, OVERLOAD_W * 2)
+
+    net.flow(src, sink, n_t)
+    return {t: op for e, t, op in arc_of if net.cap[e] == 0}
@@ -0,0 +1,562 @@
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from merge import describe, diff, three_way_merge
+
+API_URL = "https://api.github.com"
+
+# Politica di retry per i salvaggi con SHA superato
+SAVE_ATTEMPTS = 4
+SAVE_BACKOFF = 0.25
+
+# ==============================================================================
+# ERRORI E CONTATORI
+# ==============================================================================
+
+class StorageError(Exception):
+    """Errore di lettura/scrittura verso l'API contents di GitHub"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class ConflictError(StorageError):
+    """Lo SHA inviato non è più quello remoto (409/422 di GitHub)"""
+
+class StorageStats:
+    """Contatori di chiamate API, byte trasferiti e latenza (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.not_modified = 0
+            self.errors = 0
+            self.bytes_down = 0
+            self.bytes_up = 0
+            self.latency = 0.0
+            self.max_latency = 0.0
+
+    def record(self, status, bytes_down, bytes_up, latency):
+        with self._lock:
+            self.calls += 1
+            if status == 304: self.not_modified += 1
+            elif status >= 400: self.errors += 1
+            self.bytes_down += bytes_down
+            self.bytes_up += bytes_up
+            self.latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "not_modified": self.not_modified,
+                "errors": self.errors,
+                "bytes_down": self.bytes_down,
+                "bytes_up": self.bytes_up,
+                "latency_total_s": round(self.latency, 4),
+                "latency_avg_ms": round(self.latency * 1000 / self.calls, 1) if self.calls else 0.0,
+                "latency_max_ms": round(self.max_latency * 1000, 1),
+            }
+
+# ==============================================================================
+# CLIENT GITHUB (API CONTENTS)
+# ==============================================================================
+
+def serialize(content):
+    """Formato dei file JSON salvati sul repository"""
+    return json.dumps(content, indent=4)
+
+class GitHubStorage:
+    """Client unico per processo verso l'API contents di GitHub.
+
+    Usa una requests.Session (connessioni riusate), tiene in cache i corpi dei
+    file per SHA e rilegge con If-None-Match: un file invariato costa un 304
+    senza download. `api_url` permette di puntare a un'API finta locale.
+    """
+
+    def __init__(self, token, repo, branch=None, api_url=API_URL, timeout=15, max_workers=4):
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.stats = StorageStats()
+        # requests si importa al primo client: in modalità offline non serve
+        import requests
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+        if token: self.session.headers["Authorization"] = f"Bearer {token}"
+        self._lock = threading.Lock()
+        self._etags = {}   # path -> (etag, sha)
+        self._bodies = {}  # sha -> testo del file
+        self._default_branch = None
+
+    # --- HTTP -----------------------------------------------------------------
+
+    def _contents_url(self, path):
+        return f"{self.api_url}/repos/{self.repo}/contents/{quote(path)}"
+
+    def _request(self, method, url, **kwargs):
+        body = kwargs.get("data") or b""
+        t0 = time.perf_counter()
+        try:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except OSError as e:  # requests.RequestException deriva da OSError
+            self.stats.record(599, 0, len(body), time.perf_counter() - t0)
+            raise StorageError(f"{method} {url}: {e}") from e
+        self.stats.record(resp.status_code, len(resp.content), len(body), time.perf_counter() - t0)
+        return resp
+
+    @staticmethod
+    def _raise_for(resp, path):
+        if resp.status_code in (409, 422):
+            raise ConflictError(f"Conflitto su {path}: {resp.text[:200]}", resp.status_code)
+        raise StorageError(f"Errore {resp.status_code} su {path}: {resp.text[:200]}", resp.status_code)
+
+    # --- CACHE ----------------------------------------------------------------
+
+    def _remember(self, path, etag, sha, text):
+        with self._lock:
+            old = self._etags.get(path)
+            self._etags[path] = (etag, sha)
+            if text is not None: self._bodies[sha] = text
+            # Il corpo della versione precedente serve solo se un altro file ha lo stesso sha
+            if old and old[1] != sha and all(s != old[1] for _, s in self._etags.values()):
+                self._bodies.pop(old[1], None)
+
+    def cached_sha(self, path):
+        entry = self._etags.get(path)
+        return entry[1] if entry else None
+
+    # --- LETTURA --------------------------------------------------------------
+
+    def read_text(self, path):
+        """Ritorna (testo, sha) del file, (None, None) se non esiste"""
+        headers = {}
+        with self._lock:
+            entry = self._etags.get(path)
+            if entry and entry[0] and entry[1] in self._bodies:
+                headers["If-None-Match"] = entry[0]
+        params = {"ref": self.branch} if self.branch else None
+        resp = self._request("GET", self._contents_url(path), headers=headers, params=params)
+
+        if resp.status_code == 304:
+            sha = entry[1]
+            text = self._bodies.get(sha)
+            if text is not None: return text, sha
+            # Corpo rimosso nel frattempo da un altro thread: rilettura completa
+            with self._lock: self._etags.pop(path, None)
+            return self.read_text(path)
+        if resp.status_code == 404:
+            with self._lock: self._etags.pop(path, None)
+            return None, None
+        if resp.status_code != 200:
+            self._raise_for(resp, path)
+
+        meta = resp.json()
+        sha = meta["sha"]
+        if meta.get("encoding") == "base64" and meta.get("content") is not None:
+            text = base64.b64decode(meta["content"]).decode("utf-8")
+        else:
+            # File oltre 1 MB: l'API contents non include il corpo, si passa dal blob
+            blob = self._request("GET", f"{self.api_url}/repos/{self.repo}/git/blobs/{sha}",
+                                 headers={"Accept": "application/vnd.github.raw+json"})
+            if blob.status_code != 200: self._raise_for(blob, path)
+            text = blob.content.decode("utf-8")
+        self._remember(path, resp.headers.get("ETag"), sha, text)
+        return text, sha
+
+    def read(self, path):
+        """Ritorna (dati JSON, sha); ogni chiamata restituisce un oggetto nuovo"""
+        text, sha = self.read_text(path)
+        if text is None: return None, None
+        return json.loads(text), sha
+
+    def read_many(self, paths):
+        """Legge più file in parallelo. Ritorna {path: (dati, sha)}"""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths)) or 1) as pool:
+            results = list(pool.map(self.read, paths))
+        return dict(zip(paths, results))
+
+    # --- SCRITTURA ------------------------------------------------------------
+
+    def write_text(self, path, text, sha=None, message=None):
+        """Crea o aggiorna il file. Ritorna il nuovo sha; ConflictError se `sha` è superato"""
+        payload = {
+            "message": message or (f"Update {path}" if sha else f"Create {path}"),
+            "content": base64.b64encode(text.encode("utf-8")).decode("ascii"),
+        }
+        if sha: payload["sha"] = sha
+        if self.branch: payload["branch"] = self.branch
+        resp = self._request("PUT", self._contents_url(path), data=json.dumps(payload).encode("utf-8"),
+                             headers={"Content-Type": "application/json"})
+        if resp.status_code not in (200, 201):
+            self._raise_for(resp, path)
+        new_sha = resp.json()["content"]["sha"]
+        # Nessun ETag noto per la nuova versione: la prossima lettura sarà completa
+        self._remember(path, None, new_sha, text)
+        return new_sha
+
+    def write(self, path, content, sha=None, message=None):
+        return self.write_text(path, serialize(content), sha=sha, message=message)
+
+    def delete(self, path, sha, message=None):
+        """Elimina il file alla versione `sha`"""
+        payload = {"message": message or f"Delete {path}", "sha": sha}
+        if self.branch: payload["branch"] = self.branch
+        resp = self._request("DELETE", self._contents_url(path), data=json.dumps(payload).encode("utf-8"),
+                             headers={"Content-Type": "application/json"})
+        if resp.status_code == 404: return
+        if resp.status_code != 200: self._raise_for(resp, path)
+        with self._lock:
+            old = self._etags.pop(path, None)
+            if old and all(s != old[1] for _, s in self._etags.values()): self._bodies.pop(old[1], None)
+
+    # --- COMMIT DI PIÙ FILE (API GIT DATA) ------------------------------------
+
+    def _git_json(self, method, suffix, payload=None, ok=(200,), **kwargs):
+        url = f"{self.api_url}/repos/{self.repo}/git/{suffix}"
+        if payload is not None:
+            kwargs.update(data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"})
+        resp = self._request(method, url, **kwargs)
+        if resp.status_code not in ok: self._raise_for(resp, suffix)
+        return resp.json()
+
+    def _branch_name(self):
+        if self.branch: return self.branch
+        if self._default_branch is None:
+            resp = self._request("GET", f"{self.api_url}/repos/{self.repo}")
+            if resp.status_code != 200: self._raise_for(resp, self.repo)
+            self._default_branch = resp.json()["default_branch"]
+        return self._default_branch
+
+    def write_many(self, files, message):
+        """Scrive più file in un solo commit. `files` = {path: (contenuto, sha atteso)}.
+
+        Tutto o niente: ConflictError se uno sha atteso non è più quello del
+        branch, o se il branch avanza mentre il commit viene creato (il ref si
+        aggiorna solo in fast-forward). Ritorna {path: nuovo sha}.
+        """
+        ref = f"refs/heads/{quote(self._branch_name())}"
+        head = self._git_json("GET", ref.replace("refs/", "ref/", 1))["object"]["sha"]
+        tree_sha = self._git_json("GET", f"commits/{head}")["tree"]["sha"]
+        tree = self._git_json("GET", f"trees/{tree_sha}", params={"recursive": "1"})["tree"]
+        current = {e["path"]: e["sha"] for e in tree if e["type"] == "blob"}
+        stale = [path for path, (_, sha) in files.items() if current.get(path) != sha]
+        if stale: raise ConflictError(f"Conflitto su {', '.join(stale)}", 409)
+
+        texts = {path: serialize(content) for path, (content, _) in files.items()}
+        entries = [{"path": path, "mode": "100644", "type": "blob", "content": text} for path, text in texts.items()]
+        new_tree = self._git_json("POST", "trees", {"base_tree": tree_sha, "tree": entries}, ok=(201,))
+        commit = self._git_json("POST", "commits", {"message": message, "tree": new_tree["sha"], "parents": [head]},
+                                ok=(201,))
+        self._git_json("PATCH", ref, {"sha": commit["sha"], "force": False})
+        new_shas = {}
+        for path, text in texts.items():
+            new_shas[path] = blob_sha(text.encode("utf-8"))
+            self._remember(path, None, new_shas[path], text)
+        return new_shas
+
+# ==============================================================================
+# SALVATAGGIO CON CONCORRENZA OTTIMISTICA
+# ==============================================================================
+
+SaveResult = namedtuple("SaveResult", "sha content conflicts attempts changes")
+
+def save_with_merge(backend, path, local, sha, base=None, codec=None, message=None,
+                    max_attempts=SAVE_ATTEMPTS, backoff=SAVE_BACKOFF):
+    """Salva `local` partendo dalla versione `base` letta allo SHA `sha`.
+
+    Il delta base -> local (campi cambiati) decide se serve scrivere. Se lo SHA
+    è superato, rilegge la versione remota, vi riapplica il delta (merge a tre
+    vie, vedi merge.py) e riprova, fino a `max_attempts` volte con attesa
+    esponenziale. Senza `base` un conflitto non è risolvibile e viene
+    rilanciato (ConflictError). `codec` = (to_fields, from_fields) converte il
+    contenuto nella forma su cui calcolare il delta.
+    """
+    to_fields, from_fields = codec or (lambda d: d, lambda d: d)
+    delta = diff(to_fields(base), to_fields(local)) if base is not None else None
+    if delta == {} and sha:
+        return SaveResult(sha, local, [], 0, 0)
+    msg = message or f"Update {path}"
+    if delta: msg += f" ({describe(delta)})"
+
+    content, conflicts = local, []
+    for attempt in range(1, max_attempts + 1):
+        try:
+            new_sha = backend.write(path, content, sha, message=msg)
+            return SaveResult(new_sha, content, conflicts, attempt, None if delta is None else len(delta))
+        except ConflictError:
+            if base is None or attempt == max_attempts: raise
+            if attempt > 1: time.sleep(backoff * 2 ** (attempt - 2) * (1 + random.random()))
+            remote, sha = backend.read(path)
+            merged, conflicts = three_way_merge(to_fields(base), to_fields(local), to_fields(remote or {}))
+            content = from_fields(merged)
+
+SaveItem = namedtuple("SaveItem", "path content sha base codec")
+
+def save_many(backend, items, message=None, max_attempts=SAVE_ATTEMPTS, backoff=SAVE_BACKOFF):
+    """Come save_with_merge per più file, scritti insieme in un solo commit (write_many).
+
+    `items` è una lista di SaveItem; i file senza campi cambiati non vengono
+    scritti. In caso di conflitto si rileggono i file, si rifà il merge di
+    quelli cambiati in remoto e si riprova il commit intero. Ritorna {path: SaveResult}.
+    """
+    identity = (lambda d: d, lambda d: d)
+    results, todo = {}, []
+    for item in items:
+        to_fields, _ = item.codec or identity
+        delta = diff(to_fields(item.base), to_fields(item.content)) if item.base is not None else None
+        if delta == {} and item.sha:
+            results[item.path] = SaveResult(item.sha, item.content, [], 0, 0)
+        else:
+            todo.append((item, delta))
+    if not todo: return results
+
+    msg = message or "Update " + ", ".join(item.path for item, _ in todo)
+    changes = {(item.path,) + path: value for item, delta in todo for path, value in (delta or {}).items()}
+    if changes: msg += f" ({describe(changes)})"
+    files = {item.path: (item.content, item.sha) for item, _ in todo}
+    conflicts = {item.path: [] for item, _ in todo}
+    for attempt in range(1, max_attempts + 1):
+        try:
+            if len(files) == 1:
+                # Un solo file: basta l'API contents (una chiamata invece di quattro)
+                (path, (content, sha)), = files.items()
+                new_shas = {path: backend.write(path, content, sha, message=msg)}
+            else:
+                new_shas = backend.write_many(files, message=msg)
+            break
+        except ConflictError:
+            if attempt == max_attempts: raise
+            if attempt > 1: time.sleep(backoff * 2 ** (attempt - 2) * (1 + random.random()))
+            remote = backend.read_many([item.path for item, _ in todo])
+            for item, _ in todo:
+                data, sha = remote[item.path]
+                if sha == files[item.path][1]: continue
+                if item.base is None: raise
+                to_fields, from_fields = item.codec or identity
+                merged, conflicts[item.path] = three_way_merge(to_fields(item.base), to_fields(item.content),
+                                                               to_fields(data or {}))
+                files[item.path] = (from_fields(merged), sha)
+    for item, delta in todo:
+        results[item.path] = SaveResult(new_shas[item.path], files[item.path][0], conflicts[item.path], attempt,
+                                        None if delta is None else len(delta))
+    return results
+
+# ==============================================================================
+# ARCHIVIO SU FILE LOCALI
+# ==============================================================================
+
+def blob_sha(data):
+    """SHA di un contenuto come lo calcola git per un blob"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class LocalStorage:
+    """Stessa interfaccia di GitHubStorage su una cartella locale (CLI, sviluppo)"""
+
+    def __init__(self, root="."):
+        self.root = root
+        self.stats = StorageStats()
+
+    def _full(self, path):
+        return os.path.join(self.root, path)
+
+    def read_text(self, path):
+        try:
+            with open(self._full(path), "rb") as f: raw = f.read()
+        except FileNotFoundError:
+            return None, None
+        return raw.decode("utf-8"), blob_sha(raw)
+
+    def read(self, path):
+        text, sha = self.read_text(path)
+        if text is None: return None, None
+        return json.loads(text), sha
+
+    def read_many(self, paths):
+        return {p: self.read(p) for p in paths}
+
+    def cached_sha(self, path):
+        return self.read_text(path)[1]
+
+    def write_text(self, path, text, sha=None, message=None):
+        current = self.cached_sha(path)
+        if current is not None and sha != current:
+            raise ConflictError(f"Conflitto su {path}", 409)
+        full = self._full(path)
+        os.makedirs(os.path.dirname(full) or ".", exist_ok=True)
+        raw = text.encode("utf-8")
+        with open(full, "wb") as f: f.write(raw)
+        return blob_sha(raw)
+
+    def write(self, path, content, sha=None, message=None):
+        return self.write_text(path, serialize(content), sha=sha, message=message)
+
+    def write_many(self, files, message=None):
+        stale = [path for path, (_, sha) in files.items() if self.cached_sha(path) != sha]
+        if stale: raise ConflictError(f"Conflitto su {', '.join(stale)}", 409)
+        return {path: self.write(path, content, sha) for path, (content, sha) in files.items()}
+
+    def delete(self, path, sha, message=None):
+        current = self.cached_sha(path)
+        if current is None: return
+        if sha != current: raise ConflictError(f"Conflitto su {path}", 409)
+        os.remove(self._full(path))
+
+# ==============================================================================
+# ARCHIVIO PER MESE (leaves/2026_01.json + leaves/index.json)
+# ==============================================================================
+
+def shard_path(kind, key):
+    """Percorso del file di un mese: ("leaves", "2026_1") -> leaves/2026_01.json"""
+    year, month = key.split("_")
+    return f"{kind}/{int(year)}_{int(month):02d}.json"
+
+class MonthlyStore:
+    """Dati di un tipo ("leaves" o "shifts") suddivisi in un file per mese.
+
+    L'indice `{kind}/index.json` elenca i mesi presenti; la sua assenza indica
+    che il repository usa ancora il file unico `{kind}.json`, che viene letto in
+    modo trasparente e convertito da migrate() alla prima scrittura.
+    """
+
+    def __init__(self, backend, kind):
+        self.backend = backend
+        self.kind = kind
+        self.index_path = f"{kind}/index.json"
+        self.legacy_path = f"{kind}.json"
+
+    def path(self, key):
+        return shard_path(self.kind, key)
+
+    def read_index(self):
+        """Ritorna (lista mesi, sha) oppure (None, None) se non ancora migrato"""
+        data, sha = self.backend.read(self.index_path)
+        if data is None: return None, None
+        return data.get("months", []), sha
+
+    def index_item(self, add):
+        """SaveItem che aggiunge i mesi `add` all'indice, da scrivere nello stesso commit dei
+        loro file (save_many); None se sono già tutti elencati"""
+        months, sha = self.read_index()
+        base = {"version": 1, "months": months or []}
+        new = sorted(set(base["months"]) | set(add), key=_month_order)
+        if new == base["months"] and months is not None: return None
+        return SaveItem(self.index_path, {"version": 1, "months": new}, sha, base, INDEX_CODEC)
+
+    def _update_index(self, add=(), remove=()):
+        for _ in range(3):
+            months, sha = self.read_index()
+            months = months or []
+            new = sorted((set(months) | set(add)) - set(remove), key=_month_order)
+            if new == months: return
+            try:
+                self.backend.write(self.index_path, {"version": 1, "months": new}, sha,
+                                   message=f"Update {self.index_path}")
+                return
+            except ConflictError:
+                continue
+        raise ConflictError(f"Conflitto persistente su {self.index_path}", 409)
+
+    def load(self, key):
+        """Ritorna (dati del mese, sha del file mese); sha None se letto dal file unico"""
+        data, sha = self.backend.read(self.path(key))
+        if data is not None: return data, sha
+        months, _ = self.read_index()
+        if months is None:
+            legacy, _ = self.backend.read(self.legacy_path)
+            return (legacy or {}).get(key), None
+        return None, None
+
+    def save(self, key, data, sha=None, base=None, codec=None):
+        """Scrive il mese e, se nuovo, l'indice in un solo commit (merge come in
+        save_with_merge, vedi lì `base` e `codec`). Ritorna SaveResult"""
+        if self.migrate() and sha is None:
+            # Il mese era nel file unico: la migrazione ha appena creato il suo file
+            sha = self.backend.read_text(self.path(key))[1]
+        items = [SaveItem(self.path(key), data, sha, base, codec), self.index_item([key])]
+        results = save_many(self.backend, [item for item in items if item],
+                            message=f"Update {self.kind} {key}")
+        return results[self.path(key)]
+
+    def save_months(self, months, message=None):
+        """Scrive più mesi e l'indice in un solo commit con save_many.
+
+        `months` = {key: (dati, sha, base)}. Ritorna {key: SaveResult}.
+        """
+        self.migrate()
+        items = [SaveItem(self.path(key), data, sha, base, None) for key, (data, sha, base) in months.items()]
+        items += [item for item in [self.index_item(months)] if item]
+        results = save_many(self.backend, items, message=message or f"Update {self.kind} {', '.join(months)}")
+        return {key: results[self.path(key)] for key in months}
+
+    def delete(self, key, sha):
+        self.migrate()
+        self.backend.delete(self.path(key), sha, message=f"Delete {self.kind} {key}")
+        self._update_index(remove=[key])
+
+    def migrate(self):
+        """Conversione una tantum dal file unico: ritorna il numero di mesi migrati.
+
+        Il file unico resta nel repository come copia di sicurezza.
+        """
+        months, _ = self.read_index()
+        if months is not None: return 0
+        legacy, _ = self.backend.read(self.legacy_path)
+        legacy = legacy or {}
+        for key, data in legacy.items():
+            path = self.path(key)
+            _, sha = self.backend.read_text(path)
+            self.backend.write(path, data, sha, message=f"Migrate {self.kind} {key}")
+        self._update_index(add=list(legacy))
+        return len(legacy)
+
+def load_months(backend, keys, kinds=("leaves", "shifts")):
+    """Più mesi di più tipi con una sola read_many (in parallelo su GitHub).
+
+    Come MonthlyStore.load mese per mese: il file unico si legge, una volta per
+    tipo, solo se manca l'indice. Ritorna {kind: {key: (dati, sha)}}.
+    """
+    stores = [MonthlyStore(backend, kind) for kind in kinds]
+    loaded = backend.read_many([store.index_path for store in stores]
+                               + [store.path(key) for store in stores for key in keys])
+    result = {}
+    for store in stores:
+        months = {key: loaded[store.path(key)] for key in keys}
+        if loaded[store.index_path][0] is None and any(data is None for data, _ in months.values()):
+            legacy = backend.read(store.legacy_path)[0] or {}
+            months.update({key: (legacy.get(key), None) for key, (data, _) in months.items() if data is None})
+        result[store.kind] = months
+    return result
+
+def _month_order(key):
+    year, month = key.split("_")
+    return int(year), int(month)
+
+def _index_to_fields(index):
+    index = index or {}
+    return {"version": index.get("version", 1), **{f"mese {key}": True for key in index.get("months", [])}}
+
+def _index_from_fields(fields):
+    months = [k[len("mese "):] for k in fields if k.startswith("mese ")]
+    return {"version": fields.get("version", 1), "months": sorted(months, key=_month_order)}
+
+# Indice come {mese: True}: il merge a tre vie unisce i mesi aggiunti o tolti da più parti
+INDEX_CODEC = (_index_to_fields, _index_from_fields)
@@ -0,0 +1,60 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# COLORI DELLA GRIGLIA TURNI
+# ==============================================================================
+
+# Stili fissi, con priorità (nell'ordine) sui colori dei servizi
+FIXED_STYLES = (
+    ("FERIE", "background-color: #ffc4c4"),
+    ("P.", "background-color: #ffd966"),
+    ("🎉", "background-color: #f4cccc"),
+)
+
+class CellStyler:
+    """Stile CSS delle celle: assenze e festività, poi il colore del primo task
+    di `col_map` (nell'ordine della config) contenuto nella cella.
+
+    Tutte le chiavi stanno in un'unica regex con lookahead, così ogni posizione
+    della cella riporta la chiave di priorità più alta che inizia lì; il minimo
+    sulle posizioni è la stessa regola del vecchio controllo chiave per chiave.
+    """
+
+    def __init__(self, col_map):
+        rules = list(FIXED_STYLES) + [(task, f"background-color: {color}") for task, color in col_map.items()]
+        self.styles = [style for _, style in rules]
+        self.priority = {}
+        for i, (key, _) in enumerate(rules):
+            self.priority.setdefault(key, i)
+        self.pattern = re.compile("(?=(" + "|".join(re.escape(key) for key, _ in rules) + "))")
+
+    def style(self, value):
+        best = None
+        for m in self.pattern.finditer(str(value)):
+            p = self.priority[m.group(1)]
+            if best is None or p < best:
+                best = p
+                if p == 0: break
+        return "" if best is None else self.styles[best]
+
+    def frame_styles(self, df):
+        """Stili di tutto il frame in un passaggio: la regex gira una volta per valore distinto"""
+        codes, uniques = pd.factorize(df.astype(str).to_numpy().ravel())
+        styles = np.array([self.style(v) for v in uniques] + [""], dtype=object)
+        return pd.DataFrame(styles[codes].reshape(df.shape), index=df.index, columns=df.columns)
+
+@lru_cache(maxsize=16)
+def _compiled(items):
+    return CellStyler(dict(items))
+
+def get_cell_styler(col_map):
+    """CellStyler per la mappa task -> colore, compilato una sola volta"""
+    return _compiled(tuple(col_map.items()))
+
+def styled(df, styles):
+    """Styler pandas con gli stili già calcolati (stessa forma di `df`)"""
+    return df.style.apply(lambda _: styles, axis=None)
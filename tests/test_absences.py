@@ -0,0 +1,32 @@
+import json
+import os
+
+import pytest
+
+from absences import (KINDS, MERGE_CODEC, SPARSE_FORMAT, absence_codes, decode_frame, encode_grid, grid_frame,
+                      is_sparse, to_sparse)
+from engine import month_calendar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, "leaves.json"), encoding="utf-8") as f: LEAVES = json.load(f)
+with open(os.path.join(ROOT, "config.json"), encoding="utf-8") as f: OPS = list(dict.fromkeys(json.load(f)["OPERATORS"]))
+
+@pytest.mark.parametrize("key", sorted(LEAVES))
+def test_sparse_round_trip_on_shipped_leaves(key):
+    dense = LEAVES[key]
+    assert not is_sparse(dense)
+    sparse = to_sparse(dense)
+    assert sparse["format"] == SPARSE_FORMAT and to_sparse(sparse) is sparse
+    assert json.loads(json.dumps(sparse)) == sparse
+    _, cols, _ = month_calendar(*map(int, key.split("_")))
+    for kind in KINDS:
+        # Il vecchio formato denso e quello compatto danno la stessa griglia di celle
+        expected = [[bool(dense[kind].get(col, {}).get(op)) for col in cols] for op in OPS]
+        assert decode_frame(sparse, kind, OPS, cols).values.tolist() == expected
+        assert decode_frame(dense, kind, OPS, cols).values.tolist() == expected
+    assert (absence_codes(sparse, OPS, len(cols)) == absence_codes(dense, OPS, len(cols))).all()
+    # Nei dati spediti non ci sono due assenze nello stesso giorno: la griglia dell'editor non perde nulla
+    assert encode_grid(grid_frame(sparse, OPS, cols)) == sparse
+    to_cells, from_cells = MERGE_CODEC
+    assert from_cells(to_cells(sparse)) == sparse
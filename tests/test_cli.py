@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, "cli.py", *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+def test_history_readme_example_on_shipped_data():
+    # Esempio del README sui leaves.json / shifts.json del repository, non ancora migrati
+    out = run_cli("history", "--operator", "Daniela C.", "--service", "PEC", "--year", "2026").stdout
+    assert "Nessun turno trovato." not in out
+    rows = [line.split() for line in out.splitlines() if line.strip()]
+    assert rows and all(r[:2] == ["Daniela", "C."] and r[2] == "PEC:" for r in rows)
+    assert all(int(r[-1]) > 0 for r in rows)
+
+def test_incremental_requires_preserve():
+    res = subprocess.run([sys.executable, "cli.py", "schedule", "--year", "2026", "--month", "2", "--incremental"],
+                         cwd=ROOT, capture_output=True, text=True)
+    assert res.returncode == 2 and "--incremental richiede --preserve" in res.stderr
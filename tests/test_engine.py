@@ -0,0 +1,31 @@
+import json
+import os
+
+import pytest
+
+from absences import set_range, to_sparse
+from engine import MODES, affected_days, schedule_month
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load(name):
+    with open(os.path.join(ROOT, name), encoding="utf-8") as f: return json.load(f)
+
+@pytest.mark.parametrize("mode", MODES)
+def test_incremental_changes_only_the_day_of_the_new_absence(mode):
+    config = load("config.json")
+    leaves = to_sparse(load("leaves.json")["2026_2"])
+    saved, _ = schedule_month(config, leaves, 2026, 2, 2, seed=0, mode=mode)
+    # Ferie di un operatore con task mercoledì 4 (non un lunedì: la settimana resta)
+    assert saved["04 Mer"]["Federico P."].startswith("PEC:")
+    new_leaves = set_range(leaves, ["Federico P."], "ferie", 4, 4)
+    only_days = affected_days(config, new_leaves, 2026, 2, saved)
+    assert only_days == {4}
+    out, _ = schedule_month(config, new_leaves, 2026, 2, 2, previous_shifts=saved, seed=1, mode=mode,
+                            only_days=only_days)
+    assert list(out) == list(saved)
+    for col in saved:
+        if col == "04 Mer": continue
+        assert json.dumps(out[col], ensure_ascii=False) == json.dumps(saved[col], ensure_ascii=False), col
+    assert out["04 Mer"]["Federico P."].startswith("FERIE")
+    assert affected_days(config, new_leaves, 2026, 2, out) == set()
@@ -0,0 +1,96 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from fake_github import FakeGitHub, make_handler
+from storage import ConflictError, GitHubStorage, MonthlyStore, blob_sha
+
+@pytest.fixture
+def fake(tmp_path):
+    repo = FakeGitHub(str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(repo))
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield repo, lambda: GitHubStorage(None, "locale/turni", api_url=url)
+    server.shutdown()
+    server.server_close()
+
+def test_unchanged_file_is_revalidated_with_304(fake):
+    repo, client = fake
+    gh = client()
+    sha = gh.write("config.json", {"OPERATORS": ["Anna B."]})
+    # Dopo la scrittura non c'è ETag: la prima lettura scarica il file, le altre no
+    assert gh.read("config.json") == ({"OPERATORS": ["Anna B."]}, sha)
+    gh.stats.reset()
+    data, again = gh.read("config.json")
+    assert (data, again) == ({"OPERATORS": ["Anna B."]}, sha)
+    stats = gh.stats.snapshot()
+    assert stats["calls"] == 1 and stats["not_modified"] == 1 and stats["errors"] == 0
+    assert stats["bytes_down"] == 0
+    # Ogni lettura ritorna un oggetto nuovo, anche dalla cache
+    data["OPERATORS"].append("Zeta Z.")
+    assert gh.read("config.json")[0] == {"OPERATORS": ["Anna B."]}
+
+def test_remote_change_is_downloaded(fake):
+    repo, client = fake
+    gh, other = client(), client()
+    sha = gh.write("config.json", {"OPERATORS": []})
+    gh.read("config.json")
+    new_sha = other.write("config.json", {"OPERATORS": ["Marco R."]}, sha)
+    gh.stats.reset()
+    assert gh.read("config.json") == ({"OPERATORS": ["Marco R."]}, new_sha)
+    assert gh.stats.not_modified == 0 and gh.stats.bytes_down > 0
+
+def test_missing_file_and_stale_sha(fake):
+    repo, client = fake
+    gh = client()
+    assert gh.read("leaves.json") == (None, None)
+    assert gh.stats.errors == 1
+    sha = gh.write("leaves.json", {})
+    client().write("leaves.json", {"2026_1": {}}, sha)
+    with pytest.raises(ConflictError):
+        gh.write("leaves.json", {"2026_2": {}}, sha)
+    assert gh.stats.errors == 2 and gh.stats.calls == 3
+
+def test_read_many(fake):
+    repo, client = fake
+    gh = client()
+    shas = {p: gh.write(p, {"mese": p}) for p in ("shifts/2026_01.json", "shifts/2026_02.json")}
+    paths = [*shas, "shifts/2026_03.json"]
+    gh.read_many(paths)
+    gh.stats.reset()
+    result = gh.read_many(paths)
+    assert list(result) == paths
+    assert result == {**{p: ({"mese": p}, sha) for p, sha in shas.items()}, "shifts/2026_03.json": (None, None)}
+    assert gh.stats.calls == 3 and gh.stats.not_modified == 2
+
+def test_write_many_is_one_fast_forward_commit(fake):
+    repo, client = fake
+    gh = client()
+    sha_a = gh.write("a.json", {"v": 1})
+    head = repo.head
+    new = gh.write_many({"a.json": ({"v": 2}, sha_a), "b.json": ({"v": 1}, None)}, message="Update a, b")
+    assert len(repo.commits) == 1 and repo.commits[repo.head]["parents"] == [head]
+    assert new == {p: blob_sha(repo.get(p)) for p in ("a.json", "b.json")}
+    assert client().read_many(["a.json", "b.json"]) == {"a.json": ({"v": 2}, new["a.json"]),
+                                                       "b.json": ({"v": 1}, new["b.json"])}
+    # Gli sha nuovi sono in cache: il client che ha scritto può rileggere e riscrivere
+    assert gh.cached_sha("a.json") == new["a.json"]
+
+def test_write_many_is_all_or_nothing(fake):
+    repo, client = fake
+    gh = client()
+    sha_a = gh.write("a.json", {"v": 1})
+    client().write("a.json", {"v": "altro"}, sha_a)
+    with pytest.raises(ConflictError):
+        gh.write_many({"a.json": ({"v": 2}, sha_a), "b.json": ({"v": 1}, None)}, message="Update a, b")
+    assert repo.commits == {} and repo.get("b.json") is None
+
+def test_monthly_store_new_months_in_one_commit(fake):
+    repo, client = fake
+    store = MonthlyStore(client(), "shifts")
+    store.save_months({k: ({"01-Gio": {"PEC": k}}, None, None) for k in ("2026_1", "2026_2")})
+    assert len(repo.commits) == 1
+    assert store.read_index()[0] == ["2026_1", "2026_2"]
+    assert store.load("2026_2")[0] == {"01-Gio": {"PEC": "2026_2"}}
@@ -0,0 +1,117 @@
+import copy
+
+import pytest
+
+from merge import DELETED, apply_delta, diff, three_way_merge
+from storage import ConflictError, LocalStorage, SaveItem, save_many, save_with_merge
+
+BASE = {"01-Gio": {"Anna B.": "Ferie", "Marco R.": ""}, "02-Ven": {"Anna B.": ""}}
+
+def test_diff_and_apply_delta_round_trip():
+    local = copy.deepcopy(BASE)
+    local["01-Gio"]["Marco R."] = "Malattia"
+    del local["02-Ven"]
+    local["03-Sab"] = {}
+    delta = diff(BASE, local)
+    assert delta == {("01-Gio", "Marco R."): "Malattia", ("02-Ven",): DELETED, ("03-Sab",): {}}
+    assert apply_delta(copy.deepcopy(BASE), delta) == local
+
+def test_merge_of_non_overlapping_field_edits():
+    local, remote = copy.deepcopy(BASE), copy.deepcopy(BASE)
+    local["01-Gio"]["Marco R."] = "Malattia"
+    remote["02-Ven"]["Anna B."] = "Permesso"
+    merged, conflicts = three_way_merge(BASE, local, remote)
+    assert conflicts == []
+    assert merged["01-Gio"]["Marco R."] == "Malattia" and merged["02-Ven"]["Anna B."] == "Permesso"
+
+def test_conflict_on_the_same_field_keeps_local():
+    local, remote = copy.deepcopy(BASE), copy.deepcopy(BASE)
+    local["01-Gio"]["Anna B."] = "Malattia"
+    remote["01-Gio"]["Anna B."] = "Permesso"
+    merged, conflicts = three_way_merge(BASE, local, remote)
+    assert merged["01-Gio"]["Anna B."] == "Malattia"
+    assert conflicts == [{"path": "01-Gio / Anna B.", "local": "Malattia", "remote": "Permesso"}]
+    # Stessa modifica da entrambe le parti: nessun conflitto
+    assert three_way_merge(BASE, local, local)[1] == []
+
+class RacyStorage(LocalStorage):
+    """LocalStorage in cui un altro utente scrive `path` subito prima delle prime `races` scritture"""
+
+    def __init__(self, root, path, edits):
+        super().__init__(root)
+        self.path, self.edits = path, list(edits)
+
+    def write(self, path, content, sha=None, message=None):
+        if path == self.path and self.edits:
+            remote, current = self.read(path)
+            self.edits.pop(0)(remote)
+            super().write(path, remote, current)
+        return super().write(path, content, sha, message=message)
+
+def set_field(day, name, value):
+    def edit(doc): doc[day][name] = value
+    return edit
+
+def test_save_with_merge_retries_after_concurrent_writes(tmp_path):
+    LocalStorage(tmp_path).write("leaves.json", BASE)
+    backend = RacyStorage(tmp_path, "leaves.json",
+                          [set_field("02-Ven", "Anna B.", "Permesso"), set_field("01-Gio", "Anna B.", "Smart")])
+    base, sha = backend.read("leaves.json")
+    local = copy.deepcopy(base)
+    local["01-Gio"]["Marco R."] = "Malattia"
+    result = save_with_merge(backend, "leaves.json", local, sha, base=base, backoff=0)
+    # Due scritture concorrenti, quindi due 409 e tre tentativi; nessun campo in comune
+    assert result.attempts == 3 and result.conflicts == [] and result.changes == 1
+    saved, saved_sha = backend.read("leaves.json")
+    assert saved_sha == result.sha
+    assert saved == {"01-Gio": {"Anna B.": "Smart", "Marco R.": "Malattia"}, "02-Ven": {"Anna B.": "Permesso"}}
+
+def test_save_with_merge_reports_conflicts(tmp_path):
+    LocalStorage(tmp_path).write("leaves.json", BASE)
+    backend = RacyStorage(tmp_path, "leaves.json", [set_field("01-Gio", "Marco R.", "Permesso")])
+    base, sha = backend.read("leaves.json")
+    local = copy.deepcopy(base)
+    local["01-Gio"]["Marco R."] = "Malattia"
+    result = save_with_merge(backend, "leaves.json", local, sha, base=base, backoff=0)
+    assert result.attempts == 2
+    assert result.conflicts == [{"path": "01-Gio / Marco R.", "local": "Malattia", "remote": "Permesso"}]
+    assert backend.read("leaves.json")[0]["01-Gio"]["Marco R."] == "Malattia"
+
+def test_save_with_merge_without_base_raises(tmp_path):
+    LocalStorage(tmp_path).write("leaves.json", BASE)
+    backend = RacyStorage(tmp_path, "leaves.json", [set_field("01-Gio", "Marco R.", "Permesso")])
+    _, sha = backend.read("leaves.json")
+    with pytest.raises(ConflictError):
+        save_with_merge(backend, "leaves.json", BASE, sha, backoff=0)
+
+def test_save_with_merge_gives_up_after_max_attempts(tmp_path):
+    LocalStorage(tmp_path).write("leaves.json", BASE)
+    backend = RacyStorage(tmp_path, "leaves.json", [set_field("02-Ven", "Anna B.", str(i)) for i in range(3)])
+    base, sha = backend.read("leaves.json")
+    local = copy.deepcopy(base)
+    local["01-Gio"]["Marco R."] = "Malattia"
+    with pytest.raises(ConflictError):
+        save_with_merge(backend, "leaves.json", local, sha, base=base, max_attempts=3, backoff=0)
+
+def test_unchanged_file_is_not_written(tmp_path):
+    backend = LocalStorage(tmp_path)
+    sha = backend.write("leaves.json", BASE)
+    result = save_with_merge(backend, "leaves.json", copy.deepcopy(BASE), sha, base=BASE)
+    assert result.attempts == 0 and result.sha == sha
+
+def test_save_many_merges_only_the_files_changed_remotely(tmp_path):
+    backend = LocalStorage(tmp_path)
+    sha_a = backend.write("a.json", BASE)
+    sha_b = backend.write("b.json", BASE)
+    # Un altro utente modifica a.json dopo la lettura
+    remote = copy.deepcopy(BASE)
+    remote["02-Ven"]["Anna B."] = "Permesso"
+    backend.write("a.json", remote, sha_a)
+    local = copy.deepcopy(BASE)
+    local["01-Gio"]["Marco R."] = "Malattia"
+    results = save_many(backend, [SaveItem("a.json", local, sha_a, BASE, None),
+                                  SaveItem("b.json", local, sha_b, BASE, None)], backoff=0)
+    assert results["a.json"].attempts == results["b.json"].attempts == 2
+    assert backend.read("a.json")[0] == {"01-Gio": {"Anna B.": "Ferie", "Marco R.": "Malattia"},
+                                         "02-Ven": {"Anna B.": "Permesso"}}
+    assert backend.read("b.json")[0] == local
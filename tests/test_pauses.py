@@ -0,0 +1,53 @@
+import itertools
+
+from pauses import day_board, parse_interval, plan_day
+
+SLOTS = ["12:00 - 13:00", "13:00 - 14:00", "14:00 - 15:00"]
+# Pause fisse sovrapposte tra loro e a cavallo degli slot
+FIXED = [(["PEC"], "12:30 - 13:30"), (["PEC", "SPID"], "13:00 - 14:30")]
+TO_PLACE = [("A", ["PEC"]), ("B", ["PEC"]), ("C", ["SPID"]), ("D", ["PEC", "SPID"])]
+
+def coverage(board):
+    """{fascia: {servizio: al banco}}"""
+    return {span: at_desk for span, _, at_desk in board.rows()}
+
+def test_parse_interval():
+    assert parse_interval("13:00 - 14:30") == (780, 870)
+    assert parse_interval("13.00") == (780, 840)
+    assert parse_interval("14:00 - 13:00") is None and parse_interval("") is None
+
+def test_fixed_pauses_split_the_day_into_segments():
+    board = day_board(SLOTS, FIXED + [(services, None) for _, services in TO_PLACE])
+    assert coverage(board) == {
+        "12:00-12:30": {"PEC": 5, "SPID": 3},
+        "12:30-13:00": {"PEC": 4, "SPID": 3},
+        "13:00-13:30": {"PEC": 3, "SPID": 2},
+        "13:30-14:00": {"PEC": 4, "SPID": 2},
+        "14:00-14:30": {"PEC": 4, "SPID": 2},
+        "14:30-15:00": {"PEC": 5, "SPID": 3},
+    }
+
+def test_plan_day_minimum_coverage_per_interval():
+    plan = plan_day(SLOTS, FIXED, TO_PLACE)
+    assert sorted(plan) == ["A", "B", "C", "D"] and set(plan.values()) <= set(SLOTS)
+    board = day_board(SLOTS, FIXED + [(services, plan[op]) for op, services in TO_PLACE])
+    assert coverage(board) == {
+        "12:00-12:30": {"PEC": 4, "SPID": 2},
+        "12:30-13:00": {"PEC": 3, "SPID": 2},
+        "13:00-13:30": {"PEC": 2, "SPID": 2},
+        "13:30-14:00": {"PEC": 3, "SPID": 2},
+        "14:00-14:30": {"PEC": 3, "SPID": 1},
+        "14:30-15:00": {"PEC": 4, "SPID": 2},
+    }
+    # Nessun servizio resta scoperto e il minimo è il migliore possibile: SPID ha tre
+    # persone e una è in pausa fissa fino alle 14:30, quindi una fascia a 1 è inevitabile
+    def worst(choice):
+        placed = [(services, slot) for (_, services), slot in zip(TO_PLACE, choice)]
+        return min(min(at_desk.values()) for at_desk in coverage(day_board(SLOTS, FIXED + placed)).values())
+    assert worst([plan[op] for op, _ in TO_PLACE]) == max(map(worst, itertools.product(SLOTS, repeat=len(TO_PLACE)))) == 1
+
+def test_phone_shift_excludes_overlapping_slots():
+    plan = plan_day(SLOTS, FIXED, TO_PLACE, phones={"A": "11:30 - 13:30", "B": "12:00 - 13:30"})
+    assert plan["A"] == plan["B"] == "14:00 - 15:00"
+    # Telefono sovrapposto a tutti gli slot: si sceglie comunque tra tutti
+    assert plan_day(SLOTS, FIXED, TO_PLACE, phones={"A": "12:00 - 15:00"}) == plan_day(SLOTS, FIXED, TO_PLACE)
@@ -0,0 +1,56 @@
+from solver import MinCostFlow, assign_day
+
+def make_network():
+    # s=0 -> a=1 -> b=2 -> t=3, con la scorciatoia a->b
+    net = MinCostFlow(4)
+    net.add_edge(0, 1, 2, 1)
+    net.add_edge(0, 2, 1, 4)
+    net.add_edge(1, 2, 1, 1)
+    net.add_edge(1, 3, 1, 5)
+    net.add_edge(2, 3, 2, 1)
+    return net
+
+def test_min_cost_flow_hand_checked_optimum():
+    # Cammini: s-a-b-t costa 3, s-b-t 5, s-a-t 6; il flusso massimo (3) li usa tutti
+    assert make_network().flow(0, 3, 1) == (1, 3)
+    assert make_network().flow(0, 3, 2) == (2, 8)
+    assert make_network().flow(0, 3) == (3, 14)
+
+def assign(tasks, cands, loads, max_tasks, keep=None, count=None):
+    return assign_day(tasks, lambda t: cands[t], dict(loads), {op: False for op in loads}, max_tasks,
+                      lambda op, t: 0, count or (lambda op, t: 0), keep)
+
+def per_op(picks):
+    loads = {}
+    for op in picks.values(): loads[op] = loads.get(op, 0) + 1
+    return loads
+
+def test_keep_is_retained_over_load_and_count():
+    cands = {"PEC": ["X", "Y"]}
+    # Senza keep il task va a chi è più scarico
+    assert assign(["PEC"], cands, {"X": 1, "Y": 0}, 2) == {"PEC": "Y"}
+    assert assign(["PEC"], cands, {"X": 1, "Y": 0}, 2, keep={"PEC": "X"}) == {"PEC": "X"}
+    count = lambda op, t: 50 if op == "Y" else 0
+    assert assign(["PEC"], cands, {"X": 0, "Y": 0}, 2, keep={"PEC": "Y"}, count=count) == {"PEC": "Y"}
+
+def test_keep_is_dropped_when_it_forces_an_overload():
+    # Tenere PEC a X lascerebbe MAIL (solo X) oltre max_tasks: PEC passa a Y
+    cands = {"PEC": ["X", "Y"], "MAIL": ["X"]}
+    assert assign(["PEC", "MAIL"], cands, {"X": 0, "Y": 0}, 1, keep={"PEC": "X"}) == {"PEC": "Y", "MAIL": "X"}
+
+def test_task_unassigned_only_without_candidates():
+    cands = {"PEC": [], "MAIL": ["X"]}
+    # X è già oltre la soglia, ma è l'unico abilitato: MAIL gli va comunque
+    assert assign(["PEC", "MAIL"], cands, {"X": 3}, 2) == {"MAIL": "X"}
+    assert assign(["PEC"], cands, {"X": 0}, 2) == {}
+
+def test_overload_only_when_unavoidable():
+    tasks = ["A", "B", "C", "D"]
+    cands = {t: ["X", "Y"] for t in tasks}
+    assert per_op(assign(tasks, cands, {"X": 0, "Y": 0}, 2)) == {"X": 2, "Y": 2}
+    # Quattro task e un solo posto libero a testa: due sovraccarichi, divisi tra i due
+    assert per_op(assign(tasks, cands, {"X": 1, "Y": 1}, 2)) == {"X": 2, "Y": 2}
+    # B e C solo a X: A va a Y, altrimenti X andrebbe oltre max_tasks
+    cands = {"A": ["X", "Y"], "B": ["X"], "C": ["X"]}
+    picks = assign(["A", "B", "C"], cands, {"X": 0, "Y": 0}, 2)
+    assert picks["A"] == "Y" and per_op(picks) == {"X": 2, "Y": 1}
@@ -0,0 +1,64 @@
+from validate import RULES, VIOLATION_COLS, validate, validate_month, violation_counts
+
+CONFIG = {
+    "OPERATORS": ["Anna B.", "Marco R."],
+    "SERVICES": {"PEC": {"color": "#ffaaaa", "tasks": ["reparto.pec", "Caselle Occupate"]}},
+    "SKILLS": {"Anna B.": ["PEC: reparto.pec", "PEC: Caselle Occupate"], "Marco R.": ["PEC: reparto.pec"]},
+    "PAUSE": {"FISSI": {"Anna B.": "13:00 - 14:30", "Marco R.": "13:00 - 14:30"}, "SLOTS": []},
+}
+OK = "PEC: reparto.pec\n☕ 13:00 - 14:30"
+NO_LEAVES = {"format": "sparse-v1", "ferie": {}, "p_matt": {}, "p_pom": {}}
+
+def check(anna, marco=OK, leaves=NO_LEAVES, max_tasks=1, extra=None):
+    """Violazioni di febbraio 2026 con le sole celle di mercoledì 4 (giorno lavorativo)"""
+    day = {"Anna B.": anna, "Marco R.": marco, **(extra or {})}
+    return validate_month(CONFIG, {"04 Mer": day}, leaves, 2026, 2, max_tasks)
+
+def only(report, rule, operator="Anna B."):
+    assert list(report.columns) == VIOLATION_COLS
+    assert report[["mese", "giorno", "operatore", "regola"]].values.tolist() == [["2026_2", 4, operator, rule]]
+    return report["dettaglio"].iat[0]
+
+def test_valid_month_has_no_violations():
+    assert check(OK).empty
+    assert check("PEC: reparto.pec + PEC: Caselle Occupate\n☕ 13:00 - 14:30", max_tasks=2).empty
+
+def test_unknown_operator():
+    only(check(OK, extra={"Zeta Z.": OK}), "operatore sconosciuto", "Zeta Z.")
+
+def test_unknown_task():
+    assert only(check("PEC: inesistente\n☕ 13:00 - 14:30"), "task sconosciuto") == "PEC: inesistente"
+
+def test_missing_skill():
+    assert only(check(OK, marco="PEC: Caselle Occupate\n☕ 13:00 - 14:30"), "competenza",
+                "Marco R.") == "PEC: Caselle Occupate"
+
+def test_over_max():
+    report = check("PEC: reparto.pec + PEC: Caselle Occupate\n☕ 13:00 - 14:30")
+    assert only(report, "oltre max") == "2 task (max 1)"
+
+def test_work_on_leave():
+    leaves = {**NO_LEAVES, "ferie": {"Anna B.": [4]}}
+    # Task in un giorno di ferie: solo "lavoro in ferie", non anche "assenza"
+    assert only(check(OK, leaves=leaves), "lavoro in ferie") == "PEC: reparto.pec"
+    assert check("FERIE", leaves=leaves).empty
+
+def test_absence_mismatch():
+    assert only(check("FERIE"), "assenza") == "cella FERIE, salvata nessuna"
+    leaves = {**NO_LEAVES, "p_matt": {"Anna B.": [4]}}
+    assert only(check(OK, leaves=leaves), "assenza") == "cella presente, salvata P.MATT"
+
+def test_missing_pause():
+    only(check("PEC: reparto.pec"), "pausa mancante")
+
+def test_weekends_are_not_checked_for_absences_and_pauses():
+    shifts = {"07 Sab": {"Anna B.": "PEC: reparto.pec", "Marco R.": "FERIE"}}
+    assert validate_month(CONFIG, shifts, NO_LEAVES, 2026, 2, 1).empty
+
+def test_violation_counts_follow_rule_order():
+    shifts = {"04 Mer": {"Anna B.": "PEC: reparto.pec", "Marco R.": "FERIE"},
+              "05 Gio": {"Anna B.": "PEC: reparto.pec", "Marco R.": OK}}
+    report = validate(CONFIG, {"2026_2": shifts}, {"2026_2": NO_LEAVES}, 1)
+    counts = violation_counts(report)
+    assert counts == {"assenza": 1, "pausa mancante": 2}
+    assert list(counts) == [rule for rule in RULES if rule in counts]
@@ -0,0 +1,39 @@
+import time
+from contextlib import contextmanager
+
+# ==============================================================================
+# TEMPI PER FASE
+# ==============================================================================
+
+class StageTimer:
+    """Tempo speso in ogni fase di un'esecuzione (rerun dell'app, comando CLI).
+
+    Le fasi non vanno annidate: la parte non coperta da nessuna fase compare
+    come "altro" nel riepilogo.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}  # nome -> ms, nell'ordine della prima esecuzione
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def summary(self):
+        """Righe {"fase", "ms", "%"} più "altro" e "totale" """
+        total = self.total_ms()
+        rows = [{"fase": name, "ms": ms} for name, ms in self.stages.items()]
+        rows.append({"fase": "altro", "ms": max(total - sum(self.stages.values()), 0.0)})
+        for row in rows:
+            row["%"] = round(row["ms"] * 100 / total, 1) if total else 0.0
+            row["ms"] = round(row["ms"], 1)
+        rows.append({"fase": "totale", "ms": round(total, 1), "%": 100.0})
+        return rows
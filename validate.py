@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from absences import absence_codes
+from engine import CELL_ABSENCE, leaves_key, month_calendar, parse_cell
+from skills import get_skill_index
+
+# ==============================================================================
+# REGOLE
+# ==============================================================================
+# I turni salvati si controllano a posteriori contro la config e le assenze
+# correnti: competenze cambiate, ferie inserite dopo il calcolo, celle
+# modificate a mano. Ogni violazione è una riga (mese, giorno, operatore,
+# regola, dettaglio).
+
+RULES = {
+    "operatore sconosciuto": "Operatore non più presente in config",
+    "task sconosciuto": "Task non presente nel catalogo dei servizi",
+    "competenza": "Task fuori dalle competenze dell'operatore",
+    "oltre max": "Più task del massimo giornaliero",
+    "lavoro in ferie": "Task assegnati in un giorno di ferie",
+    "assenza": "Assenza nella cella diversa da quella salvata",
+    "pausa mancante": "Operatore al lavoro senza pausa",
+}
+
+VIOLATION_COLS = ["mese", "giorno", "operatore", "regola", "dettaglio"]
+
+def month_sort_key(key):
+    return tuple(int(x) for x in key.split("_"))
+
+# ==============================================================================
+# INDICE DELLE CELLE
+# ==============================================================================
+
+def cell_index(shifts_by_key):
+    """Scompone i mesi {chiave: {colonna: {operatore: cella}}} in due tabelle.
+
+    `rows` ha una riga per cella (mese, giorno, operatore, id della cella);
+    `cells` una riga per valore distinto (codice dell'assenza come in
+    CELL_ABSENCE, task, numero di task, senza pausa): nel mese le celle si
+    ripetono molto e ognuna si scompone una volta.
+    """
+    cell_ids = {"": 0}
+    keys, month_sizes, day_nums, day_sizes, op_names, ids = [], [], [], [], [], []
+    for key, shifts in shifts_by_key.items():
+        n_month = 0
+        for col, day in (shifts or {}).items():
+            day_nums.append(int(col[:2])); day_sizes.append(len(day))
+            op_names.extend(day)
+            ids.extend([cell_ids.setdefault(value, len(cell_ids)) if value else 0 for value in day.values()])
+            n_month += len(day)
+        keys.append(key); month_sizes.append(n_month)
+    rows = pd.DataFrame({
+        "mese": pd.Categorical(np.repeat(np.array(keys, dtype=object), month_sizes),
+                               categories=sorted(keys, key=month_sort_key), ordered=True),
+        "giorno": np.repeat(np.array(day_nums, dtype=np.int16), day_sizes),
+        "operatore": pd.Categorical(op_names),
+        "cella": np.array(ids, dtype=np.int32),
+    })
+    parsed = [parse_cell(value) if value else None for value in cell_ids]
+    cells = pd.DataFrame({
+        "codice": np.array([CELL_ABSENCE.index(c.absence) if c else 0 for c in parsed], dtype=np.int16),
+        "task": [tuple(c.tasks) if c else () for c in parsed],
+        "senza pausa": [not (c and (c.pause or c.holiday)) for c in parsed],
+    })
+    cells["n task"] = cells["task"].map(len)
+    return rows, cells
+
+# ==============================================================================
+# CONTROLLO
+# ==============================================================================
+
+def _expected(config, rows, leaves_by_key):
+    """Per ogni riga: giorno lavorativo e codice dell'assenza salvata (absence_codes, -1 se operatore sconosciuto)"""
+    ops = config["OPERATORS"]
+    op_row = pd.Series(range(len(ops)), index=pd.Index(ops)).groupby(level=0).first()
+    working = np.zeros(len(rows), dtype=bool)
+    code = np.full(len(rows), -1, dtype=np.int16)
+    op_cat = rows["operatore"].cat
+    op_pos = op_cat.categories.map(op_row).fillna(-1).to_numpy(dtype=np.int64)[op_cat.codes.to_numpy()]
+    for key, idx in rows.groupby("mese", sort=False, observed=True).indices.items():
+        year, month = map(int, key.split("_"))
+        days, _, hols = month_calendar(year, month)
+        is_working = np.array([False] + [d.weekday() < 5 and d not in hols for d in days])
+        day = rows["giorno"].to_numpy()[idx].clip(0, len(days))
+        working[idx] = is_working[day]
+        codes = absence_codes((leaves_by_key or {}).get(key) or {}, ops, len(days))
+        known = op_pos[idx] >= 0
+        code[idx[known]] = codes[op_pos[idx][known], day[known] - 1]
+    return working, code
+
+def validate(config, shifts_by_key, leaves_by_key, max_tasks):
+    """Violazioni dei mesi `shifts_by_key` rispetto a config e assenze `leaves_by_key` (stesse chiavi).
+
+    Ritorna un DataFrame con colonne VIOLATION_COLS, ordinato per mese e giorno.
+    """
+    rows, cells = cell_index(shifts_by_key)
+    if rows.empty: return pd.DataFrame(columns=VIOLATION_COLS)
+    skill_idx = get_skill_index(config)
+    fissi = config["PAUSE"]["FISSI"]
+    has_slots = bool(config["PAUSE"]["SLOTS"])
+
+    working, code = _expected(config, rows, leaves_by_key)
+    cell_of = rows["cella"].to_numpy()
+    known = code >= 0
+    n_tasks = cells["n task"].to_numpy()[cell_of]
+    cell_code = cells["codice"].to_numpy()[cell_of]
+    labels = np.array([label or "" for label in CELL_ABSENCE], dtype=object)
+
+    found = []
+
+    def add(mask, rule, detail=lambda idx: ""):
+        """Righe di `mask` come violazioni di `rule`; detail(indici delle righe) solo per quelle"""
+        idx = np.flatnonzero(mask)
+        if not len(idx): return
+        found.append(rows.iloc[idx][["mese", "giorno", "operatore"]].assign(regola=rule, dettaglio=detail(idx)))
+
+    add(~known, "operatore sconosciuto")
+
+    # Competenze: una volta per coppia (operatore, cella), poi riportate su tutte le righe
+    pairs = rows.loc[known & (n_tasks > 0), ["operatore", "cella"]].drop_duplicates()
+    if not pairs.empty:
+        pairs = pairs.assign(task=cells["task"].to_numpy()[pairs["cella"].to_numpy()]).explode("task")
+        in_catalog = pairs["task"].isin(skill_idx.task_id.keys()).to_numpy()
+        skilled = np.fromiter((skill_idx.has_skill(op, t) for op, t in zip(pairs["operatore"], pairs["task"])),
+                              dtype=bool, count=len(pairs))
+        for rule, bad in (("task sconosciuto", ~in_catalog), ("competenza", in_catalog & ~skilled)):
+            bad_pairs = pairs[bad].groupby(["operatore", "cella"], observed=True)["task"].agg(", ".join).reset_index()
+            if bad_pairs.empty: continue
+            hit = rows.merge(bad_pairs, on=["operatore", "cella"])
+            found.append(hit[["mese", "giorno", "operatore"]].assign(regola=rule, dettaglio=hit["task"]))
+
+    add(known & (n_tasks > max_tasks), "oltre max", lambda idx: [f"{n} task (max {max_tasks})" for n in n_tasks[idx]])
+
+    checked = known & working
+    in_ferie = checked & (code == CELL_ABSENCE.index("FERIE")) & (n_tasks > 0)
+    add(in_ferie, "lavoro in ferie", lambda idx: [" + ".join(cells["task"].iat[c]) for c in cell_of[idx]])
+    add(checked & (cell_code != code) & ~in_ferie, "assenza",
+        lambda idx: [f"cella {labels[a] or 'presente'}, salvata {labels[e] or 'nessuna'}"
+                     for a, e in zip(cell_code[idx], code[idx])])
+
+    no_fixed_pause = rows["operatore"].isin([op for op, p in fissi.items() if not p]).to_numpy()
+    can_pause = rows["operatore"].isin(fissi.keys()).to_numpy() | has_slots
+    add(checked & (cell_code == 0) & (code == 0) & cells["senza pausa"].to_numpy()[cell_of] & ~no_fixed_pause & can_pause,
+        "pausa mancante")
+
+    if not found: return pd.DataFrame(columns=VIOLATION_COLS)
+    report = pd.concat(found, ignore_index=True)[VIOLATION_COLS]
+    report = report.sort_values(["mese", "giorno", "operatore"], kind="stable").reset_index(drop=True)
+    return report.astype({"mese": str, "giorno": int, "operatore": str})
+
+def violation_counts(report):
+    """Violazioni per regola (nell'ordine di RULES), solo quelle presenti"""
+    counts = report["regola"].value_counts()
+    return {rule: int(counts[rule]) for rule in RULES if rule in counts.index}
+
+def validate_month(config, shifts, month_leaves, year, month, max_tasks):
+    """validate() di un solo mese, come controllo prima del salvataggio"""
+    key = leaves_key(year, month)
+    return validate(config, {key: shifts}, {key: month_leaves}, max_tasks)